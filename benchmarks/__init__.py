@@ -0,0 +1 @@
+# Benchmarks - микробенчмарки и проверки производительности
@@ -0,0 +1,74 @@
+"""
+Проверка горячих путей: ни один из них не должен создавать новый
+DatabaseAdapter после первого обращения к провайдеру.
+
+Запуск (код возврата 1 при нарушении):
+    python -m benchmarks.adapter_reuse
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+import notifications
+from src.application.use_cases import UserUseCase, TaskUseCase, StatsUseCase, AchievementUseCase
+from src.infrastructure.database import DatabaseAdapter
+from src.infrastructure.provider import close_databases, get_async_database
+
+
+class _FakeBot:
+    """Бот-заглушка: сообщения никуда не отправляются."""
+    
+    async def send_message(self, chat_id: int, text: str) -> None:
+        pass
+
+
+async def _hot_paths(chat_id: int) -> None:
+    """Все сценарии, которые выполняются на каждое обновление или напоминание."""
+    db = get_async_database()
+    users, tasks = UserUseCase(db), TaskUseCase(db)
+    stats, achievements = StatsUseCase(db), AchievementUseCase(db)
+    
+    await users.register_user(chat_id, "Проверка")
+    await tasks.create_task(chat_id)
+    await tasks.complete_task(chat_id, 10)
+    await achievements.check_achievements(chat_id)
+    await stats.get_detailed_stats(chat_id)
+    await stats.get_user_stats(chat_id)
+    await users.update_user_level(chat_id, 2)
+    
+    bot = _FakeBot()
+    await notifications.send_morning_reminder(bot, chat_id, "Проверка")
+    await notifications.send_afternoon_reminder(bot, chat_id, "Проверка")
+    await notifications.send_evening_reminder(bot, chat_id, "Проверка")
+    await notifications.send_weekly_progress_report(bot, chat_id, "Проверка")
+
+
+async def _check() -> bool:
+    # Прогрев: провайдер создаёт адаптеры процесса
+    await _hot_paths(1)
+    created = DatabaseAdapter.created_count
+    
+    for chat_id in range(2, 12):
+        await _hot_paths(chat_id)
+    
+    extra = DatabaseAdapter.created_count - created
+    if extra:
+        print(f"❌ Горячие пути создали новых DatabaseAdapter: {extra}")
+        return False
+    print(f"✅ Горячие пути переиспользуют адаптеры процесса (создано при старте: {created})")
+    return True
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DB_PATH'] = os.path.join(tmp, 'reuse.db')
+        try:
+            ok = asyncio.run(_check())
+        finally:
+            close_databases()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
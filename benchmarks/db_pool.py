@@ -0,0 +1,50 @@
+"""
+Микробенчмарк: соединение на каждый вызов против пула соединений.
+
+Запуск:
+    python -m benchmarks.db_pool [--users 200] [--iterations 2000]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from src.infrastructure.database import DatabaseAdapter, POOL_MODES
+
+
+def _throughput(func, iterations: int) -> float:
+    """Количество вызовов в секунду."""
+    started = time.perf_counter()
+    for i in range(iterations):
+        func(i)
+    elapsed = time.perf_counter() - started
+    return iterations / elapsed if elapsed else float('inf')
+
+
+def run(users: int, iterations: int) -> None:
+    """Запуск бенчмарка для всех режимов пула."""
+    print(f"{'режим':<8} {'get_user, оп/с':>16} {'save_daily_activity, оп/с':>27}")
+    for pool_mode in POOL_MODES:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = DatabaseAdapter(os.path.join(tmp, 'bench.db'), pool_mode=pool_mode)
+            user_ids = [db.save_user(chat_id, f"user{chat_id}").id for chat_id in range(users)]
+            
+            get_rate = _throughput(lambda i: db.get_user(i % users), iterations)
+            save_rate = _throughput(
+                lambda i: db.save_daily_activity(user_ids[i % users], 10),
+                iterations,
+            )
+            db.close()
+        print(f"{pool_mode:<8} {get_rate:>16.0f} {save_rate:>27.0f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+    run(args.users, args.iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Бенчмарк рассылки планировщика: одна задача Celery на пользователя против
+пачек по --chunk-size пользователей.
+
+Для синтетических chat_id измеряются время постановки в очередь, число
+сообщений и прирост памяти Redis (INFO used_memory) на брокере. Задачи
+ставятся в отдельную очередь и удаляются после замера; воркер не нужен.
+
+Запуск (нужен Redis):
+    python -m benchmarks.fanout [--users 100000] [--chunk-size 500] [--broker redis://localhost:6379/15]
+"""
+import argparse
+import os
+import time
+import uuid
+
+from celery import Celery
+
+QUEUE = 'fanout_benchmark'
+
+
+def _used_memory(app: Celery) -> int:
+    with app.connection_for_write() as connection:
+        return connection.default_channel.client.info('memory')['used_memory']
+
+
+def _purge(app: Celery) -> None:
+    with app.connection_for_write() as connection:
+        connection.default_channel.queue_purge(QUEUE)
+
+
+def _run_case(app: Celery, name: str, dispatch) -> None:
+    _purge(app)
+    memory_before = _used_memory(app)
+    started = time.perf_counter()
+    messages = dispatch()
+    elapsed = time.perf_counter() - started
+    memory_delta = _used_memory(app) - memory_before
+    _purge(app)
+    print(f"{name:<22}{messages:>10}{elapsed:>12.2f}{memory_delta / 1024 / 1024:>14.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--chunk-size', type=int, default=int(os.getenv('REMINDER_CHUNK_SIZE', '500')))
+    parser.add_argument('--broker', default='redis://localhost:6379/15')
+    args = parser.parse_args()
+
+    app = Celery('fanout_benchmark', broker=args.broker)
+    app.conf.update(task_serializer='json', accept_content=['json'])
+
+    # Те же сигнатуры, что у задач в src/infrastructure/tasks.py
+    @app.task(name='src.infrastructure.tasks.send_morning_reminder')
+    def send_morning_reminder(user_id):
+        pass
+
+    @app.task(name='src.infrastructure.tasks.send_outbox_batch')
+    def send_outbox_batch(kind, slot_date, claim_id, payloads):
+        pass
+
+    user_ids = range(1, args.users + 1)
+
+    def per_user() -> int:
+        for user_id in user_ids:
+            send_morning_reminder.apply_async((user_id,), queue=QUEUE)
+        return args.users
+
+    def batched() -> int:
+        messages = 0
+        for start in range(0, args.users, args.chunk_size):
+            # Поля ReminderPayload: chat_id, first_name, level, daily_goal, today_count
+            chunk = [[user_id, 'Пользователь', 1, 30, 0]
+                     for user_id in user_ids[start:start + args.chunk_size]]
+            send_outbox_batch.apply_async(('morning', '2024-01-01', uuid.uuid4().hex, chunk), queue=QUEUE)
+            messages += 1
+        return messages
+
+    print(f"{'режим':<22}{'сообщений':>10}{'время, с':>12}{'память, МБ':>14}")
+    _run_case(app, 'по одному', per_user)
+    _run_case(app, f'пачки по {args.chunk_size}', batched)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Проверка планов горячих запросов: каждый должен быть поиском по индексу.
+
+Запуск (код возврата 1, если найден полный просмотр таблицы):
+    python -m benchmarks.query_plans [--db users.db]
+"""
+import argparse
+import os
+import sys
+import tempfile
+from typing import Collection, Dict, List, Optional
+
+from src.infrastructure.database import SCHEMA_VERSION, DatabaseAdapter
+
+
+def find_full_scans(plans: Dict[str, List[str]],
+                    partial_indexes: Collection[str] = ()) -> Dict[str, List[str]]:
+    """Запросы, в плане которых есть полный просмотр таблицы (SCAN).
+    
+    Просмотр частичного индекса (например, только неотправленных записей
+    outbox) полным не считается: в индексе лишь нужные строки.
+    """
+    def is_full_scan(step: str) -> bool:
+        if not step.startswith('SCAN'):
+            return False
+        return not any(step.endswith(f"USING INDEX {index}") for index in partial_indexes)
+    
+    return {
+        name: [step for step in steps if is_full_scan(step)]
+        for name, steps in plans.items()
+        if any(is_full_scan(step) for step in steps)
+    }
+
+
+def check(db_path: Optional[str] = None) -> bool:
+    """Вывод планов и проверка отсутствия полных просмотров.
+    
+    Существующая база открывается только для чтения (mode=ro) и не
+    мигрирует: если её схема устарела, проверка не выполняется.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        if db_path is None:
+            DatabaseAdapter(os.path.join(tmp, 'plans.db')).close()
+            db_path = os.path.join(tmp, 'plans.db')
+        elif not os.path.exists(db_path):
+            print(f"❌ База {db_path} не найдена")
+            return False
+        db = DatabaseAdapter(db_path, read_only=True)
+        try:
+            version = db.schema_version()
+            if version != SCHEMA_VERSION:
+                print(f"❌ Версия схемы {db_path}: {version}, ожидается {SCHEMA_VERSION}; "
+                      f"запустите бота для миграции")
+                return False
+            plans = db.explain_hot_queries()
+            with db._connection() as conn:
+                partial_indexes = [row[0] for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'index' AND sql LIKE '% WHERE %'"
+                )]
+        finally:
+            db.close()
+    
+    for name, steps in plans.items():
+        print(f"{name}:")
+        for step in steps:
+            print(f"    {step}")
+    
+    scans = find_full_scans(plans, partial_indexes)
+    if scans:
+        print(f"\n❌ Полный просмотр таблицы в запросах: {', '.join(scans)}")
+        return False
+    print("\n✅ Все горячие запросы используют индексы")
+    return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--db', help="путь к существующей базе, открывается только для чтения (по умолчанию временная)")
+    args = parser.parse_args()
+    sys.exit(0 if check(args.db) else 1)
+
+
+if __name__ == '__main__':
+    main()
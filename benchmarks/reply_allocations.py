@@ -0,0 +1,105 @@
+"""
+Бенчмарк выделений памяти на один ответ бота: клавиатуры, собираемые
+на каждый ответ, против заранее построенных и мемоизированных.
+
+Для каждого типа ответа считается пик памяти, выделенной за один ответ
+по данным tracemalloc (среднее по --replies).
+
+Запуск:
+    python -m benchmarks.reply_allocations [--replies 1000]
+"""
+import argparse
+import tracemalloc
+from datetime import date
+from typing import Callable, Dict
+
+from src.domain.entities import DetailedStats, Task, User
+from src.presentation import keyboards, messages
+
+
+def _legacy_format_date(value):
+    """Прежний разбор даты: split на каждый вызов."""
+    if not value:
+        return 'Нет'
+    return str(value).split(' ')[0]
+
+
+def _legacy_format_today() -> str:
+    return date.today().strftime('%d.%m.%Y')
+
+
+def _sample_stats() -> DetailedStats:
+    user = User(1, 1, "Иван", 3, 40, 1200, '2024-05-01', 5, 40)
+    return DetailedStats(
+        user=user, total_days=40, total_pushups=1200,
+        first_activity='2024-03-01 08:00:00', last_activity='2024-05-01 08:00:00',
+        week_days=5, week_pushups=180, month_days=20, month_pushups=700,
+        avg_per_day=30.0, today_count=25, best_day='2024-04-12', best_day_pushups=80,
+    )
+
+
+def _replies(legacy: bool) -> Dict[str, Callable[[], object]]:
+    """Типовые ответы бота: текст и клавиатура."""
+    stats = _sample_stats()
+    task = Task(user_id=1, pushups_count=25, level=3, date=date.today())
+    if legacy:
+        main = keyboards._build_main_keyboard
+        task_keyboard = keyboards._build_task_keyboard
+        stats_keyboard = keyboards._build_stats_keyboard
+        settings = lambda level: keyboards._settings_keyboard.__wrapped__(
+            level, keyboards.get_progression().max_level
+        )
+    else:
+        main = keyboards.create_main_keyboard
+        task_keyboard = keyboards.create_task_keyboard
+        stats_keyboard = keyboards.create_stats_keyboard
+        settings = keyboards.create_settings_keyboard
+    return {
+        'main_menu': lambda: (messages.get_greeting_message(), main()),
+        'task': lambda: (messages.get_task_message("Иван", task), task_keyboard(task.pushups_count)),
+        'task_done': lambda: (messages.get_task_completed_message("Иван", 25), main()),
+        'stats': lambda: (messages.get_stats_message(stats), stats_keyboard()),
+        'detailed_stats': lambda: (messages.get_detailed_stats_message("Иван", stats), None),
+        'settings': lambda: (messages.get_settings_message("Иван", 3), settings(3)),
+    }
+
+
+def _measure_peak(reply: Callable[[], object], replies: int) -> float:
+    """Пиковое выделение за один ответ, байт."""
+    reply()
+    tracemalloc.start()
+    total = 0
+    for _ in range(replies):
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        reply()
+        _, peak = tracemalloc.get_traced_memory()
+        total += peak - base
+    tracemalloc.stop()
+    return total / replies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--replies', type=int, default=1000)
+    args = parser.parse_args()
+
+    results = {}
+    for legacy in (True, False):
+        if legacy:
+            patched = messages._format_date, messages._format_today
+            messages._format_date, messages._format_today = _legacy_format_date, _legacy_format_today
+        try:
+            for name, reply in _replies(legacy).items():
+                results[(name, legacy)] = _measure_peak(reply, args.replies)
+        finally:
+            if legacy:
+                messages._format_date, messages._format_today = patched
+
+    print(f"{'ответ':<16}{'до, байт':>12}{'после, байт':>14}")
+    for name in _replies(False):
+        print(f"{name:<16}{results[(name, True)]:>12.0f}{results[(name, False)]:>14.0f}")
+
+
+if __name__ == '__main__':
+    main()
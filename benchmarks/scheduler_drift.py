@@ -0,0 +1,103 @@
+"""
+Проверка движка планировщика на искусственном времени.
+
+Моделируются сутки работы: задача каждую минуту иногда выполняется
+дольше минуты, а посреди суток процесс «падает» на --downtime минут и
+поднимается с отметками из хранилища. Проверяется, что ни один запуск
+не выполнен дважды и что пропущены только запуски, которые простой
+или затянувшаяся рассылка задержали дольше окна grace.
+
+Запуск (код возврата 1 при нарушении):
+    python -m benchmarks.scheduler_drift [--downtime 30] [--grace 600]
+"""
+import argparse
+import asyncio
+import random
+import sys
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from src.infrastructure.scheduler_engine import Job, MemoryWatermarkStore, SchedulerEngine, every
+
+
+class FakeClock:
+    """Искусственные часы: sleep мгновенно сдвигает время."""
+
+    def __init__(self, start: datetime):
+        self.current = start
+
+    def now(self) -> datetime:
+        return self.current
+
+    async def sleep(self, seconds: float) -> None:
+        self.current += timedelta(seconds=seconds)
+
+
+async def _simulate(downtime: int, grace: float, jitter: float) -> bool:
+    start = datetime(2024, 5, 6, 0, 0, 30, tzinfo=timezone.utc)
+    crash_at = start + timedelta(hours=12)
+    end = start + timedelta(days=1)
+    clock = FakeClock(start)
+    store = MemoryWatermarkStore()
+    rng = random.Random(1)
+    fired = Counter()
+    lateness = []
+    busy = []
+
+    async def tick(fire_time: datetime) -> None:
+        fired[fire_time] += 1
+        lateness.append((clock.now() - fire_time).total_seconds())
+        started = clock.now()
+        # Редкие долгие рассылки: 90 секунд вместо пары секунд
+        await clock.sleep(90 if rng.random() < 0.02 else 2)
+        busy.append((started, clock.now()))
+
+    def engine() -> SchedulerEngine:
+        jobs = [Job('tick', every(1), tick, jitter=jitter)]
+        return SchedulerEngine(jobs, store, clock=clock, grace=grace, rng=random.Random(2))
+
+    horizon = start
+    for until in (crash_at, end):
+        runner = engine()
+        while clock.now() < until:
+            await runner.run_pending()
+            due, _ = runner.next_due()
+            await clock.sleep(max(0.0, (due - clock.now()).total_seconds()))
+        if until is crash_at:
+            clock.current += timedelta(minutes=downtime)
+            # Запуски старше окна догона на момент подъёма пропускаются
+            horizon = clock.now() - timedelta(seconds=grace)
+
+    first = start.replace(second=0)
+    expected = {first + timedelta(minutes=m) for m in range(1, 24 * 60 + 1)}
+    missed = sorted(expected - set(fired))
+    duplicates = [moment for moment, count in fired.items() if count > 1]
+    window = timedelta(seconds=grace)
+
+    def allowed(moment: datetime) -> bool:
+        if crash_at < moment < horizon:
+            return True
+        return any(started <= moment and finished - moment > window for started, finished in busy)
+
+    allowed_gap = sum(1 for moment in missed if allowed(moment))
+    print(f"запусков: {sum(fired.values())}, ожидалось: {len(expected)}")
+    print(f"дубли: {len(duplicates)}, пропущено: {len(missed)} (допустимо {allowed_gap:.0f})")
+    print(f"задержка запуска: средняя {sum(lateness) / len(lateness):.1f} с, "
+          f"максимальная {max(lateness):.1f} с")
+    return not duplicates and len(missed) == allowed_gap
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--downtime', type=int, default=30, help='простой процесса, минут')
+    parser.add_argument('--grace', type=float, default=600, help='окно догона, секунд')
+    parser.add_argument('--jitter', type=float, default=20, help='разброс запуска, секунд')
+    args = parser.parse_args()
+
+    ok = asyncio.run(_simulate(args.downtime, args.grace, args.jitter))
+    print("✅ Дрейфа и дублей нет" if ok else "❌ Нарушено расписание")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Проверка общего кэша пользователей (SHARED_CACHE).
+
+Бот пишет через AsyncDatabaseAdapter, воркер читает через
+SharedCacheReader; оба работают с одним InMemorySharedCache. Проверяется:
+    - повторное чтение того же пользователя не идёт в SQLite;
+    - после записи бота читатель сразу видит новые данные;
+    - снимок, прочитанный до записи, кэш не выдаёт (версия устарела);
+    - запись бота сбрасывает кэш пользователей другого адаптера.
+
+Запуск (код возврата 1 при ошибке):
+    python -m benchmarks.shared_cache [--users 20]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from typing import Any
+
+from src.infrastructure.async_database import AsyncDatabaseAdapter
+from src.infrastructure.database import DatabaseAdapter
+from src.infrastructure.shared_cache import InMemorySharedCache, SharedCacheReader
+
+
+class CountingReader:
+    """Адаптер базы, считающий чтения пользователей и сегодняшних сумм."""
+
+    def __init__(self, db: DatabaseAdapter):
+        self.db = db
+        self.queries = 0
+
+    def get_user(self, chat_id: int) -> Any:
+        self.queries += 1
+        return self.db.get_user(chat_id)
+
+    def get_today_activity_count(self, chat_id: int) -> int:
+        self.queries += 1
+        return self.db.get_today_activity_count(chat_id)
+
+
+def _report(ok: bool, message: str) -> bool:
+    print(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+
+async def _check(db_path: str, users: int) -> bool:
+    cache = InMemorySharedCache()
+    bot = AsyncDatabaseAdapter(DatabaseAdapter(db_path), shared_cache=cache)
+    other = AsyncDatabaseAdapter(DatabaseAdapter(db_path), shared_cache=cache)
+    counting = CountingReader(DatabaseAdapter(db_path))
+    reader = SharedCacheReader(counting, cache)
+    chat_ids = range(1, users + 1)
+    results = []
+    try:
+        for chat_id in chat_ids:
+            await bot.save_user(chat_id, f"Пользователь {chat_id}")
+
+        for chat_id in chat_ids:
+            reader.get_user(chat_id)
+            reader.get_today_activity_count(chat_id)
+        cold = counting.queries
+        for chat_id in chat_ids:
+            reader.get_user(chat_id)
+            reader.get_today_activity_count(chat_id)
+        results.append(_report(
+            counting.queries == cold,
+            f"повторное чтение {users} пользователей: запросов к SQLite {counting.queries - cold}"
+        ))
+
+        for chat_id in chat_ids:
+            await other.get_user(chat_id)
+            await bot.record_activity(chat_id, chat_id)
+        fresh = all(
+            reader.get_today_activity_count(chat_id) == chat_id
+            and reader.get_user(chat_id).total_count == chat_id
+            for chat_id in chat_ids
+        )
+        results.append(_report(fresh, "после записи бота читатель видит новые суммы"))
+
+        stale = await other.get_user(1)
+        results.append(_report(
+            stale is not None and stale.total_count == 1,
+            "запись бота сбросила кэш пользователей другого адаптера"
+        ))
+
+        # Читатель прочитал снимок до записи, а сохраняет его уже после
+        snapshot, version = cache.lookup_user(1)
+        before = counting.db.get_user(1)
+        await bot.record_activity(1, 5)
+        cache.set_user(before, version)
+        cached, _ = cache.lookup_user(1)
+        results.append(_report(
+            snapshot is not None and cached is None and reader.get_user(1).total_count == 6,
+            "снимок, прочитанный до записи, не выдаётся"
+        ))
+    finally:
+        bot.close()
+        other.close()
+        counting.db.close()
+    return all(results)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ok = asyncio.run(_check(os.path.join(tmp, 'shared_cache.db'), args.users))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
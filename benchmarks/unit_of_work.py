@@ -0,0 +1,71 @@
+"""
+Проверка бюджета запросов на одно обновление бота.
+
+Сценарии каждого обновления выполняются внутри единицы работы, как это
+делает UnitOfWorkMiddleware. Обновление должно укладываться в одно
+чтение и одну транзакцию записи.
+
+Запуск (код возврата 1 при превышении):
+    python -m benchmarks.unit_of_work
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+from src.application.unit_of_work import unit_of_work
+from src.application.use_cases import UserUseCase, TaskUseCase, StatsUseCase, AchievementUseCase
+from src.infrastructure.provider import close_databases, get_async_database
+
+# Не больше одного чтения и одной записи
+MAX_QUERIES_PER_UPDATE = 2
+
+
+async def _check() -> bool:
+    db = get_async_database()
+    users, tasks = UserUseCase(db), TaskUseCase(db)
+    stats, achievements = StatsUseCase(db), AchievementUseCase(db)
+    
+    async def done(chat_id: int) -> None:
+        if await tasks.complete_task(chat_id, 10):
+            await achievements.check_achievements(chat_id)
+    
+    async def custom_count(chat_id: int) -> None:
+        await stats.check_today_activity(chat_id)
+        await done(chat_id)
+    
+    updates = {
+        'start': lambda chat_id: users.register_user(chat_id, "Проверка"),
+        'new_task': lambda chat_id: tasks.create_task(chat_id),
+        'done': done,
+        'custom_count': custom_count,
+        'skip': lambda chat_id: tasks.skip_task(chat_id),
+        'settings': lambda chat_id: users.get_user(chat_id),
+        'stats': lambda chat_id: stats.get_detailed_stats(chat_id),
+        'set_level': lambda chat_id: users.update_user_level(chat_id, 2),
+    }
+    
+    ok = True
+    for chat_id in range(1, 6):
+        for name, update in updates.items():
+            async with unit_of_work(db, chat_id) as uow:
+                await update(chat_id)
+            if chat_id == 1 or uow.queries > MAX_QUERIES_PER_UPDATE:
+                mark = '✅' if uow.queries <= MAX_QUERIES_PER_UPDATE else '❌'
+                print(f"{mark} {name:<13} chat_id={chat_id}: запросов {uow.queries}")
+            ok = ok and uow.queries <= MAX_QUERIES_PER_UPDATE
+    return ok
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DB_PATH'] = os.path.join(tmp, 'uow.db')
+        try:
+            ok = asyncio.run(_check())
+        finally:
+            close_databases()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
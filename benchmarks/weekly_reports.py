@@ -0,0 +1,93 @@
+"""
+Проверка недельных итогов: сгруппированный запрос по пачкам должен
+совпадать с подсчётом по сырым строкам daily_activity для каждого
+пользователя.
+
+Пачки нарочно маленькие, а уровни пользователей разные: так проверяется,
+что цель уровня считается верно не только в первой пачке.
+
+Запуск (код возврата 1 при расхождении):
+    python -m benchmarks.weekly_reports [--users 50] [--chunk-size 2]
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+
+from src.domain.progression import get_progression
+from src.infrastructure.database import DatabaseAdapter
+
+
+def _seed(db: DatabaseAdapter, users: int) -> None:
+    """Пользователи всех уровней по кругу и неделя активности разной величины."""
+    progression = get_progression()
+    today = date.today()
+    with db._connection() as conn:
+        for chat_id in range(1, users + 1):
+            level = (chat_id - 1) % progression.max_level + 1
+            cursor = conn.execute(
+                "INSERT INTO users (chat_id, first_name, level, last_activity_date) "
+                "VALUES (?, ?, ?, CURRENT_DATE)",
+                (chat_id, f"Пользователь {chat_id}", level)
+            )
+            for days_ago in range(chat_id % 7 + 1):
+                conn.execute(
+                    "INSERT INTO daily_activity (user_id, activity_date, pushups_count, completed) "
+                    "VALUES (?, ?, ?, TRUE)",
+                    (cursor.lastrowid, (today - timedelta(days=days_ago)).isoformat(),
+                     (chat_id * 7 + days_ago * 13) % 120 + 1)
+                )
+        conn.commit()
+
+
+def _expected(db: DatabaseAdapter, chat_id: int) -> tuple:
+    """(цель, дни, сумма, лучший день, выполнения цели) по сырым строкам."""
+    with db._connection() as conn:
+        level = conn.execute("SELECT level FROM users WHERE chat_id = ?", (chat_id,)).fetchone()[0]
+        counts = [row[0] for row in conn.execute("""
+            SELECT da.pushups_count FROM daily_activity da
+            JOIN users u ON u.id = da.user_id
+            WHERE u.chat_id = ? AND da.activity_date > date('now', '-7 days')
+        """, (chat_id,))]
+    goal = get_progression().daily_goal(level)
+    return (goal, len([c for c in counts if c > 0]), sum(counts),
+            max(counts, default=0), len([c for c in counts if c >= goal]))
+
+
+def check(users: int, chunk_size: int) -> bool:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseAdapter(os.path.join(tmp, 'weekly.db'))
+        _seed(db, users)
+        chat_ids = list(range(1, users + 1))
+        reports = {report.chat_id: report for report in db.get_weekly_reports(chat_ids, chunk_size)}
+        mismatches = []
+        for chat_id in chat_ids:
+            report = reports.get(chat_id)
+            actual = report and (report.daily_goal, report.days, report.pushups,
+                                 report.best_day_pushups, report.goal_hits)
+            expected = _expected(db, chat_id)
+            if actual != expected:
+                mismatches.append((chat_id, actual, expected))
+        db.close()
+    
+    chunks = (users + chunk_size - 1) // chunk_size
+    if mismatches:
+        for chat_id, actual, expected in mismatches[:10]:
+            print(f"chat_id {chat_id}: получено {actual}, ожидалось {expected}")
+        print(f"\n❌ Расхождений: {len(mismatches)} из {users} (пачек: {chunks})")
+        return False
+    print(f"✅ Итоги {users} пользователей в {chunks} пачках совпадают с сырыми данными")
+    return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--chunk-size', type=int, default=2)
+    args = parser.parse_args()
+    sys.exit(0 if check(args.users, args.chunk_size) else 1)
+
+
+if __name__ == '__main__':
+    main()
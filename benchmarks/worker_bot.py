@@ -0,0 +1,105 @@
+"""
+Бенчмарк отправки сообщений воркером Celery: новый Bot и asyncio.run на
+каждое сообщение (как было) против общего бота и цикла WorkerRuntime.
+
+Сообщения уходят на локальный фейковый Telegram API (aiohttp), поэтому
+в замер попадают создание цикла, сессии и TCP-соединения, но не TLS.
+
+Запуск:
+    python -m benchmarks.worker_bot [--messages 500]
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+from aiohttp import web
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from src.infrastructure.worker_runtime import WorkerRuntime
+
+TOKEN = '123456:benchmark'
+
+
+async def _send_message(request: web.Request) -> web.Response:
+    data = await request.post()
+    return web.json_response({
+        'ok': True,
+        'result': {
+            'message_id': 1,
+            'date': int(time.time()),
+            'chat': {'id': int(data['chat_id']), 'type': 'private'},
+            'text': data.get('text', ''),
+        },
+    })
+
+
+def _start_fake_telegram() -> str:
+    """Фейковый Telegram API в фоновом потоке; возвращает базовый URL."""
+    started = threading.Event()
+    address = {}
+
+    async def serve() -> None:
+        app = web.Application()
+        app.router.add_post('/bot{token}/sendMessage', _send_message)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        address['port'] = site._server.sockets[0].getsockname()[1]
+        started.set()
+        await asyncio.Event().wait()
+
+    threading.Thread(target=lambda: asyncio.run(serve()), daemon=True).start()
+    started.wait()
+    return f"http://127.0.0.1:{address['port']}"
+
+
+def _make_bot(base_url: str) -> Bot:
+    return Bot(token=TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(base_url)))
+
+
+def _bench_per_task(base_url: str, messages: int) -> float:
+    """Как было: новый бот и цикл на каждое сообщение."""
+    async def send(chat_id: int) -> None:
+        bot = _make_bot(base_url)
+        try:
+            await bot.send_message(chat_id, "Напоминание")
+        finally:
+            await bot.session.close()
+
+    started = time.perf_counter()
+    for chat_id in range(1, messages + 1):
+        asyncio.run(send(chat_id))
+    return messages / (time.perf_counter() - started)
+
+
+def _bench_runtime(base_url: str, messages: int) -> float:
+    """Общий бот и цикл процесса."""
+    runtime = WorkerRuntime(lambda: _make_bot(base_url))
+    runtime.start()
+    runtime.run(runtime.bot.send_message(1, "Прогрев"))
+    try:
+        started = time.perf_counter()
+        for chat_id in range(1, messages + 1):
+            runtime.run(runtime.bot.send_message(chat_id, "Напоминание"))
+        return messages / (time.perf_counter() - started)
+    finally:
+        runtime.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--messages', type=int, default=500)
+    args = parser.parse_args()
+
+    base_url = _start_fake_telegram()
+    print(f"{'режим':<28}{'сообщений/с':>12}")
+    print(f"{'новый Bot на задачу':<28}{_bench_per_task(base_url, args.messages):>12.0f}")
+    print(f"{'WorkerRuntime':<28}{_bench_runtime(base_url, args.messages):>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
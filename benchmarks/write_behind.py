@@ -0,0 +1,82 @@
+"""
+Бенчмарк группового коммита подходов: коммиты в секунду и p99 задержки
+подтверждения при 1, 10 и 100 одновременных отправителях.
+
+Запуск:
+    python -m benchmarks.write_behind [--submissions 20] [--synchronous FULL]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import List
+
+from src.infrastructure.async_database import AsyncDatabaseAdapter
+from src.infrastructure.database import DatabaseAdapter, POOL_MODE_THREAD
+from src.infrastructure.metrics import metrics
+
+CONCURRENCY_LEVELS = (1, 10, 100)
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    """Перцентиль по отсортированной выборке."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _submitter(db: AsyncDatabaseAdapter, chat_id: int, submissions: int,
+                     latencies: List[float]) -> None:
+    for _ in range(submissions):
+        started = time.perf_counter()
+        await db.record_activity(chat_id, 10)
+        latencies.append(time.perf_counter() - started)
+
+
+async def _run_case(db_path: str, concurrency: int, submissions: int, write_behind: bool) -> tuple:
+    """Один прогон: (подходов/с, коммитов/с, p99 в мс)."""
+    db = AsyncDatabaseAdapter(
+        DatabaseAdapter(db_path, pool_mode=POOL_MODE_THREAD),
+        write_behind=write_behind,
+    )
+    for chat_id in range(concurrency):
+        await db.save_user(chat_id, f"user{chat_id}")
+    
+    commits_before = metrics.snapshot().get('db.write_behind.commits', 0)
+    latencies: List[float] = []
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        _submitter(db, chat_id, submissions, latencies) for chat_id in range(concurrency)
+    ])
+    elapsed = time.perf_counter() - started
+    await db.aclose()
+    
+    total = concurrency * submissions
+    if write_behind:
+        commits = metrics.snapshot().get('db.write_behind.commits', 0) - commits_before
+    else:
+        commits = total
+    return total / elapsed, commits / elapsed, _percentile(latencies, 99) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--submissions', type=int, default=20, help="подходов на отправителя")
+    parser.add_argument('--synchronous', default='FULL', help="PRAGMA synchronous для прогона")
+    args = parser.parse_args()
+    os.environ['DB_SYNCHRONOUS'] = args.synchronous
+    
+    print(f"{'отправителей':>12} {'режим':>12} {'подходов/с':>11} {'коммитов/с':>11} {'p99, мс':>9}")
+    for concurrency in CONCURRENCY_LEVELS:
+        for write_behind in (False, True):
+            with tempfile.TemporaryDirectory() as tmp:
+                rate, commit_rate, p99 = asyncio.run(_run_case(
+                    os.path.join(tmp, 'bench.db'), concurrency, args.submissions, write_behind
+                ))
+            mode = 'write-behind' if write_behind else 'direct'
+            print(f"{concurrency:>12} {mode:>12} {rate:>11.0f} {commit_rate:>11.0f} {p99:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
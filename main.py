@@ -10,9 +10,18 @@ from dotenv import load_dotenv
 from aiogram import Bot, Dispatcher, types, F
 from aiogram.filters import Command
 
-from src.infrastructure.database import DatabaseAdapter
+from src.domain.progression import install_reload_signal
+from src.infrastructure.dispatcher import (
+    DISPATCHER_INPROCESS,
+    InProcessDispatcher,
+    OutboxRelay,
+    notification_dispatcher_mode,
+)
+from src.infrastructure.provider import get_async_database, get_database
+from src.infrastructure.metrics import metrics
 from src.application.use_cases import UserUseCase, TaskUseCase, StatsUseCase, AchievementUseCase
 from src.presentation.handlers import MessageHandlers
+from src.presentation.middlewares import UnitOfWorkMiddleware
 
 # Загружаем переменные окружения
 load_dotenv()
@@ -22,6 +31,9 @@ TOKEN_BOT = os.getenv('TOKEN_BOT')
 if not TOKEN_BOT:
     raise ValueError("TOKEN_BOT не найден в переменных окружения!")
 
+# Период записи метрик в лог (секунды, 0 - отключено)
+METRICS_LOG_INTERVAL = int(os.getenv('METRICS_LOG_INTERVAL', '300'))
+
 # Создаём директорию для логов, если её нет
 log_dir = os.getenv('LOG_DIR', '.')
 if not os.path.exists(log_dir):
@@ -41,8 +53,9 @@ class BotApplication:
     """Основное приложение бота с чистой архитектурой."""
     
     def __init__(self):
-        # Слой инфраструктуры
-        self.db = DatabaseAdapter()
+        # Слой инфраструктуры: SQLite вызывается в пуле потоков,
+        # чтобы не блокировать цикл событий
+        self.db = get_async_database()
         
         # Слой приложения
         self.user_use_case = UserUseCase(self.db)
@@ -64,11 +77,26 @@ class BotApplication:
         self.bot = Bot(token=TOKEN_BOT)
         self.dp = Dispatcher()
         self._setup_handlers()
+        
+        # Режим inprocess: напоминания из outbox отправляет этот процесс
+        # через сессию бота; планировщик только записывает слоты
+        self.outbox_relay = None
+        if notification_dispatcher_mode() == DISPATCHER_INPROCESS:
+            self.outbox_relay = OutboxRelay(get_database(), InProcessDispatcher(self.bot, get_database()))
+        
+        # kill -HUP <pid> перечитывает config/progression.json
+        install_reload_signal()
     
     def _setup_handlers(self):
         """Настройка обработчиков сообщений."""
+        # Единица работы на каждое обновление
+        uow_middleware = UnitOfWorkMiddleware(self.db)
+        self.dp.message.middleware(uow_middleware)
+        self.dp.callback_query.middleware(uow_middleware)
+        
         # Обработчики команд
         self.dp.message.register(self.handlers.start_handler, Command("start"))
+        self.dp.message.register(self.handlers.timezone_handler, Command("timezone"))
         
         # Обработчики кнопок
         self.dp.message.register(self.handlers.new_task_handler, F.text == "🏋️‍♂️ Новое задание")
@@ -87,14 +115,33 @@ class BotApplication:
         # Обработчик текста (ловит всё остальное)
         self.dp.message.register(self.handlers.text_handler)
     
+    async def _log_metrics(self):
+        """Периодическая запись метрик в лог."""
+        while True:
+            await asyncio.sleep(METRICS_LOG_INTERVAL)
+            metrics.log_snapshot()
+    
     async def start(self):
         """Запуск бота."""
         logging.info("Запуск бота с чистой архитектурой...")
+        metrics_task = None
+        if METRICS_LOG_INTERVAL > 0:
+            metrics_task = asyncio.create_task(self._log_metrics())
+        if self.outbox_relay:
+            self.outbox_relay.start()
         try:
-            await self.dp.start_polling(self.bot)
+            # Сессию закрываем сами: сначала дожидаемся пачек уведомлений
+            await self.dp.start_polling(self.bot, close_bot_session=False)
         except Exception as error:
             logging.error(f'Ошибка бота: {error}')
             raise
+        finally:
+            if metrics_task:
+                metrics_task.cancel()
+            if self.outbox_relay:
+                await self.outbox_relay.aclose()
+            await self.bot.session.close()
+            await self.db.aclose()
 
 
 async def main():
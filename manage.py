@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Служебные команды обслуживания базы данных.
+
+Примеры:
+    python manage.py rebuild-rollups
+    python manage.py slide-rollups
+    python manage.py reshard --from 1 --to 4
+"""
+import argparse
+import logging
+import os
+
+from dotenv import load_dotenv
+
+from src.infrastructure.provider import get_database
+from src.infrastructure.sharding import reshard
+
+load_dotenv()
+
+logging.basicConfig(
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    level=logging.INFO,
+)
+
+
+def rebuild_rollups(args: argparse.Namespace) -> None:
+    """Пересборка проекции user_rollups по журналу daily_activity."""
+    db = get_database()
+    rebuilt = db.rebuild_rollups()
+    print(f"✅ user_rollups пересобрана: {rebuilt} пользователей")
+
+
+def slide_rollups(args: argparse.Namespace) -> None:
+    """Сдвиг окон 7/30 дней в user_rollups на сегодня."""
+    db = get_database()
+    updated = db.slide_rollup_windows()
+    print(f"✅ Окна сдвинуты для {updated} пользователей")
+
+
+def reshard_database(args: argparse.Namespace) -> None:
+    """Офлайн-перераспределение пользователей между шардами."""
+    db_path = os.getenv('DB_PATH', 'users.db')
+    moved = reshard(db_path, args.source, args.target)
+    print(f"✅ Перенесено пользователей: {moved}. Установите DB_SHARDS={args.target}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Обслуживание базы данных бота")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    commands.add_parser(
+        'rebuild-rollups', help="пересобрать user_rollups по журналу активности"
+    ).set_defaults(func=rebuild_rollups)
+    commands.add_parser(
+        'slide-rollups', help="сдвинуть окна 7/30 дней в user_rollups"
+    ).set_defaults(func=slide_rollups)
+    
+    reshard_parser = commands.add_parser(
+        'reshard', help="перераспределить пользователей между шардами (бот остановлен)"
+    )
+    reshard_parser.add_argument('--from', dest='source', type=int, required=True,
+                                help="текущее количество шардов")
+    reshard_parser.add_argument('--to', dest='target', type=int, required=True,
+                                help="новое количество шардов")
+    reshard_parser.set_defaults(func=reshard_database)
+    
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
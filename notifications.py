@@ -2,151 +2,166 @@ import logging
 import random
 from datetime import datetime, date, timedelta
 
+from src.domain.entities import ReminderPayload, WeeklyReport
+from src.domain.services import UserService
+from src.infrastructure.delivery import get_delivery_engine
+from src.infrastructure.provider import get_database, get_database_reader
+
 
 # Новые функции для системы уровней
 
-async def send_morning_reminder(bot, chat_id, first_name):
-    """Отправка утреннего напоминания о тренировке."""
+def _morning_message(payload: ReminderPayload) -> str:
+    remaining = payload.daily_goal - payload.today_count
+    if remaining <= 0:
+        return f"🌅 Доброе утро, {payload.first_name}!\n\n🎉 Ты уже выполнил дневную норму ({payload.daily_goal} отжиманий)! Отличная работа!"
+    return f"🌅 Доброе утро, {payload.first_name}!\n\n💪 Твоя цель на сегодня: {payload.daily_goal} отжиманий\n📊 Уже выполнено: {payload.today_count}\n🎯 Осталось: {remaining}\n\nНачни день с тренировки!"
+
+
+def _afternoon_message(payload: ReminderPayload) -> str:
+    remaining = payload.daily_goal - payload.today_count
+    if remaining <= 0:
+        return f"☀️ Привет, {payload.first_name}!\n\n🎉 Ты уже выполнил дневную норму! Можешь отдохнуть или сделать дополнительные отжимания для укрепления!"
+    return f"☀️ Привет, {payload.first_name}!\n\n💪 Не забудь про тренировку!\n📊 Прогресс: {payload.today_count}/{payload.daily_goal}\n🎯 Осталось: {remaining}\n\nСделай перерыв и выполни часть отжиманий!"
+
+
+def _evening_message(payload: ReminderPayload) -> str:
+    remaining = payload.daily_goal - payload.today_count
+    if remaining <= 0:
+        return f"🌙 Добрый вечер, {payload.first_name}!\n\n🎉 Отличная работа! Ты выполнил дневную норму {payload.daily_goal} отжиманий!\n\nСпокойной ночи и до завтра!"
+    return f"🌙 Добрый вечер, {payload.first_name}!\n\n⚠️ Не забудь про тренировку!\n📊 Прогресс: {payload.today_count}/{payload.daily_goal}\n🎯 Осталось: {remaining}\n\nСделай финальный рывок и выполни оставшиеся отжимания!"
+
+
+# Вид напоминания -> (текст по данным, название для лога)
+REMINDER_MESSAGES = {
+    'morning': (_morning_message, 'утреннее'),
+    'afternoon': (_afternoon_message, 'дневное'),
+    'evening': (_evening_message, 'вечернее'),
+}
+
+
+def load_reminder_payload(chat_id, first_name, db=None):
+    """Данные для напоминания одному пользователю (без пакетного запроса).
+    
+    Если first_name не передано, берётся имя из базы.
+    """
+    if db is None:
+        db = get_database_reader()
+    user = db.get_user(chat_id)
+    if not user:
+        return None
+    return ReminderPayload(
+        chat_id, first_name or user.first_name, user.level,
+        db.get_daily_goal(user.level), db.get_today_activity_count(chat_id)
+    )
+
+
+async def send_reminder(bot, kind, payload: ReminderPayload):
+    """Отправка напоминания вида kind по заранее собранным данным.
+    
+    Возвращает True, если сообщение доставлено.
+    """
+    build, title = REMINDER_MESSAGES[kind]
     try:
-        from src.infrastructure.database import DatabaseAdapter
-        
-        db = DatabaseAdapter()
-        user = db.get_user(chat_id)
-        
-        if not user:
-            return
-        
-        level = user.level
-        daily_goal = db.get_daily_goal(level)
-        today_count = db.get_today_activity_count(chat_id)
-        remaining = daily_goal - today_count
-        
-        if remaining <= 0:
-            message = f"🌅 Доброе утро, {first_name}!\n\n🎉 Ты уже выполнил дневную норму ({daily_goal} отжиманий)! Отличная работа!"
-        else:
-            message = f"🌅 Доброе утро, {first_name}!\n\n💪 Твоя цель на сегодня: {daily_goal} отжиманий\n📊 Уже выполнено: {today_count}\n🎯 Осталось: {remaining}\n\nНачни день с тренировки!"
-        
-        await bot.send_message(chat_id, message)
-        logging.info(f"Отправлено утреннее напоминание пользователю {chat_id}")
-        
+        if await get_delivery_engine(bot).send_message(payload.chat_id, build(payload)):
+            logging.info(f"Отправлено {title} напоминание пользователю {payload.chat_id}")
+            return True
     except Exception as e:
-        logging.error(f"Ошибка при отправке утреннего напоминания пользователю {chat_id}: {e}")
+        logging.error(f"Ошибка при отправке напоминания ({title}) пользователю {payload.chat_id}: {e}")
+    return False
 
 
-async def send_afternoon_reminder(bot, chat_id, first_name):
-    """Отправка дневного напоминания о тренировке."""
+async def _send_single_reminder(bot, kind, chat_id, first_name, db=None):
     try:
-        from src.infrastructure.database import DatabaseAdapter
-        
-        db = DatabaseAdapter()
-        user = db.get_user(chat_id)
-        
-        if not user:
-            return
-        
-        level = user.level
-        daily_goal = db.get_daily_goal(level)
-        today_count = db.get_today_activity_count(chat_id)
-        remaining = daily_goal - today_count
-        
-        if remaining <= 0:
-            message = f"☀️ Привет, {first_name}!\n\n🎉 Ты уже выполнил дневную норму! Можешь отдохнуть или сделать дополнительные отжимания для укрепления!"
-        else:
-            message = f"☀️ Привет, {first_name}!\n\n💪 Не забудь про тренировку!\n📊 Прогресс: {today_count}/{daily_goal}\n🎯 Осталось: {remaining}\n\nСделай перерыв и выполни часть отжиманий!"
-        
-        await bot.send_message(chat_id, message)
-        logging.info(f"Отправлено дневное напоминание пользователю {chat_id}")
-        
+        payload = load_reminder_payload(chat_id, first_name, db)
     except Exception as e:
-        logging.error(f"Ошибка при отправке дневного напоминания пользователю {chat_id}: {e}")
+        logging.error(f"Ошибка при подготовке напоминания пользователю {chat_id}: {e}")
+        return False
+    if payload:
+        return await send_reminder(bot, kind, payload)
+    return False
+
+
+async def send_morning_reminder(bot, chat_id, first_name, db=None):
+    """Отправка утреннего напоминания о тренировке."""
+    return await _send_single_reminder(bot, 'morning', chat_id, first_name, db)
+
+
+async def send_afternoon_reminder(bot, chat_id, first_name, db=None):
+    """Отправка дневного напоминания о тренировке."""
+    return await _send_single_reminder(bot, 'afternoon', chat_id, first_name, db)
 
 
-async def send_evening_reminder(bot, chat_id, first_name):
+async def send_evening_reminder(bot, chat_id, first_name, db=None):
     """Отправка вечернего напоминания о тренировке."""
-    try:
-        from src.infrastructure.database import DatabaseAdapter
-        
-        db = DatabaseAdapter()
-        user = db.get_user(chat_id)
-        
-        if not user:
-            return
-        
-        level = user.level
-        daily_goal = db.get_daily_goal(level)
-        today_count = db.get_today_activity_count(chat_id)
-        remaining = daily_goal - today_count
-        
-        if remaining <= 0:
-            message = f"🌙 Добрый вечер, {first_name}!\n\n🎉 Отличная работа! Ты выполнил дневную норму {daily_goal} отжиманий!\n\nСпокойной ночи и до завтра!"
-        else:
-            message = f"🌙 Добрый вечер, {first_name}!\n\n⚠️ Не забудь про тренировку!\n📊 Прогресс: {today_count}/{daily_goal}\n🎯 Осталось: {remaining}\n\nСделай финальный рывок и выполни оставшиеся отжимания!"
-        
-        await bot.send_message(chat_id, message)
-        logging.info(f"Отправлено вечернее напоминание пользователю {chat_id}")
-        
-    except Exception as e:
-        logging.error(f"Ошибка при отправке вечернего напоминания пользователю {chat_id}: {e}")
+    return await _send_single_reminder(bot, 'evening', chat_id, first_name, db)
 
 
 async def send_level_up_notification(bot, chat_id, first_name, new_level, new_goal):
     """Отправка уведомления о повышении уровня."""
     try:
-        level_names = {
-            1: "Новичок",
-            2: "Ученик", 
-            3: "Подмастерье",
-            4: "Мастер",
-            5: "Эксперт",
-            6: "Легенда"
-        }
-        
         message = f"🎊 Поздравляем, {first_name}!\n\n"
         message += f"🏆 Ты достиг нового уровня!\n"
-        message += f"📈 Уровень: {new_level} ({level_names.get(new_level, 'Неизвестный')})\n"
+        message += f"📈 Уровень: {new_level} ({UserService.get_user_level_name(new_level)})\n"
         message += f"🎯 Новая цель: {new_goal} отжиманий в день\n\n"
         message += f"Продолжай в том же духе! Ты становишься сильнее!"
         
-        await bot.send_message(chat_id, message)
-        logging.info(f"Отправлено уведомление о повышении уровня пользователю {chat_id}")
+        if await get_delivery_engine(bot).send_message(chat_id, message):
+            logging.info(f"Отправлено уведомление о повышении уровня пользователю {chat_id}")
         
     except Exception as e:
         logging.error(f"Ошибка при отправке уведомления о повышении уровня пользователю {chat_id}: {e}")
 
 
-async def send_weekly_progress_report(bot, chat_id, first_name):
-    """Отправка еженедельного отчета о прогрессе."""
+def _weekly_message(report: WeeklyReport) -> str:
+    """Текст еженедельного отчёта по итогам последних 7 дней."""
+    message = f"📊 Еженедельный отчет, {report.first_name}!\n\n"
+    message += f"📈 Уровень: {report.level}\n"
+    message += f"🎯 Дневная цель: {report.daily_goal} отжиманий\n"
+    message += f"📅 Дней с тренировкой: {report.days} из 7\n"
+    message += f"💪 Отжиманий за неделю: {report.pushups}\n"
+    message += f"✅ Цель выполнена: {report.goal_hits} из 7 дней\n"
+    if report.best_day:
+        best_day = date.fromisoformat(report.best_day).strftime('%d.%m')
+        message += f"🏆 Лучший день: {best_day} - {report.best_day_pushups} отжиманий\n"
+    message += "\n"
+    
+    if report.days >= 7:
+        message += "🎉 Отличная неделя! Ты тренировался каждый день!"
+    elif report.days >= 5:
+        message += "👍 Хорошая неделя! Продолжай в том же духе!"
+    elif report.days == 0:
+        message += "😴 На этой неделе тренировок не было. Начни с одного задания - это уже шаг вперёд!"
+    else:
+        message += "💪 На следующей неделе постарайся тренироваться чаще!"
+    return message
+
+
+async def send_weekly_report(bot, report: WeeklyReport):
+    """Отправка еженедельного отчёта по заранее посчитанным итогам.
+    
+    Возвращает True, если сообщение доставлено.
+    """
     try:
-        from src.infrastructure.database import DatabaseAdapter
-        
-        db = DatabaseAdapter()
-        user = db.get_user(chat_id)
-        
-        if not user:
-            return
-        
-        # Получаем статистику пользователя
-        stats = db.get_user_stats(chat_id)
-        
-        if not stats:
-            return
-        
-        # Формируем отчет
-        message = f"📊 Еженедельный отчет, {first_name}!\n\n"
-        message += f"📈 Уровень: {user.level}\n"
-        message += f"🎯 Дневная цель: {db.get_daily_goal(user.level)} отжиманий\n"
-        message += f"📅 Дней тренировки: {stats.days_count}\n"
-        message += f"💪 Всего отжиманий: {stats.total_pushups}\n\n"
-        
-        if stats.days_count >= 7:
-            message += "🎉 Отличная неделя! Ты тренировался каждый день!"
-        elif stats.days_count >= 5:
-            message += "👍 Хорошая неделя! Продолжай в том же духе!"
-        else:
-            message += "💪 На следующей неделе постарайся тренироваться чаще!"
-        
-        await bot.send_message(chat_id, message)
-        logging.info(f"Отправлен еженедельный отчет о прогрессе пользователю {chat_id}")
-        
+        if await get_delivery_engine(bot).send_message(report.chat_id, _weekly_message(report)):
+            logging.info(f"Отправлен еженедельный отчет о прогрессе пользователю {report.chat_id}")
+            return True
+    except Exception as e:
+        logging.error(f"Ошибка при отправке еженедельного отчета о прогрессе пользователю {report.chat_id}: {e}")
+    return False
+
+
+async def send_weekly_progress_report(bot, chat_id, first_name, db=None):
+    """Отправка еженедельного отчета о прогрессе одному пользователю."""
+    try:
+        if db is None:
+            db = get_database().reader()
+        reports = db.get_weekly_reports([chat_id])
     except Exception as e:
-        logging.error(f"Ошибка при отправке еженедельного отчета о прогрессе пользователю {chat_id}: {e}") 
\ No newline at end of file
+        logging.error(f"Ошибка при подготовке еженедельного отчета пользователю {chat_id}: {e}")
+        return False
+    if not reports:
+        return False
+    report = reports[0]
+    if first_name:
+        report.first_name = first_name
+    return await send_weekly_report(bot, report)
@@ -1,13 +1,28 @@
 import asyncio
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import logging
 import os
 from dotenv import load_dotenv
-from src.infrastructure.tasks import send_morning_reminder, send_afternoon_reminder, send_evening_reminder, send_weekly_progress_report
-from src.infrastructure.database import DatabaseAdapter
+from typing import List, Optional
+from src.domain.progression import install_reload_signal
+from src.domain.reminder_slots import current_buckets
+from src.infrastructure.scheduler_engine import Job, SchedulerEngine, every
+from src.infrastructure.dispatcher import (
+    DISPATCHER_CELERY,
+    CeleryDispatcher,
+    OutboxRelay,
+    notification_dispatcher_mode,
+)
+from src.infrastructure.provider import get_database
 
 load_dotenv()
 
+# Outbox: срок хранения записей (аренду и пачки настраивает OutboxRelay)
+OUTBOX_RETENTION_DAYS = int(os.getenv('OUTBOX_RETENTION_DAYS', '14'))
+
+# Случайная задержка рассылки внутри минуты, секунды
+SCHEDULER_JITTER_SECONDS = float(os.getenv('SCHEDULER_JITTER_SECONDS', '20'))
+
 # Создаём директорию для логов, если её нет
 log_dir = os.getenv('LOG_DIR', '.')
 if not os.path.exists(log_dir):
@@ -21,92 +36,132 @@ logging.basicConfig(
     level=logging.INFO,
 )
 
-def get_active_users():
-    """Получение активных пользователей из базы данных."""
-    try:
-        db = DatabaseAdapter()
-        users = db.get_all_active_users()
-        return [{'user_id': user[0], 'name': user[1]} for user in users]
-        
-    except Exception as e:
-        logging.error(f"Ошибка при получении активных пользователей: {e}")
-        return []
-
-async def schedule_morning_reminders():
-    """Отправка утренних напоминаний (8:00)."""
-    users = get_active_users()
-    if not users:
-        logging.info("Нет активных пользователей для отправки утренних напоминаний")
-        return
-    
-    for user in users:
-        send_morning_reminder.delay(user['user_id'])
-    logging.info(f"Отправлены утренние напоминания для {len(users)} пользователей")
-
-async def schedule_afternoon_reminders():
-    """Отправка дневных напоминаний (14:00)."""
-    users = get_active_users()
-    if not users:
-        logging.info("Нет активных пользователей для отправки дневных напоминаний")
-        return
-    
-    for user in users:
-        send_afternoon_reminder.delay(user['user_id'])
-    logging.info(f"Отправлены дневные напоминания для {len(users)} пользователей")
-
-async def schedule_evening_reminders():
-    """Отправка вечерних напоминаний (20:00)."""
-    users = get_active_users()
-    if not users:
-        logging.info("Нет активных пользователей для отправки вечерних напоминаний")
-        return
+def enqueue_slot(kind: str, fire_time: str, bucket: int) -> int:
+    """Запись получателей слота в outbox одним запросом на шард.
     
-    for user in users:
-        send_evening_reminder.delay(user['user_id'])
-    logging.info(f"Отправлены вечерние напоминания для {len(users)} пользователей")
-
-async def schedule_weekly_reports():
-    """Отправка еженедельных отчётов (воскресенье 18:00)."""
-    users = get_active_users()
-    if not users:
-        logging.info("Нет активных пользователей для отправки еженедельных отчётов")
-        return
+    Ошибка записи пробрасывается в движок: отметка минуты не сдвигается,
+    и минута повторяется, пока не попадёт в outbox.
+    """
+    return get_database().enqueue_outbox(kind, fire_time, bucket)
+
+# Relay outbox процесса: в режиме celery работает здесь, в режиме
+# inprocess - в процессе бота (main.py)
+_relay: Optional[OutboxRelay] = None
+
+async def schedule_morning_reminders(bucket: int, fire_time: str):
+    """Утренние напоминания (8:00 по времени пользователя) в outbox."""
+    total = enqueue_slot('morning', fire_time, bucket)
+    if total:
+        logging.info(f"Утренние напоминания для {total} пользователей (корзина {bucket}) записаны в outbox")
+
+async def schedule_afternoon_reminders(bucket: int, fire_time: str):
+    """Дневные напоминания (14:00 по времени пользователя) в outbox."""
+    total = enqueue_slot('afternoon', fire_time, bucket)
+    if total:
+        logging.info(f"Дневные напоминания для {total} пользователей (корзина {bucket}) записаны в outbox")
+
+async def schedule_evening_reminders(bucket: int, fire_time: str):
+    """Вечерние напоминания (20:00 по времени пользователя) в outbox."""
+    total = enqueue_slot('evening', fire_time, bucket)
+    if total:
+        logging.info(f"Вечерние напоминания для {total} пользователей (корзина {bucket}) записаны в outbox")
+
+async def schedule_weekly_reports(bucket: int, fire_time: str):
+    """Еженедельные отчёты (воскресенье 18:00 по времени пользователя) в outbox."""
+    total = enqueue_slot('weekly', fire_time, bucket)
+    if total:
+        logging.info(f"Еженедельные отчёты для {total} пользователей (корзина {bucket}) записаны в outbox")
+
+SLOT_JOBS = {
+    'morning': schedule_morning_reminders,
+    'afternoon': schedule_afternoon_reminders,
+    'evening': schedule_evening_reminders,
+    'weekly': schedule_weekly_reports,
+}
+
+async def dispatch_due_reminders(fire_time: datetime):
+    """Запись в outbox всех слотов, чья UTC-корзина совпала с минутой fire_time.
     
-    for user in users:
-        send_weekly_progress_report.delay(user['user_id'])
-    logging.info(f"Отправлены еженедельные отчёты для {len(users)} пользователей")
+    Ключ записи - (chat_id, вид, местная дата слота у пользователя),
+    поэтому повторный запуск той же минуты не создаёт дублей. Отправкой
+    занимается OutboxRelay в фоне: минутная задача не ждёт рассылку и не
+    пропускает следующие минуты.
+    """
+    fire_utc = fire_time.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    for slot, bucket in current_buckets(fire_time).items():
+        await SLOT_JOBS[slot](bucket, fire_utc)
+    if _relay is not None:
+        _relay.wake()
+
+async def prune_outbox():
+    """Удаление записей outbox старше OUTBOX_RETENTION_DAYS."""
+    try:
+        before = (datetime.now(timezone.utc) - timedelta(days=OUTBOX_RETENTION_DAYS)).date().isoformat()
+        removed = get_database().prune_outbox(before)
+        logging.info(f"Из outbox удалено {removed} записей до {before}")
+    except Exception as e:
+        logging.error(f"Ошибка при очистке outbox: {e}")
+
+async def refresh_schedule_buckets():
+    """Пересчёт корзин по текущим смещениям поясов (переход на летнее время)."""
+    try:
+        updated = get_database().refresh_schedule_buckets()
+        if updated:
+            logging.info(f"Корзины напоминаний пересчитаны для {updated} пользователей")
+    except Exception as e:
+        logging.error(f"Ошибка при пересчёте корзин напоминаний: {e}")
+
+async def slide_rollup_windows():
+    """Ночной сдвиг окон 7/30 дней в проекции статистики (00:05 UTC)."""
+    try:
+        db = get_database()
+        updated = db.slide_rollup_windows()
+        logging.info(f"Окна статистики сдвинуты для {updated} пользователей")
+    except Exception as e:
+        logging.error(f"Ошибка при сдвиге окон статистики: {e}")
+
+def build_jobs() -> List[Job]:
+    """Задачи планировщика; при совпадении времени выполняются в порядке списка."""
+    return [
+        # Смещения поясов меняются на границе часа: пересчитываем до рассылки
+        Job('refresh_schedule_buckets', every(60), lambda fire_time: refresh_schedule_buckets()),
+        # Каждую минуту - только пользователи, чей слот попал в эту UTC-корзину
+        Job('reminders', every(1), dispatch_due_reminders, jitter=SCHEDULER_JITTER_SECONDS),
+        # Окна статистики считаются по дате SQLite (UTC); пропуск догоняем в течение суток
+        Job('slide_rollup_windows', every(24 * 60, 5), lambda fire_time: slide_rollup_windows(),
+            grace=24 * 60 * 60),
+        Job('prune_outbox', every(24 * 60, 10), lambda fire_time: prune_outbox(), grace=24 * 60 * 60),
+    ]
 
 async def main():
     """Основная функция планировщика."""
-    logging.info("Планировщик запущен - уведомления трижды в день")
+    logging.info("Планировщик запущен - уведомления трижды в день по поясу пользователя")
     print("⏰ Планировщик запущен!")
-    print("📅 Расписание уведомлений:")
+    print("📅 Расписание уведомлений (по часовому поясу пользователя):")
     print("   🌅 8:00 - Утренние напоминания")
     print("   ☀️ 14:00 - Дневные напоминания") 
     print("   🌙 20:00 - Вечерние напоминания")
     print("   📊 Воскресенье 18:00 - Еженедельные отчёты")
+    print("   🗂️ 00:05 UTC - Сдвиг окон статистики")
+    print("   🧹 00:10 UTC - Очистка outbox")
     print("=" * 50)
     
-    while True:
-        now = datetime.now()
-        
-        # Утренние напоминания в 8:00
-        if now.hour == 8 and now.minute == 0:
-            await schedule_morning_reminders()
-        
-        # Дневные напоминания в 14:00
-        if now.hour == 14 and now.minute == 0:
-            await schedule_afternoon_reminders()
-        
-        # Вечерние напоминания в 20:00
-        if now.hour == 20 and now.minute == 0:
-            await schedule_evening_reminders()
-        
-        # Еженедельные отчёты в воскресенье в 18:00
-        if now.weekday() == 6 and now.hour == 18 and now.minute == 0:
-            await schedule_weekly_reports()
-        
-        await asyncio.sleep(60)
+    # kill -HUP <pid> перечитывает config/progression.json
+    install_reload_signal()
+    
+    global _relay
+    if notification_dispatcher_mode() == DISPATCHER_CELERY:
+        _relay = OutboxRelay(get_database(), CeleryDispatcher())
+        _relay.start()
+    else:
+        logging.info("Уведомления из outbox отправляет процесс бота (NOTIFICATION_DISPATCHER=inprocess)")
+    
+    engine = SchedulerEngine(build_jobs(), get_database())
+    try:
+        await engine.run_forever()
+    finally:
+        if _relay is not None:
+            await _relay.aclose()
 
 if __name__ == "__main__":
     try:
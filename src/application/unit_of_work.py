@@ -0,0 +1,94 @@
+"""
+Единица работы на одно обновление бота.
+
+Пользователь и сегодняшняя активность загружаются один раз и общие для
+всех сценариев обновления. Подход записывается сразу: ответ пользователю
+зависит от результата записи, и сообщать об успехе до фиксации нельзя;
+единица работы лишь обновляет по нему своё состояние.
+"""
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Optional
+
+from src.domain.entities import User
+from src.infrastructure.async_database import AsyncDatabaseAdapter, QueryCounter, current_query_counter
+from src.infrastructure.metrics import metrics
+
+_current: ContextVar[Optional['UnitOfWork']] = ContextVar('unit_of_work', default=None)
+
+
+class UnitOfWork:
+    """Общее состояние одного обновления."""
+    
+    def __init__(self, db: AsyncDatabaseAdapter, chat_id: int):
+        self.db = db
+        self.chat_id = chat_id
+        self.counter = QueryCounter()
+        self._user: Optional[User] = None
+        self._user_loaded = False
+        self._today_count: Optional[int] = None
+    
+    @property
+    def queries(self) -> int:
+        """Число обращений к базе за обновление."""
+        return self.counter.queries
+    
+    async def get_user(self) -> Optional[User]:
+        """Пользователь обновления."""
+        if not self._user_loaded:
+            self.remember_user(await self.db.get_user(self.chat_id))
+        return self._user
+    
+    async def get_today_activity_count(self) -> int:
+        """Сумма отжиманий пользователя за сегодня."""
+        if self._today_count is None:
+            self._today_count = await self.db.get_today_activity_count(self.chat_id)
+        return self._today_count
+    
+    def remember_user(self, user: Optional[User]) -> None:
+        """Запоминание состояния пользователя, полученного сценарием."""
+        self._user = user
+        self._user_loaded = True
+    
+    def forget_user(self) -> None:
+        """Сброс состояния после записи в обход единицы работы."""
+        self._user = None
+        self._user_loaded = False
+    
+    async def record_activity(self, pushups_count: int) -> Optional[User]:
+        """Запись подхода с обновлением состояния обновления.
+        
+        Сегодняшняя сумма растёт только при успешной записи.
+        """
+        user = await self.db.record_activity(self.chat_id, pushups_count)
+        if user is None:
+            return None
+        self.remember_user(user)
+        if self._today_count is not None:
+            self._today_count += pushups_count
+        return user
+
+
+def current_unit_of_work(chat_id: int) -> Optional[UnitOfWork]:
+    """Активная единица работы для chat_id или None."""
+    uow = _current.get()
+    if uow is not None and uow.chat_id == chat_id:
+        return uow
+    return None
+
+
+@asynccontextmanager
+async def unit_of_work(db: AsyncDatabaseAdapter, chat_id: int) -> AsyncIterator[UnitOfWork]:
+    """Единица работы на время обработки одного обновления."""
+    uow = UnitOfWork(db, chat_id)
+    uow_token = _current.set(uow)
+    counter_token = current_query_counter.set(uow.counter)
+    try:
+        yield uow
+    finally:
+        current_query_counter.reset(counter_token)
+        _current.reset(uow_token)
+        metrics.inc('uow.updates')
+        metrics.inc('uow.queries', uow.queries)
+        logging.debug(f"Обновление chat_id {chat_id}: запросов к базе {uow.queries}")
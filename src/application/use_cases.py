@@ -2,45 +2,67 @@
 Сценарии использования приложения - бизнес-операции.
 """
 import logging
-from typing import Optional
-from datetime import date
+import os
+from typing import Callable, Hashable, Optional
+from datetime import date, datetime, timezone
 
-from src.domain.entities import User, Task, UserStats
+from src.domain.entities import User, Task, UserStats, DetailedStats
+from src.domain.reminder_slots import is_valid_timezone
 from src.domain.services import TaskService, UserService, AchievementService
-from src.infrastructure.database import DatabaseAdapter
+from src.application.unit_of_work import current_unit_of_work
+from src.infrastructure.async_database import AsyncDatabaseAdapter
+from src.infrastructure.cache import LRUCache
 
 
 class UserUseCase:
     """Сценарии использования для управления пользователями."""
     
-    def __init__(self, db: DatabaseAdapter):
+    def __init__(self, db: AsyncDatabaseAdapter):
         self.db = db
     
-    def register_user(self, chat_id: int, first_name: str) -> Optional[User]:
+    async def register_user(self, chat_id: int, first_name: str) -> Optional[User]:
         """Регистрация или обновление пользователя."""
-        return self.db.save_user(chat_id, first_name)
+        user = await self.db.save_user(chat_id, first_name)
+        uow = current_unit_of_work(chat_id)
+        if uow:
+            uow.remember_user(user)
+        return user
     
-    def get_user(self, chat_id: int) -> Optional[User]:
+    async def get_user(self, chat_id: int) -> Optional[User]:
         """Получение пользователя по chat_id."""
-        return self.db.get_user(chat_id)
+        uow = current_unit_of_work(chat_id)
+        if uow:
+            return await uow.get_user()
+        return await self.db.get_user(chat_id)
     
-    def update_user_level(self, chat_id: int, new_level: int) -> bool:
+    async def update_user_level(self, chat_id: int, new_level: int) -> bool:
         """Обновление уровня пользователя."""
         if not UserService.is_valid_level(new_level):
             return False
-        return self.db.update_user_level(chat_id, new_level)
+        result = await self.db.update_user_level(chat_id, new_level)
+        uow = current_unit_of_work(chat_id)
+        if uow:
+            uow.forget_user()
+        return result
+    
+    async def set_timezone(self, chat_id: int, tz_name: str) -> bool:
+        """Смена часового пояса для напоминаний."""
+        if not is_valid_timezone(tz_name):
+            return False
+        return await self.db.set_user_timezone(chat_id, tz_name)
 
 
 class TaskUseCase:
     """Сценарии использования для управления заданиями."""
     
-    def __init__(self, db: DatabaseAdapter):
+    def __init__(self, db: AsyncDatabaseAdapter):
         self.db = db
     
-    def create_task(self, chat_id: int) -> Optional[Task]:
+    async def create_task(self, chat_id: int) -> Optional[Task]:
         """Создание нового задания для пользователя."""
         try:
-            user = self.db.get_user(chat_id)
+            uow = current_unit_of_work(chat_id)
+            user = await uow.get_user() if uow else await self.db.get_user(chat_id)
             if not user:
                 logging.error(f"Пользователь не найден для chat_id: {chat_id}")
                 return None
@@ -51,54 +73,68 @@ class TaskUseCase:
             logging.info(f"Создано задание для пользователя {chat_id}: {task.pushups_count} отжиманий")
             
             # Не сохраняем задание в базу данных пока - только при выполнении
-            # self.db.save_daily_activity(user.id, task.pushups_count)
+            # self.db.record_activity(chat_id, task.pushups_count)
             
             return task
         except Exception as e:
             logging.error(f"Ошибка при создании задания для chat_id {chat_id}: {e}")
             return None
     
-    def complete_task(self, chat_id: int, pushups_count: int) -> bool:
-        """Выполнение задания с пользовательским количеством отжиманий."""
+    async def _record(self, chat_id: int, pushups_count: int) -> Optional[User]:
+        """Запись подхода через единицу работы обновления, если она есть."""
+        uow = current_unit_of_work(chat_id)
+        if uow:
+            return await uow.record_activity(pushups_count)
+        return await self.db.record_activity(chat_id, pushups_count)
+    
+    async def complete_task(self, chat_id: int, pushups_count: int) -> Optional[User]:
+        """Выполнение задания с пользовательским количеством отжиманий.
+        
+        Возвращает обновлённого пользователя или None при ошибке.
+        """
         try:
-            user = self.db.get_user(chat_id)
+            user = await self._record(chat_id, pushups_count)
             if not user:
                 logging.error(f"Пользователь не найден для chat_id: {chat_id}")
-                return False
+                return None
             
-            result = self.db.save_daily_activity(user.id, pushups_count)
             logging.info(f"Задание выполнено для пользователя {chat_id}: {pushups_count} отжиманий")
-            return result
+            return user
         except Exception as e:
             logging.error(f"Ошибка при выполнении задания для chat_id {chat_id}: {e}")
-            return False
+            return None
     
-    def skip_task(self, chat_id: int) -> bool:
+    async def skip_task(self, chat_id: int) -> Optional[User]:
         """Пропуск сегодняшнего задания."""
         try:
-            user = self.db.get_user(chat_id)
+            user = await self._record(chat_id, 0)
             if not user:
                 logging.error(f"Пользователь не найден для chat_id: {chat_id}")
-                return False
+                return None
             
-            result = self.db.save_daily_activity(user.id, 0)
             logging.info(f"Задание пропущено для пользователя {chat_id}")
-            return result
+            return user
         except Exception as e:
             logging.error(f"Ошибка при пропуске задания для chat_id {chat_id}: {e}")
-            return False
+            return None
 
 
 class StatsUseCase:
     """Сценарии использования для статистики."""
     
-    def __init__(self, db: DatabaseAdapter):
-        self.db = db
+    def __init__(self, db: AsyncDatabaseAdapter):
+        # Статистика только читает: идёт по полосе только для чтения
+        self.db = db.reader()
+        # Отрисованные экраны статистики по (chat_id, версия, дата, вид)
+        self.versions = db.versions
+        self._rendered: LRUCache[str] = LRUCache(
+            'stats_text', max_size=int(os.getenv('STATS_CACHE_SIZE', '5000'))
+        )
     
-    def get_user_stats(self, chat_id: int) -> Optional[UserStats]:
+    async def get_user_stats(self, chat_id: int) -> Optional[UserStats]:
         """Получение статистики пользователя."""
         try:
-            stats = self.db.get_user_stats(chat_id)
+            stats = await self.db.get_user_stats(chat_id)
             if stats:
                 logging.info(f"Получена статистика для пользователя {chat_id}")
             else:
@@ -108,10 +144,40 @@ class StatsUseCase:
             logging.error(f"Ошибка при получении статистики для chat_id {chat_id}: {e}")
             return None
     
-    def check_today_activity(self, chat_id: int) -> bool:
+    async def get_detailed_stats(self, chat_id: int) -> Optional[DetailedStats]:
+        """Получение детальной статистики пользователя, включая сегодняшний день."""
+        try:
+            return await self.db.get_detailed_stats(chat_id)
+        except Exception as e:
+            logging.error(f"Ошибка при получении детальной статистики для chat_id {chat_id}: {e}")
+            return None
+    
+    async def render_detailed_stats(self, chat_id: int, view: Hashable,
+                                    render: Callable[[DetailedStats], str]) -> Optional[str]:
+        """Текст экрана статистики, пересчитываемый только после изменений.
+        
+        Ключ кэша включает версию пользователя, которую увеличивает каждая
+        запись, и дату (UTC, как CURRENT_DATE в SQLite) - сегодняшние и
+        недельные цифры меняются в полночь.
+        """
+        key = (chat_id, self.versions.get(chat_id), datetime.now(timezone.utc).date(), view)
+        text = self._rendered.get(key)
+        if text is None:
+            stats = await self.get_detailed_stats(chat_id)
+            if not stats:
+                return None
+            text = render(stats)
+            self._rendered.set(key, text)
+        return text
+    
+    async def check_today_activity(self, chat_id: int) -> bool:
         """Проверка, выполнил ли пользователь активность сегодня."""
         try:
-            result = self.db.check_today_activity(chat_id)
+            uow = current_unit_of_work(chat_id)
+            if uow:
+                result = await uow.get_today_activity_count() > 0
+            else:
+                result = await self.db.check_today_activity(chat_id)
             logging.info(f"Проверка активности для пользователя {chat_id}: {result}")
             return result
         except Exception as e:
@@ -122,16 +188,19 @@ class StatsUseCase:
 class AchievementUseCase:
     """Сценарии использования для достижений."""
     
-    def __init__(self, db: DatabaseAdapter):
+    def __init__(self, db: AsyncDatabaseAdapter):
         self.db = db
     
-    def check_achievements(self, chat_id: int) -> Optional[str]:
+    async def check_achievements(self, chat_id: int) -> Optional[str]:
         """Проверка и возврат сообщения о достижении."""
-        stats = self.db.get_user_stats(chat_id)
-        if not stats:
+        # users.days обновляется при каждой записи, поэтому после
+        # complete_task пользователь берётся из единицы работы или кэша
+        uow = current_unit_of_work(chat_id)
+        user = await uow.get_user() if uow else await self.db.get_user(chat_id)
+        if not user:
             return None
         
-        return AchievementService.get_achievement_message(stats.days_count)
+        return AchievementService.get_achievement_message(user.days)
     
     def get_motivational_message(self) -> str:
         """Получение случайного мотивирующего сообщения."""
@@ -41,6 +41,48 @@ class UserStats:
     last_activity: Optional[str]
 
 
+@dataclass
+class DetailedStats:
+    """Detailed user statistics entity."""
+    user: User
+    total_days: int
+    total_pushups: int
+    first_activity: Optional[str]
+    last_activity: Optional[str]
+    week_days: int
+    week_pushups: int
+    month_days: int
+    month_pushups: int
+    avg_per_day: float
+    today_count: int
+    best_day: Optional[str]
+    best_day_pushups: int
+
+
+@dataclass
+class ReminderPayload:
+    """Everything a reminder needs, materialized at dispatch time."""
+    chat_id: int
+    first_name: str
+    level: int
+    daily_goal: int
+    today_count: int
+
+
+@dataclass
+class WeeklyReport:
+    """Last 7 days of one user, aggregated for the weekly report."""
+    chat_id: int
+    first_name: str
+    level: int
+    daily_goal: int
+    days: int
+    pushups: int
+    best_day: Optional[str]
+    best_day_pushups: int
+    goal_hits: int
+
+
 @dataclass
 class Task:
     """Task entity."""
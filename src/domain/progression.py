@@ -0,0 +1,164 @@
+"""
+Progression config - levels, daily goals, task ranges, level names and
+achievements.
+
+The JSON config is loaded and validated once into tuples indexed by level.
+Lookups are O(1) and allocate nothing. Sending SIGHUP re-reads the file.
+An invalid config is logged, and the previous tables stay active.
+"""
+import json
+import logging
+import os
+import signal
+from pathlib import Path
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional, Tuple
+
+DEFAULT_CONFIG_PATH = Path(__file__).resolve().parents[2] / 'config' / 'progression.json'
+
+
+class ProgressionConfigError(ValueError):
+    """Invalid progression config."""
+
+
+class Progression(NamedTuple):
+    """Compiled progression tables; index 0 holds the fallback for unknown levels."""
+    max_level: int
+    level_up_streak_days: int
+    names: Tuple[str, ...]
+    daily_goals: Tuple[int, ...]
+    task_ranges: Tuple[Tuple[int, int], ...]
+    achievements: Mapping[int, str]
+    
+    def _index(self, level: int) -> int:
+        return level if 1 <= level <= self.max_level else 0
+    
+    def is_valid_level(self, level: int) -> bool:
+        return 1 <= level <= self.max_level
+    
+    def level_name(self, level: int) -> str:
+        return self.names[self._index(level)]
+    
+    def daily_goal(self, level: int) -> int:
+        return self.daily_goals[self._index(level)]
+    
+    def task_range(self, level: int) -> Tuple[int, int]:
+        return self.task_ranges[self._index(level)]
+    
+    def achievement(self, days_count: int) -> Optional[str]:
+        return self.achievements.get(days_count)
+
+
+def _positive_int(value, field: str) -> int:
+    if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+        raise ProgressionConfigError(f"{field} must be a positive integer, got {value!r}")
+    return value
+
+
+def compile_progression(raw: dict) -> Progression:
+    """Validate raw config and build the lookup tables."""
+    if not isinstance(raw, dict):
+        raise ProgressionConfigError("config root must be an object")
+    levels = raw.get('levels')
+    if not isinstance(levels, list) or not levels:
+        raise ProgressionConfigError("levels must be a non-empty list")
+    if not all(isinstance(item, dict) for item in levels):
+        raise ProgressionConfigError("each level must be an object")
+    
+    numbers = [item.get('level') for item in levels]
+    if not all(type(number) is int for number in numbers):
+        raise ProgressionConfigError(f"level numbers must be integers, got {numbers}")
+    levels = sorted(levels, key=lambda item: item['level'])
+    numbers = [item['level'] for item in levels]
+    if numbers != list(range(1, len(levels) + 1)):
+        raise ProgressionConfigError(f"levels must be numbered 1..N without gaps, got {numbers}")
+    
+    names, goals, ranges = [], [], []
+    for item in levels:
+        field = f"level {item['level']}"
+        name = item.get('name')
+        if not isinstance(name, str) or not name:
+            raise ProgressionConfigError(f"{field}: name must be a non-empty string")
+        goal = _positive_int(item.get('daily_goal'), f"{field}: daily_goal")
+        task_range = item.get('task_range')
+        if not isinstance(task_range, list) or len(task_range) != 2:
+            raise ProgressionConfigError(f"{field}: task_range must be [min, max]")
+        low = _positive_int(task_range[0], f"{field}: task_range min")
+        high = _positive_int(task_range[1], f"{field}: task_range max")
+        if low > high:
+            raise ProgressionConfigError(f"{field}: task_range min is greater than max")
+        names.append(name)
+        goals.append(goal)
+        ranges.append((low, high))
+    
+    raw_achievements = raw.get('achievements', [])
+    if not isinstance(raw_achievements, list):
+        raise ProgressionConfigError("achievements must be a list")
+    achievements = {}
+    for item in raw_achievements:
+        if not isinstance(item, dict):
+            raise ProgressionConfigError("each achievement must be an object")
+        days = _positive_int(item.get('days'), "achievement days")
+        message = item.get('message')
+        if not isinstance(message, str) or not message:
+            raise ProgressionConfigError(f"achievement {days}: message must be a non-empty string")
+        if days in achievements:
+            raise ProgressionConfigError(f"achievement {days}: duplicate days")
+        achievements[days] = message
+    
+    # Unknown levels get level 1's goal and task range, as before
+    return Progression(
+        max_level=len(levels),
+        level_up_streak_days=_positive_int(raw.get('level_up_streak_days', 7), "level_up_streak_days"),
+        names=("Неизвестный", *names),
+        daily_goals=(goals[0], *goals),
+        task_ranges=(ranges[0], *ranges),
+        achievements=MappingProxyType(achievements),
+    )
+
+
+def load_progression(path: Optional[str] = None) -> Progression:
+    """Read and compile the config (PROGRESSION_CONFIG or the bundled file)."""
+    path = path or os.getenv('PROGRESSION_CONFIG') or DEFAULT_CONFIG_PATH
+    try:
+        with open(path, encoding='utf-8') as config_file:
+            raw = json.load(config_file)
+    except (OSError, ValueError) as e:
+        raise ProgressionConfigError(f"cannot read {path}: {e}") from e
+    return compile_progression(raw)
+
+
+_progression = load_progression()
+
+
+def get_progression() -> Progression:
+    """Current progression tables."""
+    return _progression
+
+
+def reload_progression(path: Optional[str] = None) -> bool:
+    """Re-read the config; keep the current tables if it is invalid."""
+    global _progression
+    try:
+        progression = load_progression(path)
+    except ProgressionConfigError as e:
+        logging.error(f"Progression config not reloaded: {e}")
+        return False
+    except Exception as e:
+        # Runs from the SIGHUP handler: nothing may escape into the event loop
+        logging.exception(f"Progression config not reloaded, unexpected error: {e}")
+        return False
+    _progression = progression
+    logging.info(f"Progression config reloaded: {progression.max_level} levels")
+    return True
+
+
+def install_reload_signal() -> None:
+    """Reload the config on SIGHUP (where the platform has it).
+    
+    Every long-lived process that reads the tables installs it: the bot
+    (main.py) and the scheduler. Celery workers are not covered - SIGHUP to
+    the Celery master restarts its worker processes, which load the file anew.
+    """
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, lambda signum, frame: reload_progression())
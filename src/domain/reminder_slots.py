@@ -0,0 +1,83 @@
+"""
+Reminder slots and per-user time zones.
+
+Slots are defined in the user's local time. For the scheduler they are
+stored as UTC minute-of-day buckets (minute-of-week for the weekly
+report). Each tick then selects only the users due in the current minute.
+The zone's current UTC offset is stored next to the buckets so that a
+slot is keyed on the user's local date, not the UTC date of the tick.
+"""
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Optional
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:  # Python 3.8
+    from backports.zoneinfo import ZoneInfo, ZoneInfoNotFoundError  # type: ignore
+
+# Local minute-of-day for the daily reminders
+DAILY_SLOTS: Dict[str, int] = {
+    'morning': 8 * 60,
+    'afternoon': 14 * 60,
+    'evening': 20 * 60,
+}
+
+# Weekly report: Sunday (weekday 6) at 18:00 local time
+WEEKLY_SLOT = (6, 18 * 60)
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+DEFAULT_TIMEZONE = os.getenv('DEFAULT_TIMEZONE', 'Europe/Moscow')
+
+
+def is_valid_timezone(name: str) -> bool:
+    """Check that name is a known IANA time zone."""
+    try:
+        ZoneInfo(name)
+        return True
+    except (ZoneInfoNotFoundError, ValueError, OSError):
+        # OSError: names longer than the file system allows
+        return False
+
+
+def utc_offset(tz_name: str, now: Optional[datetime] = None) -> int:
+    """Current UTC offset of the zone in minutes (east of UTC is positive)."""
+    now = now or datetime.now(timezone.utc)
+    offset = now.astimezone(ZoneInfo(tz_name)).utcoffset() or timedelta(0)
+    return int(offset.total_seconds() // 60)
+
+
+def utc_buckets(tz_name: str, now: Optional[datetime] = None) -> Dict[str, int]:
+    """UTC buckets of every slot for the zone, using the zone's current offset.
+    
+    Returns minute-of-day for the daily slots and minute-of-week for 'weekly'.
+    """
+    zone = ZoneInfo(tz_name)
+    now = now or datetime.now(timezone.utc)
+    local_day: date = now.astimezone(zone).date()
+    
+    def to_utc(day: date, minute: int) -> datetime:
+        local = datetime.combine(day, time(minute // 60, minute % 60), tzinfo=zone)
+        return local.astimezone(timezone.utc)
+    
+    buckets = {}
+    for slot, minute in DAILY_SLOTS.items():
+        fire = to_utc(local_day, minute)
+        buckets[slot] = fire.hour * 60 + fire.minute
+    
+    weekday, minute = WEEKLY_SLOT
+    sunday = local_day + timedelta(days=(weekday - local_day.weekday()) % 7)
+    fire = to_utc(sunday, minute)
+    buckets['weekly'] = fire.weekday() * MINUTES_PER_DAY + fire.hour * 60 + fire.minute
+    return buckets
+
+
+def current_buckets(now: datetime) -> Dict[str, int]:
+    """Buckets due at the UTC minute now."""
+    now = now.astimezone(timezone.utc)
+    minute_of_day = now.hour * 60 + now.minute
+    buckets = {slot: minute_of_day for slot in DAILY_SLOTS}
+    buckets['weekly'] = now.weekday() * MINUTES_PER_DAY + minute_of_day
+    return buckets
@@ -6,6 +6,7 @@ from datetime import date
 from typing import Optional
 
 from src.domain.entities import User, Task
+from src.domain.progression import get_progression
 
 
 class TaskService:
@@ -25,20 +26,8 @@ class TaskService:
     
     @staticmethod
     def _random_pushups(level: int) -> int:
-        """Generate random pushups count based on level."""
-        levels = {
-            1: (5, 15),    # Начинающий
-            2: (10, 25),   # Новичок
-            3: (15, 35),   # Средний
-            4: (20, 45),   # Продвинутый
-            5: (25, 60),   # Эксперт
-            6: (30, 80)    # Мастер
-        }
-        
-        if level not in levels:
-            level = 1
-        
-        min_pushups, max_pushups = levels[level]
+        """Generate random pushups count based on level (unknown levels use level 1)."""
+        min_pushups, max_pushups = get_progression().task_range(level)
         return randint(min_pushups, max_pushups)
 
 
@@ -48,20 +37,12 @@ class UserService:
     @staticmethod
     def get_user_level_name(level: int) -> str:
         """Get user level name."""
-        levels = {
-            1: "Начинающий",
-            2: "Новичок", 
-            3: "Средний",
-            4: "Продвинутый",
-            5: "Эксперт",
-            6: "Мастер"
-        }
-        return levels.get(level, "Неизвестный")
+        return get_progression().level_name(level)
     
     @staticmethod
     def is_valid_level(level: int) -> bool:
         """Check if level is valid."""
-        return 1 <= level <= 6
+        return get_progression().is_valid_level(level)
 
 
 class AchievementService:
@@ -70,15 +51,7 @@ class AchievementService:
     @staticmethod
     def get_achievement_message(days_count: int) -> Optional[str]:
         """Get achievement message for days count."""
-        rewards = {
-            7: "🎉 Неделя тренировок! Ты на правильном пути!",
-            14: "🏆 Две недели! Ты формируешь привычку!",
-            30: "👑 Месяц тренировок! Ты настоящий чемпион!",
-            50: "💎 50 дней! Ты железный человек!",
-            100: "🌟 100 дней! Ты легенда!"
-        }
-        
-        return rewards.get(days_count)
+        return get_progression().achievement(days_count)
     
     @staticmethod
     def get_motivational_message() -> str:
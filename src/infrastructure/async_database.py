@@ -0,0 +1,258 @@
+"""
+Асинхронный адаптер базы данных - выполняет вызовы SQLite в пуле потоков,
+не блокируя цикл событий aiogram.
+"""
+import asyncio
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+from src.domain.entities import User, UserStats, DetailedStats
+from src.infrastructure.cache import LRUCache, VersionRegistry
+from src.infrastructure.database import DatabaseAdapter
+from src.infrastructure.metrics import metrics
+from src.infrastructure.shared_cache import SharedCache
+from src.infrastructure.write_behind import ActivityWriteBehind
+
+
+class QueryCounter:
+    """Счётчик обращений к базе в рамках одного обновления бота."""
+    
+    def __init__(self):
+        self.queries = 0
+
+
+# Счётчик текущего обновления; выставляется единицей работы
+current_query_counter: ContextVar[Optional[QueryCounter]] = ContextVar(
+    'db_query_counter', default=None
+)
+
+
+def _count_query() -> None:
+    counter = current_query_counter.get()
+    if counter is not None:
+        counter.queries += 1
+
+
+class AsyncDatabaseAdapter:
+    """Асинхронная обёртка над DatabaseAdapter с ограниченным пулом потоков."""
+    
+    def __init__(self, db: DatabaseAdapter, max_workers: Optional[int] = None,
+                 write_behind: Optional[bool] = None, lane: str = 'executor',
+                 user_cache: Optional[LRUCache[User]] = None,
+                 versions: Optional[VersionRegistry] = None,
+                 shared_cache: Optional[SharedCache] = None):
+        self.db = db
+        if max_workers is None:
+            max_workers = int(os.getenv('DB_EXECUTOR_WORKERS', '4'))
+        if max_workers < 1:
+            raise ValueError("Размер пула потоков базы должен быть не меньше 1")
+        self.max_workers = max_workers
+        self.lane = lane
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'db-{lane}')
+        
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._running = 0
+        self._reader: Optional['AsyncDatabaseAdapter'] = None
+        
+        metrics.register_gauge(f'db.{lane}.max_workers', lambda: self.max_workers)
+        metrics.register_gauge(f'db.{lane}.running', lambda: self._running)
+        metrics.register_gauge(f'db.{lane}.queued', lambda: self._submitted - self._running)
+        
+        # Кэш пользователей по chat_id. Его наполняет и обновляет только
+        # полоса записи: она видит результат каждой своей записи.
+        if user_cache is None and lane == 'executor':
+            user_cache = LRUCache(
+                'users',
+                max_size=int(os.getenv('USER_CACHE_SIZE', '10000')),
+                ttl=float(os.getenv('USER_CACHE_TTL', '300')),
+            )
+        self.user_cache = user_cache
+        
+        # Версии данных пользователей: каждая запись увеличивает версию,
+        # по ней сбрасываются кэши отрисованной статистики
+        if versions is None:
+            versions = VersionRegistry(
+                'users', max_size=int(os.getenv('USER_CACHE_SIZE', '10000'))
+            )
+        self.versions = versions
+        
+        # Общий кэш других процессов: после записи увеличиваем в нём версию
+        # пользователя, а по записям других процессов сбрасываем свои кэши
+        self.shared_cache = shared_cache
+        if shared_cache is not None and lane == 'executor':
+            shared_cache.subscribe(self._on_remote_write)
+        
+        # Групповой коммит подходов включается явно (DB_WRITE_BEHIND=1)
+        if write_behind is None:
+            write_behind = os.getenv('DB_WRITE_BEHIND', '0') == '1'
+        self._write_behind: Optional[ActivityWriteBehind] = None
+        if write_behind:
+            self._write_behind = ActivityWriteBehind(self.record_activities)
+    
+    def reader(self) -> 'AsyncDatabaseAdapter':
+        """Полоса только для чтения со своим пулом потоков.
+        
+        Долгие чтения статистики не занимают потоки, через которые
+        идут записи подходов.
+        """
+        if self._reader is None:
+            self._reader = AsyncDatabaseAdapter(
+                self.db.reader(),
+                max_workers=int(os.getenv('DB_READ_EXECUTOR_WORKERS', '4')),
+                write_behind=False,
+                lane='read_executor',
+                versions=self.versions,
+            )
+        return self._reader
+    
+    def _call(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Выполнение вызова в потоке пула с учётом метрик."""
+        with self._lock:
+            self._running += 1
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._submitted -= 1
+    
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Передача синхронного вызова в пул потоков."""
+        with self._lock:
+            self._submitted += 1
+        metrics.inc(f'db.{self.lane}.calls')
+        _count_query()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(self._call, func, *args)
+        )
+    
+    async def _write(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Запись с инвалидацией общего кэша в том же потоке пула.
+        
+        Версия в общем кэше увеличивается сразу после фиксации записи,
+        не занимая цикл событий сетевым вызовом.
+        """
+        if self.shared_cache is None:
+            return await self._run(func, *args)
+        return await self._run(self._write_through, func, *args)
+    
+    def _write_through(self, func: Callable[..., Any], *args: Any) -> Any:
+        result = func(*args)
+        users = result if isinstance(result, list) else [result]
+        self._bump_shared(user.chat_id for user in users if user is not None)
+        return result
+    
+    def _update_level_through(self, chat_id: int, new_level: int) -> bool:
+        try:
+            return self.db.update_user_level(chat_id, new_level)
+        finally:
+            self._bump_shared([chat_id])
+    
+    def _bump_shared(self, chat_ids: Iterable[int]) -> None:
+        try:
+            self.shared_cache.bump(chat_ids)
+        except Exception as e:
+            logging.error(f"Не удалось инвалидировать общий кэш: {e}")
+    
+    def _on_remote_write(self, chat_id: int) -> None:
+        """Сброс локальных кэшей после записи в другом процессе."""
+        if self.user_cache is not None:
+            self.user_cache.invalidate(chat_id)
+        self.versions.bump(chat_id)
+    
+    def _remember(self, user: Optional[User]) -> Optional[User]:
+        """Обновление кэша пользователей прочитанным состоянием."""
+        if user is not None and self.user_cache is not None:
+            self.user_cache.set(user.chat_id, user)
+        return user
+    
+    def _written(self, user: Optional[User]) -> Optional[User]:
+        """Обновление кэша и версии пользователя после записи."""
+        if user is not None:
+            self.versions.bump(user.chat_id)
+        return self._remember(user)
+    
+    async def save_user(self, chat_id: int, first_name: str) -> Optional[User]:
+        """Сохранение или обновление пользователя."""
+        return self._written(await self._write(self.db.save_user, chat_id, first_name))
+    
+    async def get_user(self, chat_id: int) -> Optional[User]:
+        """Получение пользователя по chat_id (из кэша, если он там есть)."""
+        if self.user_cache is not None:
+            user = self.user_cache.get(chat_id)
+            if user is not None:
+                return user
+        return self._remember(await self._run(self.db.get_user, chat_id))
+    
+    async def save_daily_activity(self, user_id: int, pushups_count: int) -> Optional[User]:
+        """Сохранение ежедневной активности по id пользователя."""
+        return self._written(await self._write(self.db.save_daily_activity, user_id, pushups_count))
+    
+    async def record_activity(self, chat_id: int, pushups_count: int) -> Optional[User]:
+        """Сохранение ежедневной активности по chat_id."""
+        if self._write_behind:
+            _count_query()
+            return self._written(await self._write_behind.submit(chat_id, pushups_count))
+        return self._written(await self._write(self.db.record_activity, chat_id, pushups_count))
+    
+    async def record_activities(self, items: List[Tuple[int, int]]) -> List[Optional[User]]:
+        """Запись пачки подходов одной транзакцией."""
+        users = await self._write(self.db.record_activities, items)
+        for user in users:
+            self._written(user)
+        return users
+    
+    async def get_user_stats(self, chat_id: int) -> Optional[UserStats]:
+        """Получение статистики пользователя."""
+        return await self._run(self.db.get_user_stats, chat_id)
+    
+    async def check_today_activity(self, chat_id: int) -> bool:
+        """Проверка активности за сегодня."""
+        return await self._run(self.db.check_today_activity, chat_id)
+    
+    async def update_user_level(self, chat_id: int, new_level: int) -> bool:
+        """Обновление уровня пользователя."""
+        try:
+            if self.shared_cache is not None:
+                return await self._run(self._update_level_through, chat_id, new_level)
+            return await self._run(self.db.update_user_level, chat_id, new_level)
+        finally:
+            if self.user_cache is not None:
+                self.user_cache.invalidate(chat_id)
+            self.versions.bump(chat_id)
+    
+    async def set_user_timezone(self, chat_id: int, tz_name: str) -> bool:
+        """Смена часового пояса пользователя."""
+        return await self._run(self.db.set_user_timezone, chat_id, tz_name)
+    
+    def get_daily_goal(self, level: int) -> int:
+        """Получение ежедневной цели по уровню (без обращения к базе)."""
+        return self.db.get_daily_goal(level)
+    
+    async def get_today_activity_count(self, chat_id: int) -> int:
+        """Получение количества отжиманий за сегодня."""
+        return await self._run(self.db.get_today_activity_count, chat_id)
+    
+    async def get_detailed_stats(self, chat_id: int) -> Optional[DetailedStats]:
+        """Получение детальной статистики пользователя."""
+        return await self._run(self.db.get_detailed_stats, chat_id)
+    
+    async def aclose(self) -> None:
+        """Дописывает отложенные подходы и закрывает адаптер."""
+        if self._write_behind:
+            await self._write_behind.close()
+        self.close()
+    
+    def close(self) -> None:
+        """Дожидается текущих вызовов и закрывает соединения."""
+        if self._reader is not None:
+            self._reader._executor.shutdown(wait=True)
+        self._executor.shutdown(wait=True)
+        self.db.close()
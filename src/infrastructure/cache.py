@@ -0,0 +1,100 @@
+"""
+Ограниченный LRU-кэш с временем жизни записей.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+from src.infrastructure.metrics import metrics
+
+V = TypeVar('V')
+
+
+class LRUCache(Generic[V]):
+    """Потокобезопасный LRU-кэш с TTL и счётчиками попаданий/промахов.
+    
+    Метрики пишутся как cache.<name>.hits / misses / evictions / expired.
+    """
+    
+    def __init__(self, name: str, max_size: int, ttl: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        if max_size < 1:
+            raise ValueError("Размер кэша должен быть не меньше 1")
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Hashable, Tuple[float, V]]' = OrderedDict()
+        metrics.register_gauge(f'cache.{name}.size', lambda: len(self._entries))
+    
+    def get(self, key: Hashable) -> Optional[V]:
+        """Значение по ключу или None при промахе."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at >= self._clock():
+                    self._entries.move_to_end(key)
+                    metrics.inc(f'cache.{self.name}.hits')
+                    return value
+                del self._entries[key]
+                metrics.inc(f'cache.{self.name}.expired')
+        metrics.inc(f'cache.{self.name}.misses')
+        return None
+    
+    def set(self, key: Hashable, value: V) -> None:
+        """Сохранение значения с вытеснением самых старых записей."""
+        expires_at = self._clock() + self.ttl if self.ttl is not None else float('inf')
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                metrics.inc(f'cache.{self.name}.evictions')
+    
+    def invalidate(self, key: Hashable) -> None:
+        """Удаление записи."""
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self) -> None:
+        """Очистка кэша."""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class VersionRegistry:
+    """Версии данных по ключу для инвалидации производных кэшей.
+    
+    Версии берутся из общего возрастающего счётчика, поэтому ключ, вытесненный
+    из реестра, получает новую версию и не совпадёт со старыми записями.
+    """
+    
+    def __init__(self, name: str, max_size: int):
+        self._versions: LRUCache[int] = LRUCache(f'{name}_versions', max_size=max_size)
+        self._lock = threading.Lock()
+        self._sequence = 0
+    
+    def _next(self) -> int:
+        with self._lock:
+            self._sequence += 1
+            return self._sequence
+    
+    def get(self, key: Hashable) -> int:
+        """Текущая версия ключа."""
+        version = self._versions.get(key)
+        if version is None:
+            version = self._next()
+            self._versions.set(key, version)
+        return version
+    
+    def bump(self, key: Hashable) -> int:
+        """Новая версия ключа после изменения данных."""
+        version = self._next()
+        self._versions.set(key, version)
+        return version
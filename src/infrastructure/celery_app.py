@@ -19,4 +19,6 @@ celery_app.conf.update(
     result_serializer='json',
     timezone='Europe/Moscow',
     enable_utc=True,
+    # Все задачи - уведомления без результата: бэкенд не хранит запись на каждую
+    task_ignore_result=True,
 ) 
\ No newline at end of file
@@ -4,21 +4,306 @@
 import sqlite3
 import logging
 import os
+import threading
+import uuid
+from contextlib import contextmanager
 from datetime import datetime, date
-from typing import Optional, List, Tuple
+from pathlib import Path
+from typing import Dict, Iterator, Optional, List, Tuple
 
-from src.domain.entities import User, DailyActivity, UserStats
+from src.domain.entities import User, DailyActivity, UserStats, DetailedStats, ReminderPayload, WeeklyReport
+from src.domain.progression import get_progression
+from src.domain.reminder_slots import DAILY_SLOTS, DEFAULT_TIMEZONE, utc_buckets, utc_offset
+from src.infrastructure.metrics import metrics
+
+# Режимы работы с соединениями:
+# off    - новое соединение на каждый вызов (поведение по умолчанию)
+# thread - одно долгоживущее настроенное соединение на поток
+POOL_MODE_OFF = 'off'
+POOL_MODE_THREAD = 'thread'
+POOL_MODES = (POOL_MODE_OFF, POOL_MODE_THREAD)
+
+# Версия схемы после всех миграций (PRAGMA user_version)
+SCHEMA_VERSION = 9
+
+# Горячие запросы к daily_activity. Вынесены в константы, чтобы
+# проверка планов (explain_hot_queries) смотрела ровно на то, что выполняется.
+SQL_UPSERT_DAILY_ACTIVITY = """
+    INSERT INTO daily_activity (user_id, activity_date, pushups_count, completed)
+    VALUES (?, CURRENT_DATE, ?, TRUE)
+    ON CONFLICT (user_id, activity_date) DO UPDATE
+    SET pushups_count = pushups_count + excluded.pushups_count, completed = TRUE
+    RETURNING pushups_count
+"""
+
+SQL_CHECK_TODAY_ACTIVITY = """
+    SELECT SUM(pushups_count) FROM daily_activity da
+    JOIN users u ON da.user_id = u.id
+    WHERE u.chat_id = ? AND da.activity_date = CURRENT_DATE AND da.completed = TRUE
+"""
+
+SQL_TODAY_ACTIVITY_COUNT = """
+    SELECT SUM(pushups_count) 
+    FROM daily_activity 
+    WHERE user_id = (SELECT id FROM users WHERE chat_id = ?) 
+    AND activity_date = CURRENT_DATE
+"""
+
+# Слоты напоминаний: колонка user_schedule с UTC-корзиной (минута суток,
+# для weekly - минута недели) и своим индексом
+SCHEDULE_SLOTS = (*DAILY_SLOTS, 'weekly')
+SCHEDULE_COLUMNS = {slot: f"{slot}_minute" for slot in SCHEDULE_SLOTS}
+
+# Постановка слота в outbox одним INSERT ... SELECT по индексу слота;
+# уже записанные ключи (chat_id, kind, slot_date) пропускаются. slot_date -
+# местная дата пользователя: UTC-время запуска плюс смещение его пояса;
+# due_at - само UTC-время запуска, по нему устаревшие записи не выдаются
+SQL_ENQUEUE_OUTBOX = {
+    slot: f"""
+        INSERT OR IGNORE INTO outbox (chat_id, kind, slot_date, due_at)
+        SELECT u.chat_id, :kind, date(:fire_time, s.utc_offset || ' minutes'), :fire_time
+        FROM user_schedule s
+        JOIN users u ON u.id = s.user_id
+        WHERE s.{column} = :bucket AND u.last_activity_date IS NOT NULL
+    """
+    for slot, column in SCHEDULE_COLUMNS.items()
+}
+
+# Неотправленные записи outbox с данными для сообщения: свежие или с
+# истёкшей арендой (воркер не отметил отправку), не старше окна свежести.
+# Сумма отжиманий - за местную дату слота, а не за текущую дату UTC
+SQL_CLAIMABLE_OUTBOX = """
+    SELECT o.id, o.kind, o.slot_date,
+        u.chat_id, u.first_name, u.level, COALESCE(da.pushups_count, 0)
+    FROM outbox o
+    JOIN users u ON u.chat_id = o.chat_id
+    LEFT JOIN daily_activity da
+        ON da.user_id = u.id AND da.activity_date = o.slot_date
+    WHERE o.sent_at IS NULL AND o.due_at >= ? AND o.attempts < ?
+        AND (o.claimed_at IS NULL OR o.claimed_at < ?)
+    ORDER BY o.due_at, o.id
+    LIMIT ?
+"""
+
+# Недельные итоги пачки пользователей одним сгруппированным запросом:
+# дни с тренировкой, сумма, лучший день и дни с выполненной целью.
+# {goal} - выражение CASE с целями уровней из прогрессии; лучший день -
+# «голый» столбец строки с MAX(pushups_count) (поведение SQLite).
+SQL_WEEKLY_REPORTS = """
+    SELECT u.chat_id, u.first_name, u.level, {goal},
+        COALESCE(SUM(w.pushups_count > 0), 0),
+        COALESCE(SUM(w.pushups_count), 0),
+        w.activity_date,
+        COALESCE(MAX(w.pushups_count), 0),
+        COALESCE(SUM(w.pushups_count >= {goal}), 0)
+    FROM users u
+    LEFT JOIN daily_activity w
+        ON w.user_id = u.id AND w.activity_date > date('now', '-7 days')
+    WHERE u.chat_id IN ({chat_ids})
+    GROUP BY u.id
+"""
+
+SQL_UPSERT_USER_SCHEDULE = f"""
+    INSERT INTO user_schedule (user_id, timezone, utc_offset, {', '.join(SCHEDULE_COLUMNS.values())})
+    VALUES (:user_id, :timezone, :utc_offset, {', '.join(':' + slot for slot in SCHEDULE_SLOTS)})
+    ON CONFLICT(user_id) DO UPDATE SET
+        timezone = excluded.timezone,
+        utc_offset = excluded.utc_offset,
+        {', '.join(f'{column} = excluded.{column}' for column in SCHEDULE_COLUMNS.values())}
+"""
+
+# Вся детальная статистика одним проходом по записям пользователя
+SQL_DETAILED_STATS = """
+    SELECT u.*,
+        COUNT(da.id),
+        SUM(da.pushups_count),
+        MIN(da.activity_date),
+        MAX(da.activity_date),
+        SUM(da.activity_date >= date('now', '-7 days')),
+        SUM(CASE WHEN da.activity_date >= date('now', '-7 days') THEN da.pushups_count END),
+        SUM(da.activity_date >= date('now', '-30 days')),
+        SUM(CASE WHEN da.activity_date >= date('now', '-30 days') THEN da.pushups_count END),
+        AVG(da.pushups_count),
+        SUM(CASE WHEN da.activity_date = CURRENT_DATE THEN da.pushups_count END)
+    FROM users u
+    LEFT JOIN daily_activity da ON da.user_id = u.id AND da.completed = TRUE
+    WHERE u.chat_id = ?
+    GROUP BY u.id
+"""
+
+# Скользящие окна 7/30 дней по сырому журналу для одного пользователя
+# (подзапросы идут по индексу (user_id, activity_date))
+_ROLLUP_WINDOW_SUBQUERY = """
+    (SELECT {aggregate} FROM daily_activity
+     WHERE user_id = {user_id} AND completed = TRUE
+     AND activity_date >= date('now', '{offset}'))
+"""
+
+
+def _rollup_window(aggregate: str, offset: str, user_id: str) -> str:
+    """Подзапрос агрегата за окно для проекции user_rollups."""
+    return _ROLLUP_WINDOW_SUBQUERY.format(aggregate=aggregate, offset=offset, user_id=user_id)
+
+
+# Инкрементальное обновление проекции в транзакции записи подхода.
+# Если окна посчитаны не на сегодня (ночной сдвиг ещё не прошёл),
+# они пересчитываются по журналу, который уже содержит новый подход.
+SQL_UPSERT_USER_ROLLUP = f"""
+    INSERT INTO user_rollups (
+        user_id, lifetime_days, lifetime_pushups,
+        week_days, week_pushups, month_days, month_pushups,
+        first_activity, last_activity, last_day_pushups,
+        best_day, best_day_pushups, window_date
+    )
+    VALUES (
+        :user_id, 1, :pushups, 1, :pushups, 1, :pushups,
+        CURRENT_DATE, CURRENT_DATE, :day_total,
+        CURRENT_DATE, :day_total, CURRENT_DATE
+    )
+    ON CONFLICT (user_id) DO UPDATE SET
+        lifetime_days = lifetime_days + :new_day,
+        lifetime_pushups = lifetime_pushups + :pushups,
+        week_days = CASE WHEN window_date = CURRENT_DATE THEN week_days + :new_day
+            ELSE {_rollup_window('COUNT(*)', '-7 days', ':user_id')} END,
+        week_pushups = CASE WHEN window_date = CURRENT_DATE THEN week_pushups + :pushups
+            ELSE {_rollup_window('COALESCE(SUM(pushups_count), 0)', '-7 days', ':user_id')} END,
+        month_days = CASE WHEN window_date = CURRENT_DATE THEN month_days + :new_day
+            ELSE {_rollup_window('COUNT(*)', '-30 days', ':user_id')} END,
+        month_pushups = CASE WHEN window_date = CURRENT_DATE THEN month_pushups + :pushups
+            ELSE {_rollup_window('COALESCE(SUM(pushups_count), 0)', '-30 days', ':user_id')} END,
+        first_activity = COALESCE(first_activity, CURRENT_DATE),
+        last_activity = CURRENT_DATE,
+        last_day_pushups = :day_total,
+        best_day = CASE WHEN :day_total > best_day_pushups THEN CURRENT_DATE ELSE best_day END,
+        best_day_pushups = MAX(best_day_pushups, :day_total),
+        window_date = CURRENT_DATE
+"""
+
+# Сдвиг окон 7/30 дней для пачки пользователей (ночная задача)
+SQL_SLIDE_ROLLUP_WINDOWS = f"""
+    UPDATE user_rollups SET
+        week_days = {_rollup_window('COUNT(*)', '-7 days', 'user_rollups.user_id')},
+        week_pushups = {_rollup_window('COALESCE(SUM(pushups_count), 0)', '-7 days', 'user_rollups.user_id')},
+        month_days = {_rollup_window('COUNT(*)', '-30 days', 'user_rollups.user_id')},
+        month_pushups = {_rollup_window('COALESCE(SUM(pushups_count), 0)', '-30 days', 'user_rollups.user_id')},
+        window_date = CURRENT_DATE
+    WHERE user_id IN (
+        SELECT user_id FROM user_rollups
+        WHERE window_date < CURRENT_DATE AND user_id > ?
+        ORDER BY user_id
+        LIMIT ?
+    )
+    RETURNING user_id
+"""
+
+# Полная пересборка проекции по сырому журналу
+SQL_REBUILD_USER_ROLLUPS = """
+    INSERT INTO user_rollups (
+        user_id, lifetime_days, lifetime_pushups,
+        week_days, week_pushups, month_days, month_pushups,
+        first_activity, last_activity, last_day_pushups,
+        best_day, best_day_pushups, window_date
+    )
+    SELECT
+        da.user_id,
+        COUNT(*),
+        SUM(da.pushups_count),
+        SUM(da.activity_date >= date('now', '-7 days')),
+        COALESCE(SUM(CASE WHEN da.activity_date >= date('now', '-7 days') THEN da.pushups_count END), 0),
+        SUM(da.activity_date >= date('now', '-30 days')),
+        COALESCE(SUM(CASE WHEN da.activity_date >= date('now', '-30 days') THEN da.pushups_count END), 0),
+        MIN(da.activity_date),
+        MAX(da.activity_date),
+        (SELECT pushups_count FROM daily_activity
+         WHERE user_id = da.user_id AND completed = TRUE
+         ORDER BY activity_date DESC LIMIT 1),
+        (SELECT activity_date FROM daily_activity
+         WHERE user_id = da.user_id AND completed = TRUE
+         ORDER BY pushups_count DESC, activity_date LIMIT 1),
+        MAX(da.pushups_count),
+        CURRENT_DATE
+    FROM daily_activity da
+    WHERE da.completed = TRUE
+    GROUP BY da.user_id
+"""
+
+# Статистика одним поиском по первичному ключу проекции
+SQL_ROLLUP_STATS = """
+    SELECT u.*,
+        r.lifetime_days, r.lifetime_pushups,
+        r.first_activity, r.last_activity,
+        r.week_days, r.week_pushups, r.month_days, r.month_pushups,
+        CASE WHEN r.last_activity = CURRENT_DATE THEN r.last_day_pushups ELSE 0 END,
+        r.best_day, r.best_day_pushups,
+        r.window_date IS NULL OR r.window_date = CURRENT_DATE
+    FROM users u
+    LEFT JOIN user_rollups r ON r.user_id = u.id
+    WHERE u.chat_id = ?
+"""
+
+# Имя запроса -> (SQL, пример параметров) для EXPLAIN QUERY PLAN
+HOT_QUERIES = {
+    'upsert_daily_activity': (SQL_UPSERT_DAILY_ACTIVITY, (1, 1)),
+    'check_today_activity': (SQL_CHECK_TODAY_ACTIVITY, (1,)),
+    'today_activity_count': (SQL_TODAY_ACTIVITY_COUNT, (1,)),
+    'detailed_stats': (SQL_DETAILED_STATS, (1,)),
+    'rollup_stats': (SQL_ROLLUP_STATS, (1,)),
+    'upsert_user_rollup': (
+        SQL_UPSERT_USER_ROLLUP,
+        {'user_id': 1, 'pushups': 1, 'day_total': 1, 'new_day': 1},
+    ),
+    'slide_rollup_windows': (SQL_SLIDE_ROLLUP_WINDOWS, (0, 1000)),
+    'enqueue_outbox': (
+        SQL_ENQUEUE_OUTBOX['morning'],
+        {'kind': 'morning', 'fire_time': '2024-01-01 05:00:00', 'bucket': 300},
+    ),
+    'claim_outbox': (SQL_CLAIMABLE_OUTBOX, ('2024-01-01 00:00:00', 3, '2024-01-01 00:00:00', 500)),
+    'weekly_reports': (SQL_WEEKLY_REPORTS.format(goal='30', chat_ids='?'), (1,)),
+}
 
 
 class DatabaseAdapter:
-    """Адаптер базы данных для SQLite."""
+    """Адаптер базы данных для SQLite.
+    
+    В приложении создаётся через провайдер (src.infrastructure.provider):
+    конструктор проверяет схему и открывает транзакцию записи.
+    """
     
-    def __init__(self, db_path: Optional[str] = None):
+    # Сколько адаптеров создано в процессе (для проверки переиспользования)
+    created_count = 0
+    
+    def __init__(self, db_path: Optional[str] = None, pool_mode: Optional[str] = None,
+                 read_only: bool = False):
+        DatabaseAdapter.created_count += 1
+        metrics.inc('db.adapters_created')
         if db_path is None:
             self.db_path = os.getenv('DB_PATH', 'users.db')
         else:
             self.db_path = db_path
         
+        if pool_mode is None:
+            pool_mode = os.getenv('DB_POOL_MODE', POOL_MODE_OFF)
+        if pool_mode not in POOL_MODES:
+            raise ValueError(f"Неизвестный режим пула соединений: {pool_mode}")
+        self.pool_mode = pool_mode
+        
+        # Настройки долгоживущих соединений
+        self.journal_mode = os.getenv('DB_JOURNAL_MODE', 'WAL')
+        self.synchronous = os.getenv('DB_SYNCHRONOUS', 'NORMAL')
+        self.busy_timeout_ms = int(os.getenv('DB_BUSY_TIMEOUT_MS', '5000'))
+        self.mmap_size = int(os.getenv('DB_MMAP_SIZE', str(64 * 1024 * 1024)))
+        self.cache_size = int(os.getenv('DB_CACHE_SIZE', '-16000'))
+        
+        self._local = threading.local()
+        self._pool_lock = threading.Lock()
+        self._pooled_connections: List[sqlite3.Connection] = []
+        
+        # Полоса только для чтения: соединения mode=ro, схему не трогает
+        self.read_only = read_only
+        self._reader: Optional['DatabaseAdapter'] = None
+        if read_only:
+            return
+        
         # Создаём директорию для базы данных, если её нет
         db_dir = os.path.dirname(self.db_path)
         if db_dir and not os.path.exists(db_dir):
@@ -28,81 +313,410 @@ class DatabaseAdapter:
     
     def _init_database(self):
         """Инициализация таблиц базы данных."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            # Режим журнала сохраняется в файле базы: в WAL читатели
+            # полосы только для чтения не блокируют запись
+            cursor.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+            
+            # Таблица пользователей
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chat_id INTEGER UNIQUE NOT NULL,
+                    first_name TEXT NOT NULL,
+                    level INTEGER DEFAULT 1,
+                    days INTEGER DEFAULT 0,
+                    total_count INTEGER DEFAULT 0,
+                    last_activity_date DATE,
+                    consecutive_days INTEGER DEFAULT 0,
+                    daily_goal INTEGER DEFAULT 30
+                )
+            """)
+            
+            # Таблица ежедневной активности
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS daily_activity (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    activity_date DATE NOT NULL,
+                    pushups_count INTEGER NOT NULL,
+                    completed BOOLEAN DEFAULT FALSE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (user_id) REFERENCES users (id)
+                )
+            """)
+            
+            conn.commit()
+            
+            self._apply_migrations(conn)
+    
+    def _apply_migrations(self, conn: sqlite3.Connection) -> None:
+        """Применение миграций схемы по PRAGMA user_version.
+        
+        Миграции выполняются под BEGIN IMMEDIATE: если бот и планировщик
+        стартуют одновременно, второй процесс дождётся первого и увидит
+        уже обновлённую версию схемы.
+        """
+        migrations = (
+            (1, self._migrate_daily_activity_unique_index),
+            (2, self._migrate_user_rollups),
+            (3, self._migrate_user_days),
+            (4, self._migrate_user_schedule),
+            (5, self._migrate_scheduler_state),
+            (6, self._migrate_outbox),
+            (7, self._migrate_outbox_claim_id),
+            (8, self._migrate_user_schedule_offset),
+            (9, self._migrate_outbox_due_at),
+        )
         
-        # Таблица пользователей
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        for target_version, migration in migrations:
+            if version >= target_version:
+                continue
+            logging.info(f"Применение миграции схемы до версии {target_version}")
+            migration(cursor)
+            cursor.execute(f"PRAGMA user_version = {target_version}")
+            version = target_version
+        conn.commit()
+    
+    @staticmethod
+    def _migrate_daily_activity_unique_index(cursor: sqlite3.Cursor) -> None:
+        """Слияние дублей за один день и уникальный индекс (user_id, activity_date)."""
+        # Оставляем самую раннюю запись дня и переносим в неё сумму дублей
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                chat_id INTEGER UNIQUE NOT NULL,
-                first_name TEXT NOT NULL,
-                level INTEGER DEFAULT 1,
-                days INTEGER DEFAULT 0,
-                total_count INTEGER DEFAULT 0,
-                last_activity_date DATE,
-                consecutive_days INTEGER DEFAULT 0,
-                daily_goal INTEGER DEFAULT 30
+            UPDATE daily_activity
+            SET pushups_count = (
+                    SELECT SUM(d.pushups_count) FROM daily_activity d
+                    WHERE d.user_id = daily_activity.user_id
+                    AND d.activity_date = daily_activity.activity_date
+                ),
+                completed = (
+                    SELECT MAX(d.completed) FROM daily_activity d
+                    WHERE d.user_id = daily_activity.user_id
+                    AND d.activity_date = daily_activity.activity_date
+                )
+            WHERE id IN (
+                SELECT MIN(id) FROM daily_activity
+                GROUP BY user_id, activity_date
+                HAVING COUNT(*) > 1
             )
         """)
+        cursor.execute("""
+            DELETE FROM daily_activity
+            WHERE id NOT IN (
+                SELECT MIN(id) FROM daily_activity
+                GROUP BY user_id, activity_date
+            )
+        """)
+        if cursor.rowcount:
+            logging.info(f"Объединено дублей daily_activity: {cursor.rowcount}")
         
-        # Таблица ежедневной активности
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS daily_activity (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                activity_date DATE NOT NULL,
-                pushups_count INTEGER NOT NULL,
-                completed BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_daily_activity_user_date
+            ON daily_activity (user_id, activity_date)
+        """)
+    
+    @staticmethod
+    def _migrate_user_rollups(cursor: sqlite3.Cursor) -> None:
+        """Проекция user_rollups с агрегатами по пользователю."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS user_rollups (
+                user_id INTEGER PRIMARY KEY,
+                lifetime_days INTEGER NOT NULL DEFAULT 0,
+                lifetime_pushups INTEGER NOT NULL DEFAULT 0,
+                week_days INTEGER NOT NULL DEFAULT 0,
+                week_pushups INTEGER NOT NULL DEFAULT 0,
+                month_days INTEGER NOT NULL DEFAULT 0,
+                month_pushups INTEGER NOT NULL DEFAULT 0,
+                first_activity DATE,
+                last_activity DATE,
+                last_day_pushups INTEGER NOT NULL DEFAULT 0,
+                best_day DATE,
+                best_day_pushups INTEGER NOT NULL DEFAULT 0,
+                window_date DATE NOT NULL,
                 FOREIGN KEY (user_id) REFERENCES users (id)
             )
         """)
+        cursor.execute("DELETE FROM user_rollups")
+        cursor.execute(SQL_REBUILD_USER_ROLLUPS)
+    
+    @staticmethod
+    def _migrate_user_days(cursor: sqlite3.Cursor) -> None:
+        """Заполнение users.days (дней тренировок) из проекции user_rollups."""
+        cursor.execute("""
+            UPDATE users
+            SET days = COALESCE(
+                (SELECT lifetime_days FROM user_rollups WHERE user_id = users.id), 0
+            )
+        """)
+    
+    @staticmethod
+    def _migrate_user_schedule(cursor: sqlite3.Cursor) -> None:
+        """Часовые пояса пользователей и UTC-корзины слотов напоминаний.
         
-        conn.commit()
-        conn.close()
+        Существующие пользователи получают пояс DEFAULT_TIMEZONE.
+        """
+        columns = ',\n'.join(f"{column} INTEGER NOT NULL" for column in SCHEDULE_COLUMNS.values())
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS user_schedule (
+                user_id INTEGER PRIMARY KEY REFERENCES users(id),
+                timezone TEXT NOT NULL,
+                {columns}
+            )
+        """)
+        for slot, column in SCHEDULE_COLUMNS.items():
+            cursor.execute(f"""
+                CREATE INDEX IF NOT EXISTS idx_user_schedule_{slot}
+                ON user_schedule ({column}, user_id)
+            """)
+        buckets = utc_buckets(DEFAULT_TIMEZONE)
+        cursor.execute(f"""
+            INSERT OR IGNORE INTO user_schedule (user_id, timezone, {', '.join(SCHEDULE_COLUMNS.values())})
+            SELECT id, ?, {', '.join('?' for _ in SCHEDULE_SLOTS)} FROM users
+        """, (DEFAULT_TIMEZONE, *(buckets[slot] for slot in SCHEDULE_SLOTS)))
+    
+    @staticmethod
+    def _migrate_scheduler_state(cursor: sqlite3.Cursor) -> None:
+        """Отметки последнего запуска задач планировщика."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS scheduler_state (
+                job TEXT PRIMARY KEY,
+                fired_at TEXT NOT NULL
+            )
+        """)
+    
+    @staticmethod
+    def _migrate_outbox(cursor: sqlite3.Cursor) -> None:
+        """Журнал уведомлений: одна запись на (chat_id, kind, slot_date)."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY,
+                chat_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                slot_date TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                claimed_at TEXT,
+                sent_at TEXT,
+                UNIQUE (chat_id, kind, slot_date)
+            )
+        """)
+        # Частичный индекс: в нём только неотправленные записи
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_outbox_pending
+            ON outbox (id) WHERE sent_at IS NULL
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_slot_date ON outbox (slot_date)")
+    
+    @staticmethod
+    def _migrate_outbox_claim_id(cursor: sqlite3.Cursor) -> None:
+        """Метка аренды outbox: отправить запись может только последняя аренда."""
+        cursor.execute("ALTER TABLE outbox ADD COLUMN claim_id TEXT")
+    
+    @staticmethod
+    def _migrate_outbox_due_at(cursor: sqlite3.Cursor) -> None:
+        """UTC-время слота записи outbox: устаревшие записи не отправляются.
+        
+        Неотправленным записям ставится текущее время, чтобы уже стоящие
+        в очереди напоминания ушли. Индекс неотправленных записей
+        перестраивается по due_at: выдача идёт только по свежим записям.
+        """
+        cursor.execute("ALTER TABLE outbox ADD COLUMN due_at TEXT")
+        cursor.execute("UPDATE outbox SET due_at = datetime('now') WHERE sent_at IS NULL")
+        cursor.execute("DROP INDEX IF EXISTS idx_outbox_pending")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_outbox_pending
+            ON outbox (due_at) WHERE sent_at IS NULL
+        """)
+    
+    @staticmethod
+    def _migrate_user_schedule_offset(cursor: sqlite3.Cursor) -> None:
+        """Смещение пояса пользователя от UTC в минутах: по нему считается местная дата слота."""
+        cursor.execute("ALTER TABLE user_schedule ADD COLUMN utc_offset INTEGER NOT NULL DEFAULT 0")
+        zones = [row[0] for row in cursor.execute("SELECT DISTINCT timezone FROM user_schedule")]
+        for tz_name in zones:
+            try:
+                offset = utc_offset(tz_name)
+            except Exception as e:
+                logging.error(f"Неизвестный часовой пояс {tz_name}: {e}")
+                continue
+            cursor.execute("UPDATE user_schedule SET utc_offset = ? WHERE timezone = ?", (offset, tz_name))
+    
+    def rebuild_rollups(self) -> int:
+        """Пересборка user_rollups по журналу daily_activity.
+        
+        Возвращает количество пользователей в проекции.
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("DELETE FROM user_rollups")
+            cursor.execute(SQL_REBUILD_USER_ROLLUPS)
+            rebuilt = cursor.rowcount
+            conn.commit()
+        logging.info(f"Проекция user_rollups пересобрана: {rebuilt} пользователей")
+        return rebuilt
+    
+    def slide_rollup_windows(self, batch_size: int = 1000) -> int:
+        """Сдвиг окон 7/30 дней в user_rollups на сегодняшний день.
+        
+        Работает пачками по batch_size пользователей, каждая в своей
+        транзакции, чтобы не держать блокировку записи надолго.
+        Возвращает количество обновлённых пользователей.
+        """
+        updated = 0
+        last_user_id = 0
+        while True:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                cursor.execute(SQL_SLIDE_ROLLUP_WINDOWS, (last_user_id, batch_size))
+                user_ids = [row[0] for row in cursor.fetchall()]
+                conn.commit()
+            if not user_ids:
+                break
+            updated += len(user_ids)
+            last_user_id = max(user_ids)
+        logging.info(f"Окна user_rollups сдвинуты для {updated} пользователей")
+        return updated
+    
+    def explain_hot_queries(self) -> Dict[str, List[str]]:
+        """Планы выполнения горячих запросов (EXPLAIN QUERY PLAN)."""
+        plans = {}
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            for name, (sql, params) in HOT_QUERIES.items():
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                plans[name] = [row[3] for row in cursor.fetchall()]
+        return plans
+    
+    def schema_version(self) -> int:
+        """Текущая версия схемы в файле базы (PRAGMA user_version)."""
+        with self._connection() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+    
+    def reader(self) -> 'DatabaseAdapter':
+        """Адаптер полосы только для чтения над тем же файлом.
+        
+        Используется для статистики и рассылок: его соединения открыты
+        с mode=ro и не участвуют в блокировках записи.
+        """
+        if self.read_only:
+            return self
+        if self._reader is None:
+            self._reader = DatabaseAdapter(self.db_path, pool_mode=self.pool_mode, read_only=True)
+        return self._reader
+    
+    def _connect(self, **kwargs) -> sqlite3.Connection:
+        """Открытие соединения с учётом режима только для чтения."""
+        if self.read_only:
+            uri = f"{Path(self.db_path).absolute().as_uri()}?mode=ro"
+            return sqlite3.connect(uri, uri=True, **kwargs)
+        return sqlite3.connect(self.db_path, **kwargs)
     
     def _get_connection(self) -> sqlite3.Connection:
         """Получение соединения с базой данных."""
-        return sqlite3.connect(self.db_path)
+        if self.pool_mode == POOL_MODE_OFF:
+            return self._connect()
+        
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open_pooled_connection()
+            self._local.conn = conn
+        return conn
+    
+    def _open_pooled_connection(self) -> sqlite3.Connection:
+        """Открытие и настройка долгоживущего соединения для текущего потока."""
+        # check_same_thread=False нужен только для close() из другого потока:
+        # каждое соединение используется лишь потоком, который его открыл.
+        conn = self._connect(
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+        )
+        if self.read_only:
+            conn.execute("PRAGMA query_only = ON")
+        else:
+            conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+            conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout_ms}")
+        conn.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+        conn.execute(f"PRAGMA cache_size = {self.cache_size}")
+        
+        with self._pool_lock:
+            self._pooled_connections.append(conn)
+        return conn
+    
+    def _release_connection(self, conn: sqlite3.Connection) -> None:
+        """Возврат соединения: закрываем его только в режиме без пула."""
+        if self.pool_mode == POOL_MODE_OFF:
+            conn.close()
+    
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """Соединение на время одной операции с откатом при ошибке."""
+        conn = self._get_connection()
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._release_connection(conn)
+    
+    def close(self) -> None:
+        """Закрытие всех долгоживущих соединений пула."""
+        with self._pool_lock:
+            connections = self._pooled_connections
+            self._pooled_connections = []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logging.warning(f"Ошибка при закрытии соединения: {e}")
+        self._local = threading.local()
+        if self._reader is not None:
+            self._reader.close()
     
     def save_user(self, chat_id: int, first_name: str) -> Optional[User]:
         """Сохранение или обновление пользователя."""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            # Проверяем, существует ли пользователь
-            cursor.execute(
-                "SELECT * FROM users WHERE chat_id = ?",
-                (chat_id,)
-            )
-            existing_user = cursor.fetchone()
-            
-            if existing_user:
-                # Обновляем существующего пользователя
-                cursor.execute("""
-                    UPDATE users 
-                    SET first_name = ?, last_activity_date = CURRENT_DATE
-                    WHERE chat_id = ?
-                """, (first_name, chat_id))
+            with self._connection() as conn:
+                cursor = conn.cursor()
                 
-                user_data = (existing_user[0], chat_id, first_name, 
-                           existing_user[3], existing_user[4], 
-                           existing_user[5], existing_user[6] if existing_user[6] else None,
-                           existing_user[7], existing_user[8])
-            else:
-                # Создаём нового пользователя
-                cursor.execute("""
-                    INSERT INTO users (chat_id, first_name, level, days, total_count, last_activity_date)
-                    VALUES (?, ?, 1, 0, 0, CURRENT_DATE)
-                """, (chat_id, first_name))
+                # Проверяем, существует ли пользователь
+                cursor.execute(
+                    "SELECT * FROM users WHERE chat_id = ?",
+                    (chat_id,)
+                )
+                existing_user = cursor.fetchone()
                 
-                user_id = cursor.lastrowid
-                user_data = (user_id, chat_id, first_name, 1, 0, 0, date.today(), 0, 30)
-            
-            conn.commit()
-            conn.close()
+                if existing_user:
+                    # Обновляем существующего пользователя
+                    cursor.execute("""
+                        UPDATE users 
+                        SET first_name = ?, last_activity_date = CURRENT_DATE
+                        WHERE chat_id = ?
+                    """, (first_name, chat_id))
+                    
+                    user_data = (existing_user[0], chat_id, first_name, 
+                               existing_user[3], existing_user[4], 
+                               existing_user[5], existing_user[6] if existing_user[6] else None,
+                               existing_user[7], existing_user[8])
+                else:
+                    # Создаём нового пользователя
+                    cursor.execute("""
+                        INSERT INTO users (chat_id, first_name, level, days, total_count, last_activity_date)
+                        VALUES (?, ?, 1, 0, 0, CURRENT_DATE)
+                    """, (chat_id, first_name))
+                    
+                    user_id = cursor.lastrowid
+                    user_data = (user_id, chat_id, first_name, 1, 0, 0, date.today(), 0, 30)
+                    self._set_schedule(cursor, user_id, DEFAULT_TIMEZONE)
+                
+                conn.commit()
             
             if user_data[0] is not None:  # Убеждаемся, что id не None
                 return User(*user_data)  # type: ignore
@@ -115,15 +729,14 @@ class DatabaseAdapter:
     def get_user(self, chat_id: int) -> Optional[User]:
         """Получение пользователя по chat_id."""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute(
-                "SELECT * FROM users WHERE chat_id = ?",
-                (chat_id,)
-            )
-            user_data = cursor.fetchone()
-            conn.close()
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute(
+                    "SELECT * FROM users WHERE chat_id = ?",
+                    (chat_id,)
+                )
+                user_data = cursor.fetchone()
             
             if user_data:
                 return User(*user_data)
@@ -133,106 +746,150 @@ class DatabaseAdapter:
             logging.error(f"Ошибка получения пользователя: {e}")
             return None
     
-    def save_daily_activity(self, user_id: int, pushups_count: int) -> bool:
-        """Сохранение ежедневной активности."""
+    def save_daily_activity(self, user_id: int, pushups_count: int) -> Optional[User]:
+        """Сохранение ежедневной активности по id пользователя."""
+        return self._write_activity("id", user_id, pushups_count)
+    
+    def record_activity(self, chat_id: int, pushups_count: int) -> Optional[User]:
+        """Сохранение ежедневной активности по chat_id."""
+        return self._write_activity("chat_id", chat_id, pushups_count)
+    
+    def record_activities(self, items: List[Tuple[int, int]]) -> List[Optional[User]]:
+        """Запись пачки подходов (chat_id, количество) одной транзакцией.
+        
+        Каждый подход выполняется в своей точке сохранения: ошибка в одном
+        не откатывает остальные. Возвращает состояния пользователей в порядке
+        items (None для ненайденных или неудачных).
+        """
+        results: List[Optional[User]] = [None] * len(items)
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            # Получаем chat_id пользователя
-            cursor.execute("SELECT chat_id FROM users WHERE id = ?", (user_id,))
-            user_result = cursor.fetchone()
-            if not user_result:
-                conn.close()
-                return False
-            
-            chat_id = user_result[0]
-            
-            # Проверяем, существует ли активность на сегодня
-            cursor.execute("""
-                SELECT id FROM daily_activity 
-                WHERE user_id = ? AND activity_date = CURRENT_DATE
-            """, (user_id,))
-            
-            existing_activity = cursor.fetchone()
-            
-            if existing_activity:
-                # Обновляем существующую активность - суммируем количество
-                cursor.execute("""
-                    UPDATE daily_activity 
-                    SET pushups_count = pushups_count + ?, completed = TRUE
-                    WHERE id = ?
-                """, (pushups_count, existing_activity[0]))
-            else:
-                # Создаём новую активность
-                cursor.execute("""
-                    INSERT INTO daily_activity (user_id, activity_date, pushups_count, completed)
-                    VALUES (?, CURRENT_DATE, ?, TRUE)
-                """, (user_id, pushups_count))
-            
-            # Обновляем статистику пользователя
-            # Если это новая активность, добавляем к общему счету
-            if not existing_activity:
-                cursor.execute("""
-                    UPDATE users 
-                    SET total_count = total_count + ?,
-                        last_activity_date = CURRENT_DATE
-                    WHERE id = ?
-                """, (pushups_count, user_id))
-            else:
-                # Если обновляем существующую активность, обновляем только дату
-                cursor.execute("""
-                    UPDATE users 
-                    SET last_activity_date = CURRENT_DATE
-                    WHERE id = ?
-                """, (user_id,))
-            
-            # Обновляем дни подряд
-            self.update_consecutive_days(chat_id)
-            
-            # Проверяем повышение уровня
-            self.check_level_up(chat_id)
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                for index, (chat_id, pushups_count) in enumerate(items):
+                    cursor.execute("SAVEPOINT activity")
+                    try:
+                        results[index] = self._apply_activity(
+                            cursor, "chat_id", chat_id, pushups_count
+                        )
+                    except sqlite3.Error as e:
+                        logging.error(f"Ошибка записи подхода пользователя {chat_id}: {e}")
+                        cursor.execute("ROLLBACK TO activity")
+                    cursor.execute("RELEASE activity")
+                conn.commit()
+            return results
             
-            conn.commit()
-            conn.close()
-            return True
+        except Exception as e:
+            logging.error(f"Ошибка сохранения пачки активности: {e}")
+            return [None] * len(items)
+    
+    def _write_activity(self, key_column: str, key: int, pushups_count: int) -> Optional[User]:
+        """Запись подхода одной транзакцией: активность дня, общий счёт, серия и уровень.
+        
+        Возвращает новое состояние пользователя или None, если он не найден.
+        """
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                # Берём блокировку записи сразу, чтобы чтение ниже не пришлось
+                # повышать до записи (в WAL это сразу даёт "database is locked")
+                cursor.execute("BEGIN IMMEDIATE")
+                updated_user = self._apply_activity(cursor, key_column, key, pushups_count)
+                conn.commit()
+            return updated_user
             
         except Exception as e:
             logging.error(f"Ошибка сохранения ежедневной активности: {e}")
-            return False
+            return None
+    
+    def _apply_activity(
+        self, cursor: sqlite3.Cursor, key_column: str, key: int, pushups_count: int
+    ) -> Optional[User]:
+        """Операторы записи подхода внутри уже открытой транзакции."""
+        # Пользователь и активность за сегодня/вчера до записи
+        cursor.execute(f"""
+            SELECT u.*,
+                EXISTS (
+                    SELECT 1 FROM daily_activity
+                    WHERE user_id = u.id AND activity_date = CURRENT_DATE
+                ),
+                EXISTS (
+                    SELECT 1 FROM daily_activity
+                    WHERE user_id = u.id AND activity_date = date('now', '-1 day')
+                )
+            FROM users u
+            WHERE u.{key_column} = ?
+        """, (key,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        
+        user = User(*row[:9])
+        active_today, active_yesterday = row[9], row[10]
+        
+        if active_today:
+            # Повторный подход за день не меняет серию
+            consecutive_days = user.consecutive_days
+        elif active_yesterday:
+            consecutive_days = user.consecutive_days + 1
+        else:
+            consecutive_days = 1
+        
+        level, daily_goal = user.level, user.daily_goal
+        # Повышение уровня после серии дней подряд (по умолчанию 7)
+        progression = get_progression()
+        if consecutive_days >= progression.level_up_streak_days and level < progression.max_level:
+            level += 1
+            daily_goal = progression.daily_goal(level)
+            consecutive_days = 0
+        
+        # Одна запись на день: повторные подходы суммируются
+        cursor.execute(SQL_UPSERT_DAILY_ACTIVITY, (user.id, pushups_count))
+        day_total = cursor.fetchall()[0][0]
+        
+        cursor.execute(SQL_UPSERT_USER_ROLLUP, {
+            'user_id': user.id,
+            'pushups': pushups_count,
+            'day_total': day_total,
+            'new_day': 0 if active_today else 1,
+        })
+        
+        cursor.execute("""
+            UPDATE users 
+            SET total_count = total_count + ?,
+                days = days + ?,
+                last_activity_date = CURRENT_DATE,
+                consecutive_days = ?,
+                level = ?,
+                daily_goal = ?
+            WHERE id = ?
+            RETURNING *
+        """, (pushups_count, 0 if active_today else 1,
+              consecutive_days, level, daily_goal, user.id))
+        return User(*cursor.fetchall()[0])
     
     def get_user_stats(self, chat_id: int) -> Optional[UserStats]:
         """Get user statistics."""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            # Get user data
-            cursor.execute(
-                "SELECT * FROM users WHERE chat_id = ?",
-                (chat_id,)
-            )
-            user_data = cursor.fetchone()
-            
-            if not user_data:
-                conn.close()
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                
+                # Пользователь и итоги из проекции одним поиском по ключу
+                cursor.execute("""
+                    SELECT u.*, r.lifetime_days, r.lifetime_pushups, r.last_activity
+                    FROM users u
+                    LEFT JOIN user_rollups r ON r.user_id = u.id
+                    WHERE u.chat_id = ?
+                """, (chat_id,))
+                row = cursor.fetchone()
+            
+            if not row:
                 return None
             
-            user = User(*user_data)
-            
-            # Get statistics
-            cursor.execute("""
-                SELECT COUNT(*), SUM(pushups_count), MAX(activity_date)
-                FROM daily_activity 
-                WHERE user_id = ? AND completed = TRUE
-            """, (user.id,))
-            
-            stats_data = cursor.fetchone()
-            conn.close()
-            
-            days_count = stats_data[0] or 0
-            total_pushups = stats_data[1] or 0
-            last_activity = stats_data[2]
+            user = User(*row[:9])
+            days_count = row[9] or 0
+            total_pushups = row[10] or 0
+            last_activity = row[11]
             
             stats = {
                 'days_count': days_count,
@@ -255,17 +912,12 @@ class DatabaseAdapter:
     def check_today_activity(self, chat_id: int) -> bool:
         """Check if user completed activity today."""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT SUM(pushups_count) FROM daily_activity da
-                JOIN users u ON da.user_id = u.id
-                WHERE u.chat_id = ? AND da.activity_date = CURRENT_DATE AND da.completed = TRUE
-            """, (chat_id,))
-            
-            total_count = cursor.fetchone()[0] or 0
-            conn.close()
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute(SQL_CHECK_TODAY_ACTIVITY, (chat_id,))
+                
+                total_count = cursor.fetchone()[0] or 0
             
             return total_count > 0
             
@@ -276,69 +928,240 @@ class DatabaseAdapter:
     def update_user_level(self, chat_id: int, new_level: int) -> bool:
         """Update user level."""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                UPDATE users SET level = ? WHERE chat_id = ?
-            """, (new_level, chat_id))
-            
-            conn.commit()
-            conn.close()
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute("""
+                    UPDATE users SET level = ? WHERE chat_id = ?
+                """, (new_level, chat_id))
+                
+                conn.commit()
             return True
             
         except Exception as e:
             logging.error(f"Error updating user level: {e}")
             return False
     
-    def get_all_active_users(self) -> List[Tuple[int, str]]:
-        """Get all active users."""
+    @staticmethod
+    def _set_schedule(cursor: sqlite3.Cursor, user_id: int, tz_name: str) -> None:
+        buckets = utc_buckets(tz_name)
+        cursor.execute(SQL_UPSERT_USER_SCHEDULE, {
+            'user_id': user_id, 'timezone': tz_name, 'utc_offset': utc_offset(tz_name), **buckets
+        })
+    
+    def set_user_timezone(self, chat_id: int, tz_name: str) -> bool:
+        """Смена часового пояса пользователя и пересчёт корзин напоминаний."""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT chat_id, first_name 
-                FROM users 
-                WHERE last_activity_date IS NOT NULL
-            """)
-            
-            users = cursor.fetchall()
-            conn.close()
-            
-            return users
-            
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                row = cursor.execute("SELECT id FROM users WHERE chat_id = ?", (chat_id,)).fetchone()
+                if not row:
+                    return False
+                self._set_schedule(cursor, row[0], tz_name)
+                conn.commit()
+            return True
+        except Exception as e:
+            logging.error(f"Ошибка при смене часового пояса: {e}")
+            return False
+    
+    def refresh_schedule_buckets(self) -> int:
+        """Пересчёт корзин и смещений по текущим смещениям поясов (переходы на летнее время).
+        
+        Обновляются только строки, у которых корзины или смещение изменились.
+        Возвращает количество обновлённых пользователей.
+        """
+        updated = 0
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                zones = [row[0] for row in cursor.execute("SELECT DISTINCT timezone FROM user_schedule")]
+                columns = {'utc_offset': 'utc_offset', **SCHEDULE_COLUMNS}
+                assignments = ', '.join(f"{column} = :{slot}" for slot, column in columns.items())
+                changed = ' OR '.join(f"{column} != :{slot}" for slot, column in columns.items())
+                for tz_name in zones:
+                    try:
+                        buckets = utc_buckets(tz_name)
+                        offset = utc_offset(tz_name)
+                    except Exception as e:
+                        logging.error(f"Неизвестный часовой пояс {tz_name}: {e}")
+                        continue
+                    cursor.execute(
+                        f"UPDATE user_schedule SET {assignments} WHERE timezone = :timezone AND ({changed})",
+                        {'timezone': tz_name, 'utc_offset': offset, **buckets}
+                    )
+                    updated += cursor.rowcount
+                conn.commit()
+        except Exception as e:
+            logging.error(f"Ошибка при пересчёте корзин напоминаний: {e}")
+        return updated
+    
+    def enqueue_outbox(self, kind: str, fire_time: str, bucket: int) -> int:
+        """Запись в outbox всех получателей слота kind из UTC-корзины bucket.
+        
+        fire_time - UTC-время запуска ('YYYY-MM-DD HH:MM:SS'); ключом
+        записи становится местная дата каждого получателя. Повторная
+        постановка того же слота ничего не добавляет.
+        Возвращает количество новых записей. Ошибки не подавляются:
+        планировщик не сдвигает отметку минуты и повторяет запуск.
+        """
+        with self._connection() as conn:
+            cursor = conn.execute(SQL_ENQUEUE_OUTBOX[kind],
+                                  {'kind': kind, 'fire_time': fire_time, 'bucket': bucket})
+            conn.commit()
+            return cursor.rowcount
+    
+    def claim_outbox(self, batch_size: int, lease_seconds: int = 600,
+                     max_attempts: int = 3,
+                     max_age: int = 600) -> List[Tuple[str, str, str, ReminderPayload]]:
+        """Аренда пачки неотправленных записей outbox.
+        
+        Записи помечаются временем и меткой аренды (claim_id) и не выдаются
+        повторно, пока аренда не истечёт. Повторная аренда меняет метку,
+        поэтому пачка с прежней меткой эти записи уже не отправит.
+        Записи, чей слот старше max_age секунд, не выдаются: после простоя
+        отправки напоминания не уходят с опозданием на часы.
+        Возвращает (kind, slot_date, claim_id, данные сообщения).
+        """
+        progression = get_progression()
+        claim_id = uuid.uuid4().hex
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                now = cursor.execute("SELECT datetime('now')").fetchone()[0]
+                expired, fresh_after = cursor.execute(
+                    "SELECT datetime('now', ?), datetime('now', ?)",
+                    (f"-{lease_seconds} seconds", f"-{max_age} seconds")
+                ).fetchone()
+                rows = cursor.execute(
+                    SQL_CLAIMABLE_OUTBOX, (fresh_after, max_attempts, expired, batch_size)
+                ).fetchall()
+                cursor.executemany(
+                    "UPDATE outbox SET claimed_at = ?, claim_id = ?, attempts = attempts + 1 WHERE id = ?",
+                    [(now, claim_id, row[0]) for row in rows]
+                )
+                conn.commit()
+            return [
+                (kind, slot_date, claim_id, ReminderPayload(
+                    chat_id, first_name, level, progression.daily_goal(level), today_count
+                ))
+                for _, kind, slot_date, chat_id, first_name, level, today_count in rows
+            ]
         except Exception as e:
-            logging.error(f"Error getting active users: {e}")
+            logging.error(f"Ошибка при аренде записей outbox: {e}")
             return []
-
+    
+    def get_weekly_reports(self, chat_ids: List[int], chunk_size: int = 500) -> List[WeeklyReport]:
+        """Итоги последних 7 дней для пользователей chat_ids.
+        
+        Один сгруппированный запрос на chunk_size пользователей вместо
+        нескольких запросов на каждого.
+        """
+        progression = get_progression()
+        # Цели - проверенные целые из конфигурации, их можно встроить в текст запроса
+        goal = "CASE u.level {} ELSE {} END".format(
+            ' '.join(f"WHEN {level} THEN {int(progression.daily_goal(level))}"
+                     for level in range(1, progression.max_level + 1)),
+            int(progression.daily_goal(0))
+        )
+        reports: List[WeeklyReport] = []
+        try:
+            with self._connection() as conn:
+                for start in range(0, len(chat_ids), chunk_size):
+                    chunk = chat_ids[start:start + chunk_size]
+                    sql = SQL_WEEKLY_REPORTS.format(goal=goal, chat_ids=', '.join('?' * len(chunk)))
+                    for row in conn.execute(sql, chunk):
+                        chat_id, first_name, level, daily_goal, days, pushups, best_day, best, hits = row
+                        reports.append(WeeklyReport(
+                            chat_id, first_name, level, daily_goal, days, pushups,
+                            best_day if best > 0 else None, best, hits
+                        ))
+            return reports
+        except Exception as e:
+            logging.error(f"Ошибка при подсчёте недельных итогов: {e}")
+            return []
+    
+    def start_outbox_sends(self, kind: str, slot_date: str, chat_ids: List[int],
+                           claim_id: str, max_age: int = 600) -> List[int]:
+        """Отметка записей outbox как отправленных перед самой отправкой.
+        
+        Одна транзакция на группу chat_ids. Отмечаются только записи
+        текущей аренды claim_id, ещё не отправленные и со слотом не старше
+        max_age секунд; остальные отправлять нельзя. Возвращает chat_id
+        отмеченных записей.
+        """
+        if not chat_ids:
+            return []
+        try:
+            with self._connection() as conn:
+                rows = conn.execute(f"""
+                    UPDATE outbox SET sent_at = CURRENT_TIMESTAMP
+                    WHERE kind = ? AND slot_date = ? AND claim_id = ? AND sent_at IS NULL
+                        AND due_at >= datetime('now', ?)
+                        AND chat_id IN ({', '.join('?' * len(chat_ids))})
+                    RETURNING chat_id
+                """, (kind, slot_date, claim_id, f"-{max_age} seconds", *chat_ids)).fetchall()
+                conn.commit()
+            return [row[0] for row in rows]
+        except Exception as e:
+            logging.error(f"Ошибка при отметке отправки в outbox: {e}")
+            return []
+    
+    def release_outbox_sends(self, kind: str, slot_date: str, chat_ids: List[int],
+                             claim_id: str) -> None:
+        """Снятие отметки после неудачной отправки: записи вернутся после аренды."""
+        if not chat_ids:
+            return
+        try:
+            with self._connection() as conn:
+                conn.execute(f"""
+                    UPDATE outbox SET sent_at = NULL
+                    WHERE kind = ? AND slot_date = ? AND claim_id = ?
+                        AND chat_id IN ({', '.join('?' * len(chat_ids))})
+                """, (kind, slot_date, claim_id, *chat_ids))
+                conn.commit()
+        except Exception as e:
+            logging.error(f"Ошибка при возврате записей outbox: {e}")
+    
+    def prune_outbox(self, before: str) -> int:
+        """Удаление записей outbox за слоты раньше даты before."""
+        try:
+            with self._connection() as conn:
+                cursor = conn.execute("DELETE FROM outbox WHERE slot_date < ?", (before,))
+                conn.commit()
+                return cursor.rowcount
+        except Exception as e:
+            logging.error(f"Ошибка при очистке outbox: {e}")
+            return 0
+    
+    def get_job_watermark(self, job: str) -> Optional[datetime]:
+        """Время последнего выполненного запуска задачи планировщика (UTC)."""
+        with self._connection() as conn:
+            row = conn.execute("SELECT fired_at FROM scheduler_state WHERE job = ?", (job,)).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+    
+    def set_job_watermark(self, job: str, fired_at: datetime) -> None:
+        """Сохранение времени выполненного запуска задачи планировщика."""
+        with self._connection() as conn:
+            conn.execute("""
+                INSERT INTO scheduler_state (job, fired_at) VALUES (?, ?)
+                ON CONFLICT(job) DO UPDATE SET fired_at = excluded.fired_at
+            """, (job, fired_at.isoformat()))
+            conn.commit()
+    
     def get_daily_goal(self, level: int) -> int:
-        """Получение ежедневной цели по уровню."""
-        goals = {
-            1: 30,   # Уровень 1: 30 отжиманий в день
-            2: 45,   # Уровень 2: 45 отжиманий в день
-            3: 60,   # Уровень 3: 60 отжиманий в день
-            4: 75,   # Уровень 4: 75 отжиманий в день
-            5: 90,   # Уровень 5: 90 отжиманий в день
-            6: 100   # Уровень 6: 100 отжиманий в день
-        }
-        return goals.get(level, 30)
+        """Получение ежедневной цели по уровню (config/progression.json)."""
+        return get_progression().daily_goal(level)
 
     def get_today_activity_count(self, chat_id: int) -> int:
         """Получение количества отжиманий за сегодня."""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT SUM(pushups_count) 
-                FROM daily_activity 
-                WHERE user_id = (SELECT id FROM users WHERE chat_id = ?) 
-                AND activity_date = CURRENT_DATE
-            """, (chat_id,))
-            
-            result = cursor.fetchone()
-            conn.close()
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute(SQL_TODAY_ACTIVITY_COUNT, (chat_id,))
+                
+                result = cursor.fetchone()
             
             return result[0] or 0
             
@@ -346,166 +1169,53 @@ class DatabaseAdapter:
             logging.error(f"Ошибка при получении активности за сегодня: {e}")
             return 0
 
-    def get_detailed_stats(self, chat_id: int) -> dict:
-        """Получение детальной статистики пользователя."""
-        try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            # Получаем данные пользователя
-            cursor.execute("SELECT * FROM users WHERE chat_id = ?", (chat_id,))
-            user_data = cursor.fetchone()
-            
-            if not user_data:
-                conn.close()
-                return {}
-            
-            user_id = user_data[0]
-            
-            # Общая статистика
-            cursor.execute("""
-                SELECT COUNT(*), SUM(pushups_count), MAX(activity_date), MIN(activity_date)
-                FROM daily_activity 
-                WHERE user_id = ? AND completed = TRUE
-            """, (user_id,))
-            
-            stats_data = cursor.fetchone()
-            
-            # Статистика за неделю
-            cursor.execute("""
-                SELECT COUNT(*), SUM(pushups_count)
-                FROM daily_activity 
-                WHERE user_id = ? AND activity_date >= date('now', '-7 days') AND completed = TRUE
-            """, (user_id,))
-            
-            week_stats = cursor.fetchone()
-            
-            # Статистика за месяц
-            cursor.execute("""
-                SELECT COUNT(*), SUM(pushups_count)
-                FROM daily_activity 
-                WHERE user_id = ? AND activity_date >= date('now', '-30 days') AND completed = TRUE
-            """, (user_id,))
-            
-            month_stats = cursor.fetchone()
-            
-            # Среднее количество отжиманий в день
-            cursor.execute("""
-                SELECT AVG(pushups_count)
-                FROM daily_activity 
-                WHERE user_id = ? AND completed = TRUE
-            """, (user_id,))
-            
-            avg_pushups = cursor.fetchone()[0] or 0
-            
-            conn.close()
-            
-            return {
-                'total_days': stats_data[0] or 0,
-                'total_pushups': stats_data[1] or 0,
-                'first_activity': stats_data[3],
-                'last_activity': stats_data[2],
-                'week_days': week_stats[0] or 0,
-                'week_pushups': week_stats[1] or 0,
-                'month_days': month_stats[0] or 0,
-                'month_pushups': month_stats[1] or 0,
-                'avg_per_day': round(avg_pushups, 1),
-                'current_level': user_data[3],
-                'consecutive_days': user_data[7] or 0
-            }
-            
-        except Exception as e:
-            logging.error(f"Ошибка при получении детальной статистики: {e}")
-            return {}
-
-    def update_consecutive_days(self, chat_id: int) -> bool:
-        """Обновление количества дней подряд."""
-        try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            # Получаем информацию о пользователе
-            cursor.execute("""
-                SELECT consecutive_days, last_activity_date 
-                FROM users 
-                WHERE chat_id = ?
-            """, (chat_id,))
-            
-            user_data = cursor.fetchone()
-            if not user_data:
-                conn.close()
-                return False
-            
-            consecutive_days, last_activity_date = user_data
-            
-            # Проверяем, был ли вчера активность
-            if last_activity_date:
-                from datetime import date, timedelta
-                yesterday = date.today() - timedelta(days=1)
-                
-                if last_activity_date == yesterday.isoformat():
-                    # Вчера была активность - увеличиваем счетчик
-                    new_consecutive_days = consecutive_days + 1
-                else:
-                    # Вчера не было активности - сбрасываем счетчик
-                    new_consecutive_days = 1
-            else:
-                # Первая активность
-                new_consecutive_days = 1
-            
-            # Обновляем счетчик дней подряд
-            cursor.execute("""
-                UPDATE users 
-                SET consecutive_days = ?
-                WHERE chat_id = ?
-            """, (new_consecutive_days, chat_id))
-            
-            conn.commit()
-            conn.close()
-            return True
-            
-        except Exception as e:
-            logging.error(f"Ошибка при обновлении дней подряд: {e}")
-            return False
-
-    def check_level_up(self, chat_id: int) -> bool:
-        """Проверка повышения уровня (7 дней подряд)."""
+    def get_detailed_stats(self, chat_id: int) -> Optional[DetailedStats]:
+        """Получение детальной статистики пользователя.
+        
+        Обычно это один поиск по ключу в user_rollups. Если окна проекции
+        ещё не сдвинуты на сегодня, статистика считается по журналу.
+        """
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT level, consecutive_days 
-                FROM users 
-                WHERE chat_id = ?
-            """, (chat_id,))
-            
-            user_data = cursor.fetchone()
-            if not user_data:
-                conn.close()
-                return False
-            
-            level, consecutive_days = user_data
-            
-            # Проверяем, достиг ли пользователь 7 дней подряд
-            if consecutive_days >= 7 and level < 6:
-                new_level = level + 1
-                new_goal = self.get_daily_goal(new_level)
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(SQL_ROLLUP_STATS, (chat_id,))
+                row = cursor.fetchone()
+                if not row:
+                    return None
                 
-                # Обновляем уровень и цель
-                cursor.execute("""
-                    UPDATE users 
-                    SET level = ?, daily_goal = ?, consecutive_days = 0
-                    WHERE chat_id = ?
-                """, (new_level, new_goal, chat_id))
-                
-                conn.commit()
-                conn.close()
-                return True
-            
-            conn.close()
-            return False
+                windows_fresh = row[20]
+                if not windows_fresh:
+                    cursor.execute(SQL_DETAILED_STATS, (chat_id,))
+                    fallback = cursor.fetchone()
+            
+            user = User(*row[:9])
+            (lifetime_days, lifetime_pushups, first_activity, last_activity,
+             week_days, week_pushups, month_days, month_pushups,
+             today_count, best_day, best_day_pushups) = row[9:20]
+            
+            if not windows_fresh:
+                week_days, week_pushups, month_days, month_pushups = fallback[13:17]
+            
+            lifetime_days = lifetime_days or 0
+            lifetime_pushups = lifetime_pushups or 0
+            avg_per_day = lifetime_pushups / lifetime_days if lifetime_days else 0
+            
+            return DetailedStats(
+                user=user,
+                total_days=lifetime_days,
+                total_pushups=lifetime_pushups,
+                first_activity=first_activity,
+                last_activity=last_activity,
+                week_days=week_days or 0,
+                week_pushups=week_pushups or 0,
+                month_days=month_days or 0,
+                month_pushups=month_pushups or 0,
+                avg_per_day=round(avg_per_day, 1),
+                today_count=today_count or 0,
+                best_day=best_day,
+                best_day_pushups=best_day_pushups or 0,
+            )
             
         except Exception as e:
-            logging.error(f"Ошибка при проверке повышения уровня: {e}")
-            return False 
\ No newline at end of file
+            logging.error(f"Ошибка при получении детальной статистики: {e}")
+            return None
@@ -0,0 +1,305 @@
+"""
+Доставка сообщений с учётом лимитов Telegram.
+
+Через DeliveryEngine проходят все уведомления:
+- токен-бакеты: общий (около 30 сообщений/с на бота) и отдельный для каждого чата;
+  лимит Telegram действует на бота целиком, поэтому при нескольких
+  отправляющих процессах (воркеры Celery, бот) бакеты живут в Redis
+  и общие для всех процессов (DELIVERY_LIMITER=redis); при недоступности
+  Redis процесс на время DELIVERY_LIMITER_FALLBACK_SECONDS переходит на
+  локальные бакеты и не обращается к Redis;
+- ограниченное число одновременных отправок через одну сессию бота;
+- повторы с ожиданием retry_after при 429 и с нарастающей паузой при сетевых ошибках;
+- недоставленные сообщения (dead letters) пишутся в лог, а запись outbox
+  остаётся неотправленной с исчерпанными попытками, а не теряется молча.
+"""
+import asyncio
+import logging
+import os
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Optional
+
+from aiogram.exceptions import (
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+from src.infrastructure.metrics import metrics
+
+
+class TokenBucket:
+    """Токен-бакет: rate токенов в секунду, не больше capacity про запас."""
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+    
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    async def acquire(self) -> None:
+        """Ожидание и списание одного токена."""
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+    
+    def pause(self, seconds: float) -> None:
+        """Обнуление запаса на seconds секунд (после ответа 429)."""
+        self._refill()
+        self._tokens = min(self._tokens, 0) - seconds * self.rate
+
+
+# Атомарное списание токена из бакета в Redis по часам сервера Redis.
+# ARGV: rate, capacity, pause. pause > 0 обнуляет запас на pause секунд
+# (ответ 429). Возвращает, сколько секунд ждать до токена (0 - токен списан).
+_REDIS_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local pause = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if pause > 0 then
+    tokens = math.min(tokens, 0) - pause * rate
+elseif tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate) + 60)
+return tostring(wait)
+"""
+
+
+class LimiterCircuit:
+    """Размыкатель для лимитера в Redis, общий для всех бакетов процесса.
+    
+    После ошибки Redis бакеты fallback секунд работают локально и не
+    обращаются к Redis; первая после окна попытка проверяет, вернулся ли он.
+    """
+    
+    def __init__(self, fallback: Optional[float] = None):
+        if fallback is None:
+            fallback = float(os.getenv('DELIVERY_LIMITER_FALLBACK_SECONDS', '30'))
+        self.fallback = fallback
+        self._open_until = 0.0
+    
+    @property
+    def is_open(self) -> bool:
+        return time.monotonic() < self._open_until
+    
+    def trip(self, error: Exception) -> None:
+        """Переход на локальные бакеты; в лог - один раз на окно."""
+        if self.is_open:
+            return
+        self._open_until = time.monotonic() + self.fallback
+        metrics.inc('delivery.limiter_fallback')
+        logging.error(
+            f"Лимитер в Redis недоступен, {self.fallback:.0f} с используются локальные бакеты: {error}"
+        )
+
+
+class RedisTokenBucket:
+    """Токен-бакет в Redis, общий для всех процессов с тем же ключом.
+    
+    Если Redis недоступен, процесс продолжает по локальному бакету с
+    теми же параметрами, чтобы рассылка не встала.
+    """
+    
+    def __init__(self, client: Any, key: str, rate: float, capacity: float,
+                 circuit: Optional[LimiterCircuit] = None):
+        self.client = client
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity
+        self.circuit = circuit or LimiterCircuit()
+        self._fallback: Optional[TokenBucket] = None
+    
+    async def _call(self, pause: float) -> float:
+        wait = await self.client.eval(_REDIS_BUCKET_SCRIPT, 1, self.key,
+                                      self.rate, self.capacity, pause)
+        return float(wait)
+    
+    def _local(self) -> TokenBucket:
+        if self._fallback is None:
+            self._fallback = TokenBucket(self.rate, self.capacity)
+        return self._fallback
+    
+    async def acquire(self) -> None:
+        """Ожидание и списание одного токена."""
+        while not self.circuit.is_open:
+            try:
+                wait = await self._call(0)
+            except Exception as e:
+                self.circuit.trip(e)
+                break
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+        await self._local().acquire()
+    
+    async def pause(self, seconds: float) -> None:
+        """Обнуление запаса на seconds секунд для всех процессов."""
+        if not self.circuit.is_open:
+            try:
+                await self._call(seconds)
+                return
+            except Exception as e:
+                self.circuit.trip(e)
+        self._local().pause(seconds)
+
+
+async def _pause(bucket: Any, seconds: float) -> None:
+    """Пауза бакета: у локального синхронная, у бакета в Redis - корутина."""
+    result = bucket.pause(seconds)
+    if asyncio.iscoroutine(result):
+        await result
+
+
+class DeliveryEngine:
+    """Отправка сообщений одним ботом с лимитами и повторами."""
+    
+    def __init__(self, bot: Any,
+                 global_rate: Optional[float] = None,
+                 per_chat_rate: Optional[float] = None,
+                 max_concurrency: Optional[int] = None,
+                 max_attempts: Optional[int] = None,
+                 chat_buckets_size: int = 100000,
+                 redis_client: Any = None):
+        self.bot = bot
+        if global_rate is None:
+            global_rate = float(os.getenv('DELIVERY_GLOBAL_RATE', '30'))
+        if per_chat_rate is None:
+            per_chat_rate = float(os.getenv('DELIVERY_PER_CHAT_RATE', '1'))
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv('DELIVERY_CONCURRENCY', '20'))
+        if max_attempts is None:
+            max_attempts = int(os.getenv('DELIVERY_MAX_ATTEMPTS', '5'))
+        self.per_chat_rate = per_chat_rate
+        self.max_attempts = max_attempts
+        # С redis_client бакеты общие для всех процессов этого бота
+        self._redis = redis_client
+        self._circuit = LimiterCircuit()
+        self._key_prefix = f"pushups:rate:{getattr(bot, 'id', 'bot')}"
+        self._global = self._bucket('global', global_rate, global_rate)
+        self._chats: 'OrderedDict[int, Any]' = OrderedDict()
+        self._chat_buckets_size = chat_buckets_size
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._in_flight = 0
+        metrics.register_gauge('delivery.in_flight', lambda: self._in_flight)
+    
+    def _bucket(self, name: str, rate: float, capacity: float) -> Any:
+        if self._redis is None:
+            return TokenBucket(rate, capacity)
+        return RedisTokenBucket(self._redis, f"{self._key_prefix}:{name}", rate, capacity,
+                                self._circuit)
+    
+    def _chat_bucket(self, chat_id: int) -> Any:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._bucket(f'chat:{chat_id}', self.per_chat_rate, 1)
+            self._chats[chat_id] = bucket
+            if len(self._chats) > self._chat_buckets_size:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+        return bucket
+    
+    async def send_message(self, chat_id: int, text: str, **kwargs: Any) -> bool:
+        """Отправка с соблюдением лимитов; False - сообщение не доставлено (dead letter)."""
+        error = ''
+        for attempt in range(1, self.max_attempts + 1):
+            backoff = 0
+            chat_bucket = self._chat_bucket(chat_id)
+            await chat_bucket.acquire()
+            await self._global.acquire()
+            async with self._semaphore:
+                self._in_flight += 1
+                try:
+                    await self.bot.send_message(chat_id, text, **kwargs)
+                    metrics.inc('delivery.sent')
+                    return True
+                except TelegramRetryAfter as e:
+                    # 429: Telegram говорит, сколько ждать; лимит общий для бота
+                    error = str(e)
+                    await _pause(self._global, e.retry_after)
+                    await _pause(chat_bucket, e.retry_after)
+                    metrics.inc('delivery.retry_after')
+                except (TelegramNetworkError, TelegramServerError) as e:
+                    error = str(e)
+                    metrics.inc('delivery.retries')
+                    backoff = min(2 ** attempt, 30)
+                except TelegramForbiddenError as e:
+                    # Бот заблокирован пользователем: повтор не поможет
+                    error = str(e)
+                    break
+                except Exception as e:
+                    error = str(e)
+                    break
+                finally:
+                    self._in_flight -= 1
+            # Пауза вне семафора, чтобы не занимать слот отправки
+            if backoff and attempt < self.max_attempts:
+                await asyncio.sleep(backoff)
+        
+        # Dead letter: текст в логе, запись outbox вернётся после аренды
+        # или останется неотправленной, когда попытки исчерпаны
+        metrics.inc('delivery.failed')
+        logging.error(
+            f"Dead letter: сообщение пользователю {chat_id} не доставлено после "
+            f"{attempt} попыток: {error}; текст: {text!r}"
+        )
+        return False
+
+
+_engines: 'weakref.WeakKeyDictionary[Any, DeliveryEngine]' = weakref.WeakKeyDictionary()
+
+
+def _limiter_client() -> Any:
+    """Клиент Redis для общих лимитов или None (DELIVERY_LIMITER=local).
+    
+    По умолчанию лимиты общие (redis): в режиме celery сообщения шлют
+    несколько процессов воркеров. В режиме inprocess отправляет только
+    процесс бота, и достаточно локальных бакетов.
+    """
+    default = 'local' if os.getenv('NOTIFICATION_DISPATCHER', 'celery').lower() == 'inprocess' else 'redis'
+    kind = os.getenv('DELIVERY_LIMITER', default).lower()
+    if kind == 'local':
+        return None
+    if kind != 'redis':
+        raise ValueError(f"Неизвестный DELIVERY_LIMITER: {kind}")
+    import redis.asyncio
+    
+    url = os.getenv('DELIVERY_LIMITER_URL') or os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    # Недоступный Redis не должен задерживать каждую отправку: после
+    # таймаута бакеты переходят на локальные (LimiterCircuit)
+    timeout = float(os.getenv('DELIVERY_LIMITER_TIMEOUT', '0.5'))
+    return redis.asyncio.Redis.from_url(url, socket_connect_timeout=timeout, socket_timeout=timeout)
+
+
+def get_delivery_engine(bot: Any) -> DeliveryEngine:
+    """Движок доставки для бота (один на экземпляр бота).
+    
+    Создаётся в цикле событий, где работает бот: клиент Redis привязан к нему.
+    """
+    engine = _engines.get(bot)
+    if engine is None:
+        engine = DeliveryEngine(bot, redis_client=_limiter_client())
+        _engines[bot] = engine
+    return engine
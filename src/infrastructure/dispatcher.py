@@ -0,0 +1,260 @@
+"""
+Передача пачек уведомлений из outbox на отправку.
+
+Планировщик только записывает слоты в outbox. Записи забирает фоновый
+OutboxRelay - отдельная от минутной задачи корутина, поэтому долгая
+рассылка большой корзины не задерживает постановку следующих минут.
+
+Способ отправки выбирается переменной NOTIFICATION_DISPATCHER:
+- celery (по умолчанию) - relay работает в процессе планировщика, пачки
+  уходят задачами Celery через брокер воркерам (src/infrastructure/tasks.py);
+- inprocess - relay работает в процессе бота (main.py) и отправляет пачки
+  через сессию самого бота, без брокера и воркеров. Одновременно
+  отправляется не больше NOTIFICATION_CONCURRENCY пачек; темп сообщений
+  внутри пачек ограничивает движок доставки.
+"""
+import asyncio
+import functools
+import logging
+import os
+from dataclasses import astuple
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from aiogram import Bot
+
+import notifications
+from src.domain.entities import ReminderPayload, WeeklyReport
+
+# Виды уведомлений outbox: ежедневные напоминания и недельный отчёт
+REMINDER_KINDS = frozenset((*notifications.REMINDER_MESSAGES, 'weekly'))
+
+DISPATCHER_CELERY = 'celery'
+DISPATCHER_INPROCESS = 'inprocess'
+
+
+async def send_one(kind: str, bot: Bot, item: List[Any]) -> bool:
+    """Отправка одного уведомления из пачки через переданный бот.
+    
+    Для вида weekly item - поля WeeklyReport, для остальных - поля
+    ReminderPayload. Темп отправок ограничивает движок доставки
+    (src/infrastructure/delivery.py). Возвращает признак доставки.
+    """
+    if kind == 'weekly':
+        return await notifications.send_weekly_report(bot, WeeklyReport(*item))
+    return await notifications.send_reminder(bot, kind, ReminderPayload(*item))
+
+
+def outbox_max_age() -> int:
+    """Сколько секунд после слота запись outbox ещё можно отправить.
+    
+    По умолчанию - окно догона планировщика (SCHEDULER_GRACE_SECONDS):
+    напоминание, опоздавшее сильнее, уже не имеет смысла.
+    """
+    default = os.getenv('SCHEDULER_GRACE_SECONDS', '600')
+    return int(float(os.getenv('OUTBOX_MAX_AGE_SECONDS', default)))
+
+
+async def deliver_outbox_batch(db: Any, bot: Bot, kind: str, slot_date: str, claim_id: str,
+                               payloads: List[list]) -> int:
+    """Отправка пачки из outbox, арендованной с меткой claim_id.
+    
+    Записи идут группами по DELIVERY_CONCURRENCY: группа отмечается в
+    базе одной транзакцией непосредственно перед отправкой и только если
+    аренда claim_id ещё действует, а слот не старше outbox_max_age() -
+    пачка, переарендованная после истечения аренды, повторы задачи и
+    пролежавшие в брокере задачи её уже не отправят. Отметки неудачных
+    доставок снимаются второй транзакцией. Отмечено, но не отправлено
+    одновременно не больше DELIVERY_CONCURRENCY записей - столько может
+    потеряться при падении процесса.
+    Возвращает количество доставленных сообщений.
+    """
+    loop = asyncio.get_running_loop()
+    window = int(os.getenv('DELIVERY_CONCURRENCY', '20'))
+    max_age = outbox_max_age()
+    sent = skipped = 0
+    for start in range(0, len(payloads), window):
+        group = payloads[start:start + window]
+        # SQLite вызывается в потоке, чтобы не останавливать цикл событий
+        started = set(await loop.run_in_executor(None, functools.partial(
+            db.start_outbox_sends, kind, slot_date, [item[0] for item in group], claim_id, max_age
+        )))
+        skipped += len(group) - len(started)
+        group = [item for item in group if item[0] in started]
+        results = await asyncio.gather(*(send_one(kind, bot, item) for item in group),
+                                       return_exceptions=True)
+        failed = []
+        for item, result in zip(group, results):
+            if isinstance(result, Exception):
+                logging.error(f"Ошибка отправки '{kind}' пользователю {item[0]}: {result}")
+            if result is not True:
+                failed.append(item[0])
+        if failed:
+            await loop.run_in_executor(None, functools.partial(
+                db.release_outbox_sends, kind, slot_date, failed, claim_id
+            ))
+        sent += len(group) - len(failed)
+    
+    logging.info(
+        f"Outbox '{kind}' за {slot_date}: доставлено {sent} из {len(payloads)}, "
+        f"пропущено как отправленные, переарендованные или устаревшие {skipped}"
+    )
+    return sent
+
+
+class CeleryDispatcher:
+    """Пачки уходят задачами Celery."""
+    
+    async def submit(self, kind: str, slot_date: str, claim_id: str, payloads: List[list]) -> None:
+        # Импорт здесь: в режиме inprocess Celery не нужен
+        from src.infrastructure.tasks import send_outbox_batch
+        send_outbox_batch.delay(kind, slot_date, claim_id, payloads)
+    
+    async def aclose(self) -> None:
+        pass
+
+
+class InProcessDispatcher:
+    """Пачки отправляются в текущем цикле событий через бот процесса.
+    
+    Бот принадлежит вызывающему (main.py): диспетчер его сессию не закрывает.
+    """
+    
+    def __init__(self, bot: Bot, db: Any, max_concurrency: Optional[int] = None):
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv('NOTIFICATION_CONCURRENCY', '4'))
+        self.bot = bot
+        self.db = db
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+    
+    async def submit(self, kind: str, slot_date: str, claim_id: str, payloads: List[list]) -> None:
+        """Запуск отправки пачки; ждёт, пока освободится место в пуле."""
+        await self._semaphore.acquire()
+        task = asyncio.ensure_future(self._deliver(kind, slot_date, claim_id, payloads))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _deliver(self, kind: str, slot_date: str, claim_id: str, payloads: List[list]) -> None:
+        try:
+            await deliver_outbox_batch(self.db, self.bot, kind, slot_date, claim_id, payloads)
+        except Exception as e:
+            logging.error(f"Ошибка при отправке пачки outbox '{kind}' за {slot_date}: {e}")
+        finally:
+            self._semaphore.release()
+    
+    async def join(self) -> None:
+        """Ожидание всех начатых пачек."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks))
+    
+    async def aclose(self) -> None:
+        """Завершение начатых пачек."""
+        await self.join()
+
+
+def notification_dispatcher_mode() -> str:
+    """Режим отправки уведомлений по NOTIFICATION_DISPATCHER."""
+    mode = os.getenv('NOTIFICATION_DISPATCHER', DISPATCHER_CELERY).lower()
+    if mode not in (DISPATCHER_CELERY, DISPATCHER_INPROCESS):
+        logging.error(f"Неизвестный NOTIFICATION_DISPATCHER={mode}, используется celery")
+        return DISPATCHER_CELERY
+    return mode
+
+
+class OutboxRelay:
+    """Фоновая передача неотправленных записей outbox диспетчеру.
+    
+    Работает своей корутиной и не зависит от минутной задачи планировщика.
+    Записи арендуются на lease_seconds: если отправка не отмечена, запись
+    будет выдана снова с новой меткой аренды (не больше max_attempts раз).
+    Записи со слотом старше max_age секунд не выдаются: после простоя
+    бота или воркеров накопленные напоминания не уходят разом с опозданием.
+    Для еженедельных отчётов итоги недели считаются одним сгруппированным
+    запросом на пачку. Вызовы SQLite идут в пуле потоков, чтобы не
+    останавливать цикл событий бота.
+    """
+    
+    def __init__(self, db: Any, dispatcher: Any,
+                 batch_size: Optional[int] = None,
+                 lease_seconds: Optional[int] = None,
+                 max_attempts: Optional[int] = None,
+                 interval: Optional[float] = None,
+                 max_age: Optional[int] = None):
+        if batch_size is None:
+            batch_size = int(os.getenv('REMINDER_CHUNK_SIZE', '500'))
+        if lease_seconds is None:
+            lease_seconds = int(os.getenv('OUTBOX_LEASE_SECONDS', '600'))
+        if max_attempts is None:
+            max_attempts = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '3'))
+        if interval is None:
+            interval = float(os.getenv('OUTBOX_RELAY_INTERVAL', '5'))
+        if max_age is None:
+            max_age = outbox_max_age()
+        self.db = db
+        self.dispatcher = dispatcher
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.interval = interval
+        self.max_age = max_age
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+    
+    async def _db(self, func: Any, *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args))
+    
+    async def relay_once(self) -> int:
+        """Передача всех арендуемых сейчас записей; возвращает их число."""
+        total = 0
+        while True:
+            items = await self._db(self.db.claim_outbox, self.batch_size,
+                                   self.lease_seconds, self.max_attempts, self.max_age)
+            if not items:
+                return total
+            batches: Dict[Tuple[str, str, str], List[list]] = {}
+            for kind, slot_date, claim_id, payload in items:
+                batches.setdefault((kind, slot_date, claim_id), []).append(list(astuple(payload)))
+            for (kind, slot_date, claim_id), payloads in batches.items():
+                if kind == 'weekly':
+                    reports = await self._db(self.db.get_weekly_reports,
+                                             [payload[0] for payload in payloads])
+                    payloads = [list(astuple(report)) for report in reports]
+                await self.dispatcher.submit(kind, slot_date, claim_id, payloads)
+            total += len(items)
+    
+    def wake(self) -> None:
+        """Проверить outbox сейчас, не дожидаясь интервала (после записи слота)."""
+        self._wakeup.set()
+    
+    async def run_forever(self) -> None:
+        """Опрос outbox каждые interval секунд или по wake()."""
+        while True:
+            self._wakeup.clear()
+            try:
+                total = await self.relay_once()
+                if total:
+                    logging.info(f"Из outbox передано на отправку {total} уведомлений")
+            except Exception as e:
+                logging.error(f"Ошибка при передаче записей outbox: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+    
+    def start(self) -> asyncio.Task:
+        """Запуск relay фоновой задачей текущего цикла событий."""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self.run_forever())
+        return self._task
+    
+    async def aclose(self) -> None:
+        """Остановка опроса и завершение уже переданных пачек."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.dispatcher.aclose()
@@ -0,0 +1,49 @@
+"""
+Простые метрики процесса: счётчики и датчики в памяти.
+"""
+import logging
+import threading
+from typing import Callable, Dict, Union
+
+Number = Union[int, float]
+
+
+class MetricsRegistry:
+    """Потокобезопасный реестр счётчиков и датчиков."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Number] = {}
+        self._gauges: Dict[str, Callable[[], Number]] = {}
+    
+    def inc(self, name: str, value: Number = 1) -> None:
+        """Увеличение счётчика."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+    
+    def register_gauge(self, name: str, callback: Callable[[], Number]) -> None:
+        """Регистрация датчика, значение которого читается при снимке."""
+        with self._lock:
+            self._gauges[name] = callback
+    
+    def snapshot(self) -> Dict[str, Number]:
+        """Текущие значения всех метрик."""
+        with self._lock:
+            values = dict(self._counters)
+            gauges = dict(self._gauges)
+        for name, callback in gauges.items():
+            try:
+                values[name] = callback()
+            except Exception as e:
+                logging.warning(f"Ошибка чтения метрики {name}: {e}")
+        return values
+    
+    def log_snapshot(self) -> None:
+        """Запись снимка метрик в лог."""
+        values = self.snapshot()
+        if values:
+            formatted = ', '.join(f"{name}={value}" for name, value in sorted(values.items()))
+            logging.info(f"Метрики: {formatted}")
+
+
+metrics = MetricsRegistry()
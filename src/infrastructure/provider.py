@@ -0,0 +1,78 @@
+"""
+Провайдер адаптеров базы данных на процесс.
+
+Схема инициализируется и миграции проверяются один раз при первом
+обращении; дальше все слои получают один и тот же экземпляр.
+Общий кэш (SHARED_CACHE) создаётся так же - один на процесс.
+"""
+import threading
+from typing import Any, Optional, Union
+
+from src.infrastructure.async_database import AsyncDatabaseAdapter
+from src.infrastructure.database import DatabaseAdapter
+from src.infrastructure.shared_cache import SharedCache, SharedCacheReader, create_shared_cache
+from src.infrastructure.sharding import ShardedDatabaseAdapter, create_database_adapter
+
+Database = Union[DatabaseAdapter, ShardedDatabaseAdapter]
+
+_lock = threading.Lock()
+_database: Optional[Database] = None
+_async_database: Optional[AsyncDatabaseAdapter] = None
+_shared_cache: Optional[SharedCache] = None
+_shared_cache_ready = False
+
+
+def get_database() -> Database:
+    """Синхронный адаптер базы данных процесса."""
+    global _database
+    if _database is None:
+        with _lock:
+            if _database is None:
+                _database = create_database_adapter()
+    return _database
+
+
+def get_shared_cache() -> Optional[SharedCache]:
+    """Общий кэш процесса или None, если он выключен (SHARED_CACHE=off)."""
+    global _shared_cache, _shared_cache_ready
+    if not _shared_cache_ready:
+        with _lock:
+            if not _shared_cache_ready:
+                _shared_cache = create_shared_cache()
+                _shared_cache_ready = True
+    return _shared_cache
+
+
+def get_database_reader() -> Any:
+    """Читатель пользователей для планировщика и воркеров (через общий кэш)."""
+    reader = get_database().reader()
+    cache = get_shared_cache()
+    return SharedCacheReader(reader, cache) if cache is not None else reader
+
+
+def get_async_database() -> AsyncDatabaseAdapter:
+    """Асинхронный адаптер процесса поверх общего синхронного."""
+    global _async_database
+    if _async_database is None:
+        database = get_database()
+        shared_cache = get_shared_cache()
+        with _lock:
+            if _async_database is None:
+                _async_database = AsyncDatabaseAdapter(database, shared_cache=shared_cache)
+    return _async_database
+
+
+def close_databases() -> None:
+    """Закрытие адаптеров процесса (при завершении работы)."""
+    global _database, _async_database, _shared_cache, _shared_cache_ready
+    with _lock:
+        async_database, database = _async_database, _database
+        shared_cache = _shared_cache
+        _async_database = _database = _shared_cache = None
+        _shared_cache_ready = False
+    if async_database is not None:
+        async_database.close()
+    elif database is not None:
+        database.close()
+    if shared_cache is not None:
+        shared_cache.close()
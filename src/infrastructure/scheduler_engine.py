@@ -0,0 +1,226 @@
+"""
+Движок планировщика без дрейфа.
+
+Время следующего запуска каждой задачи вычисляется по сетке UTC, а не
+отсчитывается sleep(60) от конца предыдущей итерации, поэтому долгая
+рассылка не сдвигает и не пропускает слоты. После каждого запуска
+сохраняется отметка (watermark) - плановое время выполненного запуска.
+После перезапуска процесса пропущенные запуски догоняются, если они
+не старше окна grace; более старые пропускаются с записью в лог.
+Если задача завершилась исключением, отметка не сдвигается, а тот же
+запуск повторяется через retry секунд (в пределах окна grace).
+
+Часы и хранилище отметок передаются снаружи, поэтому движок можно
+прогонять на искусственном времени.
+"""
+import asyncio
+import logging
+import os
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+Schedule = Callable[[datetime], datetime]
+JobAction = Callable[[datetime], Awaitable[None]]
+
+
+def every(minutes: int, offset: int = 0) -> Schedule:
+    """Запуски каждые minutes минут со сдвигом offset минут от полуночи UTC.
+    
+    every(1) - каждую минуту, every(60) - в начале часа,
+    every(24 * 60, 5) - ежедневно в 00:05 UTC.
+    """
+    period = minutes * 60
+    shift = offset * 60
+    
+    def next_after(moment: datetime) -> datetime:
+        elapsed = (moment - EPOCH).total_seconds() - shift
+        slots = int(elapsed // period) + 1
+        return EPOCH + timedelta(seconds=slots * period + shift)
+    
+    return next_after
+
+
+@dataclass
+class Job:
+    """Задача планировщика.
+    
+    action получает плановое время запуска, а не текущее: при догоне
+    пропущенных минут задача обрабатывает именно их.
+    """
+    name: str
+    schedule: Schedule
+    action: JobAction
+    jitter: float = 0.0
+    grace: Optional[float] = None
+
+
+class Clock:
+    """Системные часы (UTC)."""
+    
+    def now(self) -> datetime:
+        return datetime.now(timezone.utc)
+    
+    async def sleep(self, seconds: float) -> None:
+        await asyncio.sleep(seconds)
+
+
+class MemoryWatermarkStore:
+    """Отметки в памяти: для прогонов без базы."""
+    
+    def __init__(self):
+        self._marks: Dict[str, datetime] = {}
+    
+    def get_job_watermark(self, job: str) -> Optional[datetime]:
+        return self._marks.get(job)
+    
+    def set_job_watermark(self, job: str, fired_at: datetime) -> None:
+        self._marks[job] = fired_at
+
+
+class SchedulerEngine:
+    """Запуск задач по расписанию с сохранением отметок и догоном пропусков.
+    
+    store - объект с методами get_job_watermark/set_job_watermark
+    (DatabaseAdapter, ShardedDatabaseAdapter или MemoryWatermarkStore).
+    """
+    
+    def __init__(self, jobs: List[Job], store,
+                 clock: Optional[Clock] = None,
+                 grace: Optional[float] = None,
+                 rng: Optional[random.Random] = None,
+                 retry: Optional[float] = None):
+        if grace is None:
+            grace = float(os.getenv('SCHEDULER_GRACE_SECONDS', '600'))
+        if retry is None:
+            retry = float(os.getenv('SCHEDULER_RETRY_SECONDS', '15'))
+        self.jobs = jobs
+        self.store = store
+        self.clock = clock or Clock()
+        self.grace = grace
+        self.retry = retry
+        self.rng = rng or random.Random()
+        self._due: Dict[str, datetime] = {}
+        # Не раньше какого времени повторять запуск, завершившийся ошибкой
+        self._retry_at: Dict[str, datetime] = {}
+        self._stopped = False
+    
+    def _grace(self, job: Job) -> timedelta:
+        return timedelta(seconds=self.grace if job.grace is None else job.grace)
+    
+    @staticmethod
+    def _resume(job: Job, horizon: datetime) -> datetime:
+        """Первый запуск не раньше horizon (граница окна включается)."""
+        return job.schedule(horizon - timedelta(microseconds=1))
+    
+    def _first_due(self, job: Job, now: datetime) -> datetime:
+        """Первый запуск после отметки, но не старше окна grace."""
+        try:
+            watermark = self.store.get_job_watermark(job.name)
+        except Exception as e:
+            logging.error(f"Не удалось прочитать отметку задачи {job.name}: {e}")
+            watermark = None
+        # Без отметки (первый запуск) прошлое не догоняем
+        due = job.schedule(watermark or now)
+        horizon = now - self._grace(job)
+        if due < horizon:
+            resumed = self._resume(job, horizon)
+            logging.warning(
+                f"Задача {job.name}: пропущены запуски с {due.isoformat()} "
+                f"до {resumed.isoformat()} (старше окна догона)"
+            )
+            due = resumed
+        return due
+    
+    def _ready_at(self, job: Job) -> datetime:
+        """Время, когда запуск задачи можно выполнять (с учётом повтора)."""
+        due = self._due[job.name]
+        retry_at = self._retry_at.get(job.name)
+        return max(due, retry_at) if retry_at else due
+    
+    def next_due(self) -> Tuple[datetime, Job]:
+        """Ближайший запуск среди всех задач (повтор после ошибки - не раньше паузы)."""
+        now = self.clock.now()
+        for job in self.jobs:
+            if job.name not in self._due:
+                self._due[job.name] = self._first_due(job, now)
+        # При равном времени задачи идут в порядке списка
+        ready, _, job = min(((self._ready_at(job), index, job) for index, job in enumerate(self.jobs)),
+                            key=lambda item: item[:2])
+        return ready, job
+    
+    async def _fire(self, job: Job, due: datetime) -> None:
+        try:
+            await job.action(due)
+        except Exception as e:
+            logging.error(f"Ошибка задачи {job.name} за {due.isoformat()}: {e}")
+            self._schedule_retry(job, due)
+            return
+        self._retry_at.pop(job.name, None)
+        try:
+            self.store.set_job_watermark(job.name, due)
+        except Exception as e:
+            logging.error(f"Не удалось сохранить отметку задачи {job.name}: {e}")
+        
+        # Следующий запуск считается от планового времени, а не от текущего
+        next_due = job.schedule(due)
+        horizon = self.clock.now() - self._grace(job)
+        if next_due < horizon:
+            resumed = self._resume(job, horizon)
+            logging.warning(
+                f"Задача {job.name}: пропущены запуски с {next_due.isoformat()} "
+                f"до {resumed.isoformat()} (выполнение заняло больше окна догона)"
+            )
+            next_due = resumed
+        self._due[job.name] = next_due
+    
+    def _schedule_retry(self, job: Job, due: datetime) -> None:
+        """Повтор запуска due без сдвига отметки.
+        
+        Если запуск уже старше окна grace, он пропускается так же, как
+        пропуски после простоя: отметка по-прежнему не сдвигается.
+        """
+        now = self.clock.now()
+        horizon = now - self._grace(job)
+        if due < horizon:
+            resumed = self._resume(job, horizon)
+            logging.warning(
+                f"Задача {job.name}: запуски с {due.isoformat()} до {resumed.isoformat()} "
+                f"не удались в пределах окна догона и пропущены"
+            )
+            self._due[job.name] = resumed
+        self._retry_at[job.name] = now + timedelta(seconds=self.retry)
+    
+    async def run_pending(self) -> List[Tuple[str, datetime]]:
+        """Выполнение всех наступивших запусков; возвращает (задача, плановое время)."""
+        fired = []
+        while True:
+            ready, job = self.next_due()
+            now = self.clock.now()
+            if ready > now:
+                return fired
+            due = self._due[job.name]
+            # Разброс только для запусков вовремя: догон идёт без задержек
+            if job.jitter and now - due < timedelta(seconds=job.jitter):
+                delay = self.rng.uniform(0, job.jitter) - (now - due).total_seconds()
+                if delay > 0:
+                    await self.clock.sleep(delay)
+            await self._fire(job, due)
+            fired.append((job.name, due))
+    
+    async def run_forever(self) -> None:
+        """Основной цикл: выполнить наступившее и спать до ближайшего запуска."""
+        self._stopped = False
+        while not self._stopped:
+            await self.run_pending()
+            due, _ = self.next_due()
+            delay = (due - self.clock.now()).total_seconds()
+            if delay > 0:
+                await self.clock.sleep(delay)
+    
+    def stop(self) -> None:
+        """Остановка цикла после текущей итерации."""
+        self._stopped = True
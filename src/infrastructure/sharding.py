@@ -0,0 +1,348 @@
+"""
+Шардированный адаптер базы данных: пользователи и их активность
+распределяются по нескольким файлам SQLite по хешу chat_id.
+"""
+import logging
+import os
+import zlib
+from dataclasses import replace
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from src.domain.entities import User, UserStats, DetailedStats, ReminderPayload, WeeklyReport
+from src.infrastructure.database import SCHEDULE_COLUMNS, DatabaseAdapter
+
+# Переносимые при перешардировании колонки outbox (без id)
+OUTBOX_COLUMNS = 'chat_id, kind, slot_date, attempts, claimed_at, sent_at, claim_id, due_at'
+
+
+def shard_paths(db_path: str, shards: int) -> List[str]:
+    """Пути файлов шардов: users.db -> users.0.db, users.1.db, ...
+
+    Один шард - это исходный файл, поэтому переход с обычной базы
+    на шардированную выполняется командой reshard.
+    """
+    if shards < 1:
+        raise ValueError("Количество шардов должно быть не меньше 1")
+    if shards == 1:
+        return [db_path]
+    base, ext = os.path.splitext(db_path)
+    return [f"{base}.{index}{ext}" for index in range(shards)]
+
+
+def shard_for(chat_id: int, shards: int) -> int:
+    """Номер шарда для chat_id (стабилен между процессами)."""
+    return zlib.crc32(str(chat_id).encode()) % shards
+
+
+class ShardedDatabaseAdapter:
+    """Адаптер с интерфейсом DatabaseAdapter поверх N шардов SQLite.
+    
+    Идентификаторы пользователей снаружи глобальные:
+    global_id = local_id * N + номер шарда, поэтому методы, принимающие
+    user_id (save_daily_activity), находят шард без дополнительных запросов.
+    """
+    
+    def __init__(self, db_path: Optional[str] = None, shards: Optional[int] = None,
+                 pool_mode: Optional[str] = None,
+                 shard_adapters: Optional[List[DatabaseAdapter]] = None):
+        if db_path is None:
+            db_path = os.getenv('DB_PATH', 'users.db')
+        self.db_path = db_path
+        self._reader: Optional['ShardedDatabaseAdapter'] = None
+        if shard_adapters is not None:
+            self.shards = shard_adapters
+            return
+        if shards is None:
+            shards = int(os.getenv('DB_SHARDS', '1'))
+        self.shards = [
+            DatabaseAdapter(path, pool_mode=pool_mode) for path in shard_paths(db_path, shards)
+        ]
+    
+    def reader(self) -> 'ShardedDatabaseAdapter':
+        """Полоса только для чтения: читатели всех шардов."""
+        if all(shard.read_only for shard in self.shards):
+            return self
+        if self._reader is None:
+            self._reader = ShardedDatabaseAdapter(
+                self.db_path, shard_adapters=[shard.reader() for shard in self.shards]
+            )
+        return self._reader
+    
+    def _shard(self, chat_id: int) -> DatabaseAdapter:
+        return self.shards[shard_for(chat_id, len(self.shards))]
+    
+    def _to_global(self, user: Optional[User], shard_index: int) -> Optional[User]:
+        if user is None:
+            return None
+        return replace(user, id=user.id * len(self.shards) + shard_index)
+    
+    def _to_local(self, user_id: int) -> Tuple[DatabaseAdapter, int]:
+        shard_index = user_id % len(self.shards)
+        return self.shards[shard_index], user_id // len(self.shards)
+    
+    def _shard_index(self, chat_id: int) -> int:
+        return shard_for(chat_id, len(self.shards))
+    
+    def save_user(self, chat_id: int, first_name: str) -> Optional[User]:
+        """Сохранение или обновление пользователя."""
+        return self._to_global(self._shard(chat_id).save_user(chat_id, first_name),
+                               self._shard_index(chat_id))
+    
+    def get_user(self, chat_id: int) -> Optional[User]:
+        """Получение пользователя по chat_id."""
+        return self._to_global(self._shard(chat_id).get_user(chat_id), self._shard_index(chat_id))
+    
+    def save_daily_activity(self, user_id: int, pushups_count: int) -> Optional[User]:
+        """Сохранение ежедневной активности по глобальному id пользователя."""
+        shard, local_id = self._to_local(user_id)
+        return self._to_global(shard.save_daily_activity(local_id, pushups_count),
+                               user_id % len(self.shards))
+    
+    def record_activity(self, chat_id: int, pushups_count: int) -> Optional[User]:
+        """Сохранение ежедневной активности по chat_id."""
+        return self._to_global(self._shard(chat_id).record_activity(chat_id, pushups_count),
+                               self._shard_index(chat_id))
+    
+    def record_activities(self, items: List[Tuple[int, int]]) -> List[Optional[User]]:
+        """Запись пачки подходов: по одной транзакции на затронутый шард."""
+        by_shard: Dict[int, List[int]] = {}
+        for position, (chat_id, _) in enumerate(items):
+            by_shard.setdefault(self._shard_index(chat_id), []).append(position)
+        
+        results: List[Optional[User]] = [None] * len(items)
+        for shard_index, positions in by_shard.items():
+            shard_results = self.shards[shard_index].record_activities(
+                [items[position] for position in positions]
+            )
+            for position, user in zip(positions, shard_results):
+                results[position] = self._to_global(user, shard_index)
+        return results
+    
+    def get_user_stats(self, chat_id: int) -> Optional[UserStats]:
+        """Получение статистики пользователя."""
+        stats = self._shard(chat_id).get_user_stats(chat_id)
+        if stats is None:
+            return None
+        return replace(stats, user_data=self._to_global(stats.user_data, self._shard_index(chat_id)))
+    
+    def check_today_activity(self, chat_id: int) -> bool:
+        """Проверка активности за сегодня."""
+        return self._shard(chat_id).check_today_activity(chat_id)
+    
+    def update_user_level(self, chat_id: int, new_level: int) -> bool:
+        """Обновление уровня пользователя."""
+        return self._shard(chat_id).update_user_level(chat_id, new_level)
+    
+    def set_user_timezone(self, chat_id: int, tz_name: str) -> bool:
+        """Смена часового пояса пользователя."""
+        return self._shard(chat_id).set_user_timezone(chat_id, tz_name)
+    
+    def refresh_schedule_buckets(self) -> int:
+        """Пересчёт корзин напоминаний на всех шардах."""
+        return sum(shard.refresh_schedule_buckets() for shard in self.shards)
+    
+    def enqueue_outbox(self, kind: str, fire_time: str, bucket: int) -> int:
+        """Запись слота в outbox на всех шардах."""
+        return sum(shard.enqueue_outbox(kind, fire_time, bucket) for shard in self.shards)
+    
+    def claim_outbox(self, batch_size: int, lease_seconds: int = 600,
+                     max_attempts: int = 3,
+                     max_age: int = 600) -> List[Tuple[str, str, str, ReminderPayload]]:
+        """Аренда пачки записей outbox: шарды опрашиваются по очереди до batch_size."""
+        items: List[Tuple[str, str, str, ReminderPayload]] = []
+        for shard in self.shards:
+            if len(items) >= batch_size:
+                break
+            items.extend(shard.claim_outbox(batch_size - len(items), lease_seconds, max_attempts, max_age))
+        return items
+    
+    def _group_by_shard(self, chat_ids: List[int]) -> Dict[int, List[int]]:
+        groups: Dict[int, List[int]] = {}
+        for chat_id in chat_ids:
+            groups.setdefault(self._shard_index(chat_id), []).append(chat_id)
+        return groups
+    
+    def get_weekly_reports(self, chat_ids: List[int], chunk_size: int = 500) -> List[WeeklyReport]:
+        """Недельные итоги: по одному сгруппированному запросу в шарде получателей."""
+        reports: List[WeeklyReport] = []
+        for index, group in self._group_by_shard(chat_ids).items():
+            reports.extend(self.shards[index].get_weekly_reports(group, chunk_size))
+        return reports
+    
+    def start_outbox_sends(self, kind: str, slot_date: str, chat_ids: List[int],
+                           claim_id: str, max_age: int = 600) -> List[int]:
+        """Отметка записей outbox перед отправкой: одна транзакция на шард получателей."""
+        started: List[int] = []
+        for index, group in self._group_by_shard(chat_ids).items():
+            started.extend(self.shards[index].start_outbox_sends(kind, slot_date, group, claim_id, max_age))
+        return started
+    
+    def release_outbox_sends(self, kind: str, slot_date: str, chat_ids: List[int],
+                             claim_id: str) -> None:
+        """Снятие отметок после неудачной отправки в шардах получателей."""
+        for index, group in self._group_by_shard(chat_ids).items():
+            self.shards[index].release_outbox_sends(kind, slot_date, group, claim_id)
+    
+    def prune_outbox(self, before: str) -> int:
+        """Очистка outbox на всех шардах."""
+        return sum(shard.prune_outbox(before) for shard in self.shards)
+    
+    def get_job_watermark(self, job: str) -> Optional[datetime]:
+        """Отметка задачи планировщика (хранится в первом шарде)."""
+        return self.shards[0].get_job_watermark(job)
+    
+    def set_job_watermark(self, job: str, fired_at: datetime) -> None:
+        """Сохранение отметки задачи планировщика в первом шарде."""
+        self.shards[0].set_job_watermark(job, fired_at)
+    
+    def get_daily_goal(self, level: int) -> int:
+        """Получение ежедневной цели по уровню."""
+        return self.shards[0].get_daily_goal(level)
+    
+    def get_today_activity_count(self, chat_id: int) -> int:
+        """Получение количества отжиманий за сегодня."""
+        return self._shard(chat_id).get_today_activity_count(chat_id)
+    
+    def get_detailed_stats(self, chat_id: int) -> Optional[DetailedStats]:
+        """Получение детальной статистики пользователя."""
+        stats = self._shard(chat_id).get_detailed_stats(chat_id)
+        if stats is None:
+            return None
+        return replace(stats, user=self._to_global(stats.user, self._shard_index(chat_id)))
+    
+    def rebuild_rollups(self) -> int:
+        """Пересборка user_rollups на всех шардах."""
+        return sum(shard.rebuild_rollups() for shard in self.shards)
+    
+    def slide_rollup_windows(self, batch_size: int = 1000) -> int:
+        """Сдвиг окон user_rollups на всех шардах."""
+        return sum(shard.slide_rollup_windows(batch_size) for shard in self.shards)
+    
+    def explain_hot_queries(self) -> Dict[str, List[str]]:
+        """Планы горячих запросов (схема у всех шардов одинаковая)."""
+        return self.shards[0].explain_hot_queries()
+    
+    def close(self) -> None:
+        """Закрытие соединений всех шардов."""
+        for shard in self.shards:
+            shard.close()
+
+
+def create_database_adapter(db_path: Optional[str] = None, pool_mode: Optional[str] = None):
+    """Адаптер базы по настройкам окружения: обычный или шардированный (DB_SHARDS > 1)."""
+    shards = int(os.getenv('DB_SHARDS', '1'))
+    if shards > 1:
+        return ShardedDatabaseAdapter(db_path, shards=shards, pool_mode=pool_mode)
+    return DatabaseAdapter(db_path, pool_mode=pool_mode)
+
+
+def reshard(db_path: str, source_shards: int, target_shards: int, batch_size: int = 500) -> int:
+    """Офлайн-перераспределение пользователей между шардами.
+    
+    Бот и планировщик должны быть остановлены. Пользователи с активностью
+    и расписанием, а также записи outbox копируются в шард по chat_id в новые
+    файлы *.resharding, затем старые файлы переименовываются в *.bak-<время>,
+    а новые занимают их место. Возвращает количество перенесённых пользователей.
+    """
+    sources = shard_paths(db_path, source_shards)
+    targets = shard_paths(db_path, target_shards)
+    missing = [path for path in sources if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(f"Не найдены файлы шардов: {', '.join(missing)}")
+    
+    staging = [f"{path}.resharding" for path in targets]
+    for path in staging:
+        if os.path.exists(path):
+            os.remove(path)
+    target_adapters = [DatabaseAdapter(path) for path in staging]
+    target_connections = [adapter._get_connection() for adapter in target_adapters]
+    
+    schedule_columns = ', '.join(('utc_offset', *SCHEDULE_COLUMNS.values()))
+    moved = 0
+    try:
+        for source_path in sources:
+            source = DatabaseAdapter(source_path)
+            with source._connection() as source_conn:
+                users = source_conn.execute("""
+                    SELECT id, chat_id, first_name, level, days, total_count,
+                        last_activity_date, consecutive_days, daily_goal
+                    FROM users
+                """)
+                while True:
+                    batch = users.fetchmany(batch_size)
+                    if not batch:
+                        break
+                    for row in batch:
+                        target_conn = target_connections[shard_for(row[1], target_shards)]
+                        cursor = target_conn.execute("""
+                            INSERT INTO users (chat_id, first_name, level, days, total_count,
+                                last_activity_date, consecutive_days, daily_goal)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        """, row[1:])
+                        activity = source_conn.execute("""
+                            SELECT activity_date, pushups_count, completed, created_at
+                            FROM daily_activity WHERE user_id = ?
+                        """, (row[0],)).fetchall()
+                        target_conn.executemany("""
+                            INSERT INTO daily_activity (user_id, activity_date, pushups_count,
+                                completed, created_at)
+                            VALUES (?, ?, ?, ?, ?)
+                        """, [(cursor.lastrowid, *item) for item in activity])
+                        schedule = source_conn.execute(f"""
+                            SELECT timezone, {schedule_columns}
+                            FROM user_schedule WHERE user_id = ?
+                        """, (row[0],)).fetchone()
+                        if schedule:
+                            target_conn.execute(f"""
+                                INSERT INTO user_schedule (user_id, timezone, {schedule_columns})
+                                VALUES ({', '.join('?' * (len(schedule) + 1))})
+                            """, (cursor.lastrowid, *schedule))
+                        moved += 1
+                    for target_conn in target_connections:
+                        target_conn.commit()
+                
+                # Outbox: записи переходят в шард получателя, id выдаёт новый шард
+                outbox = source_conn.execute(f"""
+                    SELECT {OUTBOX_COLUMNS} FROM outbox ORDER BY id
+                """)
+                while True:
+                    batch = outbox.fetchmany(batch_size)
+                    if not batch:
+                        break
+                    for row in batch:
+                        target_connections[shard_for(row[0], target_shards)].execute(f"""
+                            INSERT INTO outbox ({OUTBOX_COLUMNS})
+                            VALUES ({', '.join('?' * len(row))})
+                        """, row)
+                    for target_conn in target_connections:
+                        target_conn.commit()
+            source.close()
+        
+        # Отметки планировщика живут в первом шарде
+        source = DatabaseAdapter(sources[0])
+        with source._connection() as source_conn:
+            target_connections[0].executemany(
+                "INSERT INTO scheduler_state (job, fired_at) VALUES (?, ?)",
+                source_conn.execute("SELECT job, fired_at FROM scheduler_state").fetchall()
+            )
+            target_connections[0].commit()
+        source.close()
+        
+        for adapter in target_adapters:
+            adapter.rebuild_rollups()
+    finally:
+        for adapter, conn in zip(target_adapters, target_connections):
+            adapter._release_connection(conn)
+            adapter.close()
+    
+    suffix = datetime.now().strftime('%Y%m%d%H%M%S')
+    for path in sources:
+        os.replace(path, f"{path}.bak-{suffix}")
+    for staged, path in zip(staging, targets):
+        os.replace(staged, path)
+    
+    logging.info(
+        f"Перешардирование {source_shards} -> {target_shards} завершено: {moved} пользователей"
+    )
+    return moved
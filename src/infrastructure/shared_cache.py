@@ -0,0 +1,300 @@
+"""
+Общий кэш для бота, планировщика и воркеров Celery.
+
+Хранит снимки пользователей и сегодняшние суммы отжиманий, чтобы чтения
+напоминаний не ходили в SQLite за каждым пользователем.
+
+Инвалидация по версиям: у каждого пользователя есть счётчик версии,
+который бот увеличивает после фиксации записи. Запись кэша хранится
+вместе с версией, прочитанной до обращения к SQLite, и выдаётся, только
+пока эта версия текущая. Поэтому читатель, разминувшийся с записью бота,
+не может оставить в кэше устаревшие данные. Вместе с новой версией бот
+публикует chat_id в канал pushups:invalidate: другие процессы сбрасывают
+по нему локальные кэши (VersionRegistry и кэш пользователей адаптера).
+
+Реализации:
+    RedisSharedCache - Redis из docker-compose (SHARED_CACHE=redis);
+    InMemorySharedCache - кэш в памяти процесса, для проверок и отладки.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import asdict
+from datetime import date, datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.domain.entities import User
+from src.infrastructure.metrics import metrics
+
+InvalidationListener = Callable[[int], None]
+
+INVALIDATION_CHANNEL = 'pushups:invalidate'
+
+
+def _today() -> str:
+    """Сегодняшняя дата в UTC - как CURRENT_DATE в SQLite."""
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+class SharedCache(ABC):
+    """Интерфейс общего кэша снимков пользователей.
+
+    lookup_* возвращают (значение или None, текущая версия): версию нужно
+    передать в set_* после чтения из базы.
+    """
+
+    def __init__(self):
+        self._listeners: List[InvalidationListener] = []
+
+    @abstractmethod
+    def lookup_user(self, chat_id: int) -> Tuple[Optional[User], int]:
+        """Снимок пользователя текущей версии и сама версия."""
+
+    @abstractmethod
+    def set_user(self, user: User, version: int) -> None:
+        """Сохранение снимка, прочитанного при версии version."""
+
+    @abstractmethod
+    def lookup_today_count(self, chat_id: int) -> Tuple[Optional[int], int]:
+        """Сумма за сегодня текущей версии и сама версия."""
+
+    @abstractmethod
+    def set_today_count(self, chat_id: int, count: int, version: int) -> None:
+        """Сохранение суммы за сегодня, прочитанной при версии version."""
+
+    @abstractmethod
+    def bump(self, chat_ids: Iterable[int]) -> None:
+        """Новые версии пользователей после записи и оповещение других процессов."""
+
+    def subscribe(self, listener: InvalidationListener) -> None:
+        """Подписка на записи других процессов (вызывается с chat_id)."""
+        self._listeners.append(listener)
+
+    def _notify(self, chat_id: int) -> None:
+        for listener in self._listeners:
+            try:
+                listener(chat_id)
+            except Exception as e:
+                logging.error(f"Ошибка обработчика инвалидации кэша: {e}")
+
+    def close(self) -> None:
+        """Освобождение ресурсов."""
+
+
+class InMemorySharedCache(SharedCache):
+    """Общий кэш в памяти процесса: подписчики оповещаются сразу."""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._versions: Dict[int, int] = {}
+        self._entries: Dict[Tuple[str, int, str], Tuple[int, Any]] = {}
+
+    def _lookup(self, key: Tuple[str, int, str]) -> Tuple[Any, int]:
+        with self._lock:
+            version = self._versions.get(key[1], 0)
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1], version
+        return None, version
+
+    def _set(self, key: Tuple[str, int, str], value: Any, version: int) -> None:
+        with self._lock:
+            self._entries[key] = (version, value)
+
+    def lookup_user(self, chat_id: int) -> Tuple[Optional[User], int]:
+        return self._lookup(('user', chat_id, ''))
+
+    def set_user(self, user: User, version: int) -> None:
+        self._set(('user', user.chat_id, ''), user, version)
+
+    def lookup_today_count(self, chat_id: int) -> Tuple[Optional[int], int]:
+        return self._lookup(('today', chat_id, _today()))
+
+    def set_today_count(self, chat_id: int, count: int, version: int) -> None:
+        self._set(('today', chat_id, _today()), count, version)
+
+    def bump(self, chat_ids: Iterable[int]) -> None:
+        for chat_id in chat_ids:
+            with self._lock:
+                self._versions[chat_id] = self._versions.get(chat_id, 0) + 1
+            metrics.inc('shared_cache.invalidations')
+            self._notify(chat_id)
+
+
+class RedisSharedCache(SharedCache):
+    """Общий кэш в Redis: версия и запись читаются одним MGET.
+
+    Записи живут не дольше ttl секунд, версии - сутки (заведомо дольше
+    записей, поэтому сброс счётчика не оживит старую запись). После
+    ошибки Redis кэш fallback секунд не используется: чтения идут в базу.
+    """
+
+    def __init__(self, url: str, ttl: int = 300, timeout: float = 0.5, fallback: float = 30):
+        super().__init__()
+        import redis
+
+        self.ttl = ttl
+        self.fallback = fallback
+        self._redis = redis.Redis.from_url(url, socket_connect_timeout=timeout, socket_timeout=timeout)
+        # Метка процесса: свои сообщения о записи подписчики пропускают
+        self._origin = uuid.uuid4().hex
+        self._failed_until = 0.0
+        self._pubsub: Any = None
+        self._listener: Any = None
+
+    @staticmethod
+    def _version_key(chat_id: int) -> str:
+        return f'pushups:version:{chat_id}'
+
+    @staticmethod
+    def _user_key(chat_id: int) -> str:
+        return f'pushups:user:{chat_id}'
+
+    @staticmethod
+    def _today_key(chat_id: int) -> str:
+        return f'pushups:today:{chat_id}:{_today()}'
+
+    def _available(self) -> bool:
+        return time.monotonic() >= self._failed_until
+
+    def _failed(self, action: str, error: Exception) -> None:
+        if self._available():
+            logging.error(f"Общий кэш в Redis недоступен ({action}), {self.fallback:.0f} с чтения идут в базу: {error}")
+        self._failed_until = time.monotonic() + self.fallback
+        metrics.inc('shared_cache.errors')
+
+    def _lookup(self, chat_id: int, key: str) -> Tuple[Any, int]:
+        if not self._available():
+            return None, -1
+        try:
+            version, raw = self._redis.mget(self._version_key(chat_id), key)
+        except Exception as e:
+            self._failed('чтение', e)
+            return None, -1
+        version = int(version or 0)
+        if raw is None:
+            return None, version
+        entry = json.loads(raw)
+        return (entry['data'] if entry['version'] == version else None), version
+
+    def _set(self, key: str, data: Any, version: int) -> None:
+        # version < 0: версию прочитать не удалось, сохранять нельзя
+        if version < 0 or not self._available():
+            return
+        try:
+            self._redis.set(key, json.dumps({'version': version, 'data': data}, default=str), ex=self.ttl)
+        except Exception as e:
+            self._failed('запись', e)
+
+    def lookup_user(self, chat_id: int) -> Tuple[Optional[User], int]:
+        data, version = self._lookup(chat_id, self._user_key(chat_id))
+        if data is None:
+            return None, version
+        if data['last_activity_date']:
+            data['last_activity_date'] = date.fromisoformat(data['last_activity_date'])
+        return User(**data), version
+
+    def set_user(self, user: User, version: int) -> None:
+        self._set(self._user_key(user.chat_id), asdict(user), version)
+
+    def lookup_today_count(self, chat_id: int) -> Tuple[Optional[int], int]:
+        return self._lookup(chat_id, self._today_key(chat_id))
+
+    def set_today_count(self, chat_id: int, count: int, version: int) -> None:
+        self._set(self._today_key(chat_id), count, version)
+
+    def bump(self, chat_ids: Iterable[int]) -> None:
+        chat_ids = list(chat_ids)
+        if not chat_ids:
+            return
+        # Версию увеличиваем даже после недавней ошибки: пропущенный bump
+        # оставил бы в кэше устаревшую запись до истечения ttl
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            for chat_id in chat_ids:
+                pipe.incr(self._version_key(chat_id))
+                pipe.expire(self._version_key(chat_id), max(self.ttl * 2, 24 * 60 * 60))
+                pipe.publish(INVALIDATION_CHANNEL, f'{self._origin}:{chat_id}')
+            pipe.execute()
+            metrics.inc('shared_cache.invalidations', len(chat_ids))
+        except Exception as e:
+            self._failed('инвалидация', e)
+
+    def subscribe(self, listener: InvalidationListener) -> None:
+        super().subscribe(listener)
+        if self._pubsub is None:
+            self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.subscribe(**{INVALIDATION_CHANNEL: self._on_message})
+            self._listener = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def _on_message(self, message: dict) -> None:
+        try:
+            origin, chat_id = message['data'].decode().split(':', 1)
+            chat_id = int(chat_id)
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return
+        if origin != self._origin:
+            self._notify(chat_id)
+
+    def close(self) -> None:
+        if self._listener is not None:
+            self._listener.stop()
+            self._pubsub.close()
+        self._redis.close()
+
+
+class SharedCacheReader:
+    """Чтение пользователя и сегодняшней суммы через общий кэш.
+
+    Остальные методы передаются адаптеру базы как есть.
+    """
+
+    def __init__(self, db: Any, cache: SharedCache):
+        self.db = db
+        self.cache = cache
+
+    def get_user(self, chat_id: int) -> Optional[User]:
+        user, version = self.cache.lookup_user(chat_id)
+        if user is not None:
+            metrics.inc('shared_cache.users.hits')
+            return user
+        metrics.inc('shared_cache.users.misses')
+        user = self.db.get_user(chat_id)
+        if user is not None:
+            self.cache.set_user(user, version)
+        return user
+
+    def get_today_activity_count(self, chat_id: int) -> int:
+        count, version = self.cache.lookup_today_count(chat_id)
+        if count is not None:
+            metrics.inc('shared_cache.today.hits')
+            return count
+        metrics.inc('shared_cache.today.misses')
+        count = self.db.get_today_activity_count(chat_id)
+        self.cache.set_today_count(chat_id, count, version)
+        return count
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.db, name)
+
+
+def create_shared_cache() -> Optional[SharedCache]:
+    """Общий кэш по настройкам окружения (SHARED_CACHE=off|redis|memory)."""
+    kind = os.getenv('SHARED_CACHE', 'off').lower()
+    if kind == 'off':
+        return None
+    if kind == 'memory':
+        return InMemorySharedCache()
+    if kind == 'redis':
+        url = os.getenv('SHARED_CACHE_URL') or os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+        return RedisSharedCache(
+            url,
+            ttl=int(os.getenv('SHARED_CACHE_TTL', '300')),
+            timeout=float(os.getenv('SHARED_CACHE_TIMEOUT', '0.5')),
+        )
+    raise ValueError(f"Неизвестный SHARED_CACHE: {kind}")
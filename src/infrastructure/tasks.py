@@ -1,9 +1,13 @@
 import os
-import asyncio
 import logging
+from typing import List
 from dotenv import load_dotenv
 from aiogram import Bot
+from celery.signals import worker_process_init, worker_process_shutdown, worker_shutdown
 from src.infrastructure.celery_app import celery_app
+from src.infrastructure.dispatcher import REMINDER_KINDS, deliver_outbox_batch
+from src.infrastructure.provider import get_database
+from src.infrastructure.worker_runtime import WorkerRuntime
 # Импортируем функции уведомлений
 import notifications
 
@@ -13,15 +17,29 @@ TOKEN_BOT = os.getenv('TOKEN_BOT')
 if not TOKEN_BOT:
     raise ValueError("TOKEN_BOT не найден в переменных окружения!")
 
+# Один бот и цикл событий на процесс воркера: HTTP-сессия с keep-alive
+# переиспользуется всеми задачами процесса
+runtime = WorkerRuntime(lambda: Bot(token=TOKEN_BOT or ""))
+
+
+@worker_process_init.connect
+def _start_runtime(**kwargs):
+    """Запуск цикла и бота в дочернем процессе воркера (пул prefork)."""
+    runtime.start()
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def _stop_runtime(**kwargs):
+    """Закрытие сессии бота и цикла при остановке процесса."""
+    runtime.close()
+
+
 @celery_app.task
 def send_morning_reminder(user_id: int):
     """Отправка утреннего напоминания через Celery."""
     try:
-        # Создаем новый экземпляр бота для каждой задачи
-        bot = Bot(token=TOKEN_BOT or "")
-        
-        # Запускаем асинхронную функцию в синхронном контексте
-        asyncio.run(notifications.send_morning_reminder(bot, user_id, "Пользователь"))
+        runtime.run(notifications.send_morning_reminder(runtime.bot, user_id, None))
         
         logging.info(f"Отправлено утреннее напоминание пользователю {user_id}")
     except Exception as e:
@@ -31,11 +49,7 @@ def send_morning_reminder(user_id: int):
 def send_afternoon_reminder(user_id: int):
     """Отправка дневного напоминания через Celery."""
     try:
-        # Создаем новый экземпляр бота для каждой задачи
-        bot = Bot(token=TOKEN_BOT or "")
-        
-        # Запускаем асинхронную функцию в синхронном контексте
-        asyncio.run(notifications.send_afternoon_reminder(bot, user_id, "Пользователь"))
+        runtime.run(notifications.send_afternoon_reminder(runtime.bot, user_id, None))
         
         logging.info(f"Отправлено дневное напоминание пользователю {user_id}")
     except Exception as e:
@@ -45,11 +59,7 @@ def send_afternoon_reminder(user_id: int):
 def send_evening_reminder(user_id: int):
     """Отправка вечернего напоминания через Celery."""
     try:
-        # Создаем новый экземпляр бота для каждой задачи
-        bot = Bot(token=TOKEN_BOT or "")
-        
-        # Запускаем асинхронную функцию в синхронном контексте
-        asyncio.run(notifications.send_evening_reminder(bot, user_id, "Пользователь"))
+        runtime.run(notifications.send_evening_reminder(runtime.bot, user_id, None))
         
         logging.info(f"Отправлено вечернее напоминание пользователю {user_id}")
     except Exception as e:
@@ -59,12 +69,24 @@ def send_evening_reminder(user_id: int):
 def send_weekly_progress_report(user_id: int):
     """Отправка еженедельного отчета через Celery."""
     try:
-        # Создаем новый экземпляр бота для каждой задачи
-        bot = Bot(token=TOKEN_BOT or "")
-        
-        # Запускаем асинхронную функцию в синхронном контексте
-        asyncio.run(notifications.send_weekly_progress_report(bot, user_id, "Пользователь"))
+        runtime.run(notifications.send_weekly_progress_report(runtime.bot, user_id, None))
         
         logging.info(f"Отправлен еженедельный отчет пользователю {user_id}")
     except Exception as e:
-        logging.error(f"Ошибка при отправке еженедельного отчета пользователю {user_id}: {e}") 
\ No newline at end of file
+        logging.error(f"Ошибка при отправке еженедельного отчета пользователю {user_id}: {e}")
+
+@celery_app.task
+def send_outbox_batch(kind: str, slot_date: str, claim_id: str, payloads: List[list]):
+    """Отправка пачки из outbox, арендованной с меткой claim_id.
+    
+    Записи, уже отправленные (повтор задачи Celery) или переарендованные
+    после истечения аренды, пропускаются. Для вида weekly payloads - поля
+    WeeklyReport, для остальных - поля ReminderPayload.
+    """
+    if kind not in REMINDER_KINDS:
+        logging.error(f"Неизвестный вид напоминания: {kind}")
+        return
+    try:
+        runtime.run(deliver_outbox_batch(get_database(), runtime.bot, kind, slot_date, claim_id, payloads))
+    except Exception as e:
+        logging.error(f"Ошибка при отправке пачки outbox '{kind}' за {slot_date}: {e}")
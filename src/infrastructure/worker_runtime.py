@@ -0,0 +1,69 @@
+"""
+Долгоживущие цикл событий и Bot для процесса воркера Celery.
+
+Цикл работает в отдельном потоке, задачи передают в него корутины и ждут
+результата. Так один Bot с его HTTP-сессией (keep-alive, одно TLS-рукопожатие)
+обслуживает все задачи процесса при любом пуле Celery: prefork, solo, threads.
+"""
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Optional
+
+from aiogram import Bot
+
+BotFactory = Callable[[], Bot]
+
+
+class WorkerRuntime:
+    """Цикл событий в фоновом потоке и общий для задач Bot."""
+    
+    def __init__(self, bot_factory: BotFactory):
+        self._bot_factory = bot_factory
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._bot: Optional[Bot] = None
+    
+    def start(self) -> None:
+        """Запуск цикла и создание бота (повторный вызов ничего не делает)."""
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name='worker-loop', daemon=True)
+            thread.start()
+            self._loop, self._thread = loop, thread
+            self._bot = self._bot_factory()
+            logging.info("Цикл событий и бот воркера запущены")
+    
+    @property
+    def bot(self) -> Bot:
+        """Общий бот процесса."""
+        self.start()
+        return self._bot  # type: ignore[return-value]
+    
+    def run(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """Выполнение корутины в цикле воркера с ожиданием результата."""
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)  # type: ignore[arg-type]
+        return future.result(timeout)
+    
+    def close(self, timeout: float = 10.0) -> None:
+        """Закрытие сессии бота и остановка цикла."""
+        with self._lock:
+            loop, thread, bot = self._loop, self._thread, self._bot
+            self._loop = self._thread = self._bot = None
+        if loop is None:
+            return
+        try:
+            if bot is not None:
+                asyncio.run_coroutine_threadsafe(bot.session.close(), loop).result(timeout)
+        except Exception as e:
+            logging.error(f"Ошибка при закрытии сессии бота: {e}")
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            if thread is not None:
+                thread.join(timeout)
+            loop.close()
+            logging.info("Цикл событий и бот воркера остановлены")
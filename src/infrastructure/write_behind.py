@@ -0,0 +1,118 @@
+"""
+Отложенная групповая запись подходов (write-behind).
+
+Подходы складываются в очередь процесса и записываются одной транзакцией
+раз в max_delay_ms или при накоплении max_batch штук. Каждый вызов submit
+получает своё будущее и дожидается подтверждения записи.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from src.domain.entities import User
+from src.infrastructure.metrics import metrics
+
+ActivityItem = Tuple[int, int]
+BatchWriter = Callable[[List[ActivityItem]], Awaitable[List[Optional[User]]]]
+
+_STOP = object()
+
+
+class ActivityWriteBehind:
+    """Очередь подходов с групповым коммитом."""
+    
+    def __init__(self, write_batch: BatchWriter,
+                 max_delay_ms: Optional[int] = None, max_batch: Optional[int] = None):
+        self._write_batch = write_batch
+        if max_delay_ms is None:
+            max_delay_ms = int(os.getenv('DB_WRITE_BEHIND_MAX_DELAY_MS', '20'))
+        if max_batch is None:
+            max_batch = int(os.getenv('DB_WRITE_BEHIND_MAX_BATCH', '100'))
+        self.max_delay = max_delay_ms / 1000
+        self.max_batch = max(1, max_batch)
+        
+        self._queue: Optional[asyncio.Queue] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._closed = False
+        
+        metrics.register_gauge(
+            'db.write_behind.pending', lambda: self._queue.qsize() if self._queue else 0
+        )
+    
+    def _ensure_started(self) -> asyncio.Queue:
+        """Ленивый запуск фоновой задачи в текущем цикле событий."""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            # Пустой контекст: иначе задача унаследует контекстные
+            # переменные первого обновления (например, счётчик запросов)
+            self._flusher = contextvars.Context().run(asyncio.create_task, self._run())
+        return self._queue
+    
+    async def submit(self, chat_id: int, pushups_count: int) -> Optional[User]:
+        """Постановка подхода в очередь и ожидание его записи."""
+        if self._closed:
+            raise RuntimeError("Очередь записи подходов уже остановлена")
+        queue = self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        queue.put_nowait(((chat_id, pushups_count), future))
+        return await future
+    
+    async def _run(self) -> None:
+        """Сбор пачек и их запись до получения сигнала остановки."""
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            entry = await self._queue.get()
+            if entry is _STOP:
+                break
+            
+            batch = [entry]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+            
+            await self._flush(batch)
+        
+        # Дописываем всё, что успели поставить до остановки
+        remaining = []
+        while not self._queue.empty():
+            entry = self._queue.get_nowait()
+            if entry is not _STOP:
+                remaining.append(entry)
+        for start in range(0, len(remaining), self.max_batch):
+            await self._flush(remaining[start:start + self.max_batch])
+    
+    async def _flush(self, batch: list) -> None:
+        """Запись пачки и разрешение будущих её участников."""
+        items = [item for item, _ in batch]
+        try:
+            results = await self._write_batch(items)
+        except Exception as e:
+            logging.error(f"Ошибка групповой записи {len(items)} подходов: {e}")
+            results = [None] * len(items)
+        
+        metrics.inc('db.write_behind.commits')
+        metrics.inc('db.write_behind.items', len(items))
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+    
+    async def close(self) -> None:
+        """Остановка с записью всех ожидающих подходов."""
+        self._closed = True
+        if self._queue is None:
+            return
+        self._queue.put_nowait(_STOP)
+        await self._flusher
@@ -34,7 +34,7 @@ class MessageHandlers:
         first_name = message.chat.first_name or "Пользователь"
         
         # Регистрируем пользователя
-        user = self.user_use_case.register_user(chat_id, first_name)
+        user = await self.user_use_case.register_user(chat_id, first_name)
         
         if user:
             await message.answer(
@@ -51,7 +51,7 @@ class MessageHandlers:
             first_name = message.chat.first_name or "Пользователь"
             
             # Создаём задание (для тестирования - разрешаем несколько заданий в день)
-            task = self.task_use_case.create_task(chat_id)
+            task = await self.task_use_case.create_task(chat_id)
             
             if task:
                 await message.answer(
@@ -70,11 +70,13 @@ class MessageHandlers:
             chat_id = message.chat.id
             first_name = message.chat.first_name or "Пользователь"
             
-            stats = self.stats_use_case.get_user_stats(chat_id)
+            text = await self.stats_use_case.render_detailed_stats(
+                chat_id, 'stats', get_stats_message
+            )
             
-            if stats:
+            if text:
                 await message.answer(
-                    text=get_stats_message(stats),
+                    text=text,
                     reply_markup=create_stats_keyboard()
                 )
             else:
@@ -97,13 +99,31 @@ class MessageHandlers:
             logging.error(f"Ошибка в help_handler: {e}")
             await message.answer(get_error_message())
     
+    async def timezone_handler(self, message: types.Message) -> None:
+        """Обработка команды /timezone <IANA-пояс>."""
+        try:
+            chat_id = message.chat.id
+            parts = (message.text or '').split(maxsplit=1)
+            tz_name = parts[1].strip() if len(parts) > 1 else ''
+            
+            if await self.user_use_case.set_timezone(chat_id, tz_name):
+                await message.answer(
+                    text=get_timezone_updated_message(tz_name),
+                    reply_markup=create_main_keyboard()
+                )
+            else:
+                await message.answer(get_invalid_timezone_message())
+        except Exception as e:
+            logging.error(f"Ошибка в timezone_handler: {e}")
+            await message.answer(get_error_message())
+    
     async def settings_handler(self, message: types.Message) -> None:
         """Обработка кнопки настроек."""
         try:
             chat_id = message.chat.id
             first_name = message.chat.first_name or "Пользователь"
             
-            user = self.user_use_case.get_user(chat_id)
+            user = await self.user_use_case.get_user(chat_id)
             
             if user:
                 await message.answer(
@@ -136,11 +156,11 @@ class MessageHandlers:
             return
         
         # Выполняем задание
-        if self.task_use_case.complete_task(chat_id, pushups_count):
+        if await self.task_use_case.complete_task(chat_id, pushups_count):
             response = get_task_completed_message(first_name, pushups_count)
             
             # Проверяем достижения
-            achievement = self.achievement_use_case.check_achievements(chat_id)
+            achievement = await self.achievement_use_case.check_achievements(chat_id)
             if achievement:
                 response += f"\n\n{achievement}"
             
@@ -184,7 +204,7 @@ class MessageHandlers:
         first_name = callback.from_user.first_name
         
         # Пропускаем задание
-        if self.task_use_case.skip_task(chat_id):
+        if await self.task_use_case.skip_task(chat_id):
             response = get_task_skipped_message(first_name)
             
             try:
@@ -220,7 +240,7 @@ class MessageHandlers:
             return
         
         # Update level
-        if self.user_use_case.update_user_level(chat_id, new_level):
+        if await self.user_use_case.update_user_level(chat_id, new_level):
             response = get_level_updated_message(first_name, new_level)
             
             try:
@@ -262,14 +282,12 @@ class MessageHandlers:
         first_name = callback.from_user.first_name or "Пользователь"
         
         # Получаем детальную статистику
-        from src.infrastructure.database import DatabaseAdapter
-        db = DatabaseAdapter()
-        detailed_stats = db.get_detailed_stats(chat_id)
+        response = await self.stats_use_case.render_detailed_stats(
+            chat_id, ('detailed', first_name),
+            lambda stats: get_detailed_stats_message(first_name, stats)
+        )
         
-        if detailed_stats:
-            from src.presentation.messages import get_detailed_stats_message
-            response = get_detailed_stats_message(first_name, detailed_stats)
-            
+        if response:
             try:
                 await callback.message.edit_text(response)  # type: ignore
             except Exception:
@@ -330,11 +348,11 @@ class MessageHandlers:
             return
         
         # Complete task
-        if self.task_use_case.complete_task(chat_id, pushups_count):
+        if await self.task_use_case.complete_task(chat_id, pushups_count):
             response = get_task_completed_message(first_name or "Пользователь", pushups_count)
             
             # Check achievements
-            achievement = self.achievement_use_case.check_achievements(chat_id)
+            achievement = await self.achievement_use_case.check_achievements(chat_id)
             if achievement:
                 response += f"\n\n{achievement}"
             
@@ -1,6 +1,11 @@
 """
 Keyboard layouts for Telegram bot.
+
+Static markups are built once at import; parametrized ones are memoized.
+Markups are shared between replies, so they must never be mutated.
 """
+from functools import lru_cache
+
 from aiogram.types import (
     ReplyKeyboardMarkup, 
     KeyboardButton, 
@@ -9,9 +14,11 @@ from aiogram.types import (
 )
 from aiogram.utils.keyboard import ReplyKeyboardBuilder, InlineKeyboardBuilder
 
+from src.domain.progression import get_progression
 
-def create_main_keyboard() -> ReplyKeyboardMarkup:
-    """Create main keyboard."""
+
+def _build_main_keyboard() -> ReplyKeyboardMarkup:
+    """Build main keyboard."""
     builder = ReplyKeyboardBuilder()
     builder.add(KeyboardButton(text="🏋️‍♂️ Новое задание"))
     builder.add(KeyboardButton(text="📊 Моя статистика"))
@@ -21,8 +28,8 @@ def create_main_keyboard() -> ReplyKeyboardMarkup:
     return builder.as_markup(resize_keyboard=True)
 
 
-def create_task_keyboard(pushups_count: int) -> InlineKeyboardMarkup:
-    """Create keyboard for task completion."""
+def _build_task_keyboard(pushups_count: int) -> InlineKeyboardMarkup:
+    """Build keyboard for task completion."""
     builder = InlineKeyboardBuilder()
     builder.add(InlineKeyboardButton(
         text=f"✅ Выполнил ({pushups_count})", 
@@ -40,8 +47,8 @@ def create_task_keyboard(pushups_count: int) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def create_stats_keyboard() -> InlineKeyboardMarkup:
-    """Create keyboard for statistics."""
+def _build_stats_keyboard() -> InlineKeyboardMarkup:
+    """Build keyboard for statistics."""
     builder = InlineKeyboardBuilder()
     builder.add(InlineKeyboardButton(
         text="📈 Детальная статистика", 
@@ -63,14 +70,42 @@ def create_stats_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def create_settings_keyboard(current_level: int) -> InlineKeyboardMarkup:
-    """Create keyboard for settings."""
+@lru_cache(maxsize=64)
+def _settings_keyboard(current_level: int, max_level: int) -> InlineKeyboardMarkup:
+    """Build keyboard for settings (memoized per level and level count)."""
     builder = InlineKeyboardBuilder()
-    for i in range(1, 7):
+    for i in range(1, max_level + 1):
         emoji = "✅" if i == current_level else f"{i}️⃣"
         builder.add(InlineKeyboardButton(
             text=f"{emoji} Уровень {i}", 
             callback_data=f"set_level_{i}"
         ))
-    builder.adjust(3, 3)
-    return builder.as_markup() 
\ No newline at end of file
+    builder.adjust(3)
+    return builder.as_markup()
+
+
+MAIN_KEYBOARD = _build_main_keyboard()
+STATS_KEYBOARD = _build_stats_keyboard()
+for _level in range(1, get_progression().max_level + 1):
+    _settings_keyboard(_level, get_progression().max_level)
+
+
+def create_main_keyboard() -> ReplyKeyboardMarkup:
+    """Get main keyboard."""
+    return MAIN_KEYBOARD
+
+
+@lru_cache(maxsize=1024)
+def create_task_keyboard(pushups_count: int) -> InlineKeyboardMarkup:
+    """Get keyboard for task completion (memoized per count)."""
+    return _build_task_keyboard(pushups_count)
+
+
+def create_stats_keyboard() -> InlineKeyboardMarkup:
+    """Get keyboard for statistics."""
+    return STATS_KEYBOARD
+
+
+def create_settings_keyboard(current_level: int) -> InlineKeyboardMarkup:
+    """Get keyboard for settings."""
+    return _settings_keyboard(current_level, get_progression().max_level)
@@ -4,7 +4,8 @@ Message templates for Telegram bot.
 from datetime import date
 from typing import Optional
 
-from src.domain.entities import User, UserStats, Task
+from src.domain.entities import User, DetailedStats, Task
+from src.domain.progression import Progression, get_progression
 
 
 def get_welcome_message(first_name: str) -> str:
@@ -37,42 +38,46 @@ def get_already_completed_message(first_name: str) -> str:
     return f"🎉 {first_name}, ты уже выполнил задание на сегодня! Молодец!\n\nНажми 'Моя статистика' чтобы посмотреть свой прогресс."
 
 
-def get_stats_message(stats: UserStats) -> str:
+def _format_date(value: Optional[str]) -> str:
+    """Format stored date (or timestamp) for display."""
+    if not value:
+        return 'Нет'
+    # 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS': keep the date part
+    return str(value)[:10]
+
+
+_today_label = (date.min, '')
+
+
+def _format_today() -> str:
+    """Today's date as dd.mm.yyyy, formatted once per day."""
+    global _today_label
+    today = date.today()
+    if _today_label[0] != today:
+        _today_label = (today, today.strftime('%d.%m.%Y'))
+    return _today_label[1]
+
+
+def get_stats_message(stats: DetailedStats) -> str:
     """Get statistics message."""
-    first_name = stats.user_data.first_name
-    
-    # Получаем детальную статистику
-    from src.infrastructure.database import DatabaseAdapter
-    db = DatabaseAdapter()
-    today_count = db.get_today_activity_count(stats.user_data.chat_id)
-    detailed_stats = db.get_detailed_stats(stats.user_data.chat_id)
-    
-    today_status = f"✅ {today_count} отжиманий" if today_count > 0 else "❌ Не выполнено"
-    
-    # Форматируем даты
-    first_date = detailed_stats.get('first_activity', 'Нет')
-    last_date = detailed_stats.get('last_activity', 'Нет')
-    
-    if first_date and first_date != 'Нет':
-        first_date = first_date.split(' ')[0] if ' ' in str(first_date) else str(first_date)
-    if last_date and last_date != 'Нет':
-        last_date = last_date.split(' ')[0] if ' ' in str(last_date) else str(last_date)
+    first_name = stats.user.first_name
+    today_status = f"✅ {stats.today_count} отжиманий" if stats.today_count > 0 else "❌ Не выполнено"
     
     return f"""
 📊 Статистика {first_name}:
 
-🎯 Уровень: {stats.user_data.level}
-📅 Дней тренировок: {stats.days_count}
+🎯 Уровень: {stats.user.level}
+📅 Дней тренировок: {stats.total_days}
 💪 Всего отжиманий: {stats.total_pushups}
-📆 Последняя активность: {last_date}
+📆 Последняя активность: {_format_date(stats.last_activity)}
 📋 Сегодня: {today_status}
 
 📈 Детальная статистика:
-• 🗓️ Первая тренировка: {first_date}
-• 📊 Среднее в день: {detailed_stats.get('avg_per_day', 0)} отжиманий
-• 🔥 Дней подряд: {detailed_stats.get('consecutive_days', 0)}
-• 📅 За неделю: {detailed_stats.get('week_days', 0)} дней, {detailed_stats.get('week_pushups', 0)} отжиманий
-• 📅 За месяц: {detailed_stats.get('month_days', 0)} дней, {detailed_stats.get('month_pushups', 0)} отжиманий
+• 🗓️ Первая тренировка: {_format_date(stats.first_activity)}
+• 📊 Среднее в день: {stats.avg_per_day} отжиманий
+• 🔥 Дней подряд: {stats.user.consecutive_days}
+• 📅 За неделю: {stats.week_days} дней, {stats.week_pushups} отжиманий
+• 📅 За месяц: {stats.month_days} дней, {stats.month_pushups} отжиманий
 
 🔥 Продолжай тренироваться!
     """
@@ -92,6 +97,7 @@ def get_help_message() -> str:
 📊 Моя статистика - посмотреть свой прогресс
 ❓ Помощь - показать эту справку
 🎯 Настройки - изменить уровень сложности
+🕒 /timezone Europe/Moscow - часовой пояс для напоминаний
 
 💡 Как это работает:
 1. Нажми "Новое задание"
@@ -103,6 +109,23 @@ def get_help_message() -> str:
     """
 
 
+_level_lines: tuple = (None, '')
+
+
+def _format_levels(progression: Progression) -> str:
+    """Level list for settings, rebuilt only when the config is reloaded."""
+    global _level_lines
+    if _level_lines[0] is not progression:
+        lines = '\n'.join(
+            f"{level}️⃣ {progression.level_name(level)} "
+            f"({low}-{high} отжиманий)"
+            for level in range(1, progression.max_level + 1)
+            for low, high in (progression.task_range(level),)
+        )
+        _level_lines = (progression, lines)
+    return _level_lines[1]
+
+
 def get_settings_message(first_name: str, current_level: int) -> str:
     """Get settings message."""
     return f"""
@@ -111,12 +134,7 @@ def get_settings_message(first_name: str, current_level: int) -> str:
 📊 Текущий уровень: {current_level}
 
 Уровни сложности:
-1️⃣ Начинающий (5-15 отжиманий)
-2️⃣ Новичок (10-25 отжиманий)
-3️⃣ Средний (15-35 отжиманий)
-4️⃣ Продвинутый (20-45 отжиманий)
-5️⃣ Эксперт (25-60 отжиманий)
-6️⃣ Мастер (30-80 отжиманий)
+{_format_levels(get_progression())}
 
 Выбери новый уровень:
     """
@@ -128,7 +146,7 @@ def get_task_completed_message(first_name: str, pushups_count: int) -> str:
 🎉 Отлично, {first_name}! 
 
 ✅ Добавлено: {pushups_count} отжиманий
-📅 Дата: {date.today().strftime('%d.%m.%Y')}
+📅 Дата: {_format_today()}
 
 💪 Продолжай в том же духе!
     """
@@ -151,6 +169,16 @@ def get_level_updated_message(first_name: str, new_level: int) -> str:
     """
 
 
+def get_timezone_updated_message(tz_name: str) -> str:
+    """Get timezone updated message."""
+    return f"🕒 Часовой пояс изменён: {tz_name}\nНапоминания будут приходить в 8:00, 14:00 и 20:00 по твоему времени."
+
+
+def get_invalid_timezone_message() -> str:
+    """Get invalid timezone message."""
+    return "❌ Неизвестный часовой пояс! Укажи его в формате IANA, например: /timezone Europe/Moscow"
+
+
 def get_error_message() -> str:
     """Get generic error message."""
     return "❌ Произошла ошибка. Попробуйте еще раз."
@@ -181,35 +209,27 @@ def get_unknown_command_message() -> str:
     return "🤔 Используй кнопки меню для навигации или просто напиши число отжиманий!"
 
 
-def get_detailed_stats_message(first_name: str, detailed_stats: dict) -> str:
+def get_detailed_stats_message(first_name: str, stats: DetailedStats) -> str:
     """Get detailed statistics message."""
-    # Форматируем даты
-    first_date = detailed_stats.get('first_activity', 'Нет')
-    last_date = detailed_stats.get('last_activity', 'Нет')
-    
-    if first_date and first_date != 'Нет':
-        first_date = first_date.split(' ')[0] if ' ' in str(first_date) else str(first_date)
-    if last_date and last_date != 'Нет':
-        last_date = last_date.split(' ')[0] if ' ' in str(last_date) else str(last_date)
-    
     return f"""
 📊 Детальная статистика {first_name}:
 
-🎯 Уровень: {detailed_stats.get('current_level', 1)}
-📅 Всего дней тренировок: {detailed_stats.get('total_days', 0)}
-💪 Всего отжиманий: {detailed_stats.get('total_pushups', 0)}
-📊 Среднее в день: {detailed_stats.get('avg_per_day', 0)} отжиманий
-🔥 Дней подряд: {detailed_stats.get('consecutive_days', 0)}
+🎯 Уровень: {stats.user.level}
+📅 Всего дней тренировок: {stats.total_days}
+💪 Всего отжиманий: {stats.total_pushups}
+📊 Среднее в день: {stats.avg_per_day} отжиманий
+🔥 Дней подряд: {stats.user.consecutive_days}
 
 📈 Периоды:
-• 🗓️ Первая тренировка: {first_date}
-• 📆 Последняя тренировка: {last_date}
-• 📅 За неделю: {detailed_stats.get('week_days', 0)} дней, {detailed_stats.get('week_pushups', 0)} отжиманий
-• 📅 За месяц: {detailed_stats.get('month_days', 0)} дней, {detailed_stats.get('month_pushups', 0)} отжиманий
+• 🗓️ Первая тренировка: {_format_date(stats.first_activity)}
+• 📆 Последняя тренировка: {_format_date(stats.last_activity)}
+• 📅 За неделю: {stats.week_days} дней, {stats.week_pushups} отжиманий
+• 📅 За месяц: {stats.month_days} дней, {stats.month_pushups} отжиманий
+• 🏅 Лучший день: {_format_date(stats.best_day)} ({stats.best_day_pushups} отжиманий)
 
 🏆 Достижения:
-• 🎯 Текущий уровень: {detailed_stats.get('current_level', 1)}
-• 📈 Прогресс: {detailed_stats.get('total_pushups', 0)} отжиманий за {detailed_stats.get('total_days', 0)} дней
+• 🎯 Текущий уровень: {stats.user.level}
+• 📈 Прогресс: {stats.total_pushups} отжиманий за {stats.total_days} дней
 
 🔥 Продолжай тренироваться!
-    """ 
\ No newline at end of file
+    """
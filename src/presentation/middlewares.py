@@ -0,0 +1,46 @@
+"""
+Промежуточные обработчики (middleware) для Telegram бота.
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from src.application.unit_of_work import unit_of_work
+from src.infrastructure.async_database import AsyncDatabaseAdapter
+
+
+def _chat_id(event: TelegramObject) -> Optional[int]:
+    """chat_id обновления или None, если его нет."""
+    if isinstance(event, Message):
+        return event.chat.id
+    if isinstance(event, CallbackQuery):
+        if event.message:
+            return event.message.chat.id
+        return event.from_user.id
+    return None
+
+
+class UnitOfWorkMiddleware(BaseMiddleware):
+    """Открывает единицу работы на каждое обновление.
+    
+    Сценарии одного обновления делят загруженного пользователя, а подходы
+    записываются одной транзакцией.
+    """
+    
+    def __init__(self, db: AsyncDatabaseAdapter):
+        self.db = db
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        chat_id = _chat_id(event)
+        if chat_id is None:
+            return await handler(event, data)
+        
+        async with unit_of_work(self.db, chat_id) as uow:
+            data['uow'] = uow
+            return await handler(event, data)